@@ -0,0 +1,38 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Display how long the projects took to configure, build or install
+during the last run.
+
+Shows the critical path through the dependency graph, the time
+spent in each project and a timeline of the run.
+
+"""
+
+from qisys import ui
+import qibuild.build_report
+import qibuild.parsers
+
+def configure_parser(parser):
+    """Configure parser for this action"""
+    qibuild.parsers.cmake_build_parser(parser)
+    qibuild.parsers.project_parser(parser)
+    group = parser.add_argument_group("build-report arguments")
+    group.add_argument("--phase", choices=qibuild.build_report.PHASES,
+                       help="phase to display. Default: build")
+    group.add_argument("--html", dest="html_output", metavar="FILE",
+                       help="also write the report as a HTML page")
+    parser.set_defaults(phase="build")
+
+def do(args):
+    """Main entry point"""
+    build_worktree = qibuild.parsers.get_build_worktree(args)
+    projects = qibuild.parsers.get_build_projects(build_worktree, args,
+                                                  solve_deps=True)
+    report = qibuild.build_report.BuildReport(projects, phase=args.phase)
+    report.display()
+    if args.html_output and report.projects:
+        report.write_html(args.html_output)
+        ui.info(ui.green, "Report written to", args.html_output)
+    return report
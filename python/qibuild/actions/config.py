@@ -44,8 +44,8 @@ def do(args):
         editor = qibuild_cfg.defaults.env.editor
         if not editor:
             editor = qisys.interact.get_editor()
-            qibuild_cfg.defaults.env.editor = editor
-            qibuild_cfg.write()
+            with qibuild.config.edit_config() as qibuild_cfg:
+                qibuild_cfg.defaults.env.editor = editor
 
         full_path = qisys.command.find_program(editor)
         if is_local:
@@ -16,6 +16,10 @@ def configure_parser(parser):
     qibuild.parsers.cmake_configure_parser(parser)
     qibuild.parsers.cmake_build_parser(parser)
     qibuild.parsers.project_parser(parser)
+    parser.add_argument("--force", action="store_true",
+                        help="run cmake even if nothing changed since "
+                             "the last configure")
+    parser.set_defaults(force=False)
     if not parser.epilog:
         parser.epilog = ""
     parser.epilog += """
@@ -39,4 +43,6 @@ def do(args):
                             debug_trycompile=args.debug_trycompile,
                             trace_cmake=args.trace_cmake,
                             profiling=args.profiling,
-                            summarize_options=args.summarize_options)
+                            summarize_options=args.summarize_options,
+                            force=args.force,
+                            num_jobs=args.num_jobs)
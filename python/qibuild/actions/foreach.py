@@ -10,6 +10,7 @@ For instance
 """
 
 import qisys.actions
+import qisys.parsers
 import qibuild.parsers
 
 
@@ -20,6 +21,11 @@ def configure_parser(parser):
     parser.add_argument("command", metavar="COMMAND", nargs="+")
     parser.add_argument("--continue", "--ignore-errors", dest="ignore_errors",
                         action="store_true", help="continue on error")
+    qisys.parsers.jobs_parser(parser, default=1)
+    parser.add_argument("--stream", action="store_true",
+                        help="when using -j, display the output of each "
+                             "project as soon as it is done, instead of "
+                             "in the order of the projects")
 
 def do(args):
     """Main entry point"""
@@ -27,4 +33,5 @@ def do(args):
     projects = qibuild.parsers.get_build_projects(build_worktree, args,
                                                  default_all=True)
     qisys.actions.foreach(projects, args.command,
-                          ignore_errors=args.ignore_errors)
+                          ignore_errors=args.ignore_errors,
+                          num_jobs=args.num_jobs, stream=args.stream)
@@ -19,6 +19,13 @@ def configure_parser(parser):
     group.add_argument("--coverity", action="store_true", default=False,
                        help="Build using cov-build. Ensure you have "
                        "cov-analysis installed on your machine.")
+    group.add_argument("--force", action="store_true", default=False,
+                       help="build even if nothing changed since the "
+                            "last build")
+    group.add_argument("--superbuild", action="store_true", default=False,
+                       help="build all the projects with a single ninja "
+                            "process, starting each project as soon as its "
+                            "dependencies are built")
 
 @ui.timer("qibuild make")
 def do(args):
@@ -26,4 +33,5 @@ def do(args):
 
     cmake_builder = qibuild.parsers.get_cmake_builder(args)
     cmake_builder.build(num_jobs=args.num_jobs, rebuild=args.rebuild,
-                        coverity=args.coverity)
+                        coverity=args.coverity, force=args.force,
+                        superbuild=args.superbuild)
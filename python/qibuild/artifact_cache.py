@@ -0,0 +1,231 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" A local cache of the sdk directories of the projects, so that
+a project built once with the same inputs does not have to be
+compiled again
+
+Entries are ``.tar`` archives named after a key computed by
+:py:meth:`qibuild.project.BuildProject.get_artifact_key`. They are
+written atomically, so the cache directory can be shared by several
+machines (over NFS for instance).
+
+When the cache grows bigger than its maximum size, the least
+recently used entries are removed.
+
+"""
+
+import os
+import posixpath
+import socket
+import tarfile
+
+from qisys import ui
+import qisys.sh
+
+# Written by qibuild before each build, so they do not belong
+# in the cache
+EXCLUDED_FILES = ["qitest.json", "share/qi/path.conf"]
+
+DEFAULT_MAX_SIZE = 10 * 1024 # in MB
+
+
+def get_artifact_cache(qibuild_cfg):
+    """ Return an :py:class:`ArtifactCache` from the build settings
+    of the global config, or None if no cache is configured
+
+    """
+    build_cfg = qibuild_cfg.build
+    if not build_cfg.artifact_cache:
+        return None
+    path = qisys.sh.to_native_path(build_cfg.artifact_cache)
+    return ArtifactCache(path, max_size=build_cfg.artifact_cache_size)
+
+
+class ArtifactCache(object):
+    """ A directory containing sdk directories, indexed by key
+
+    :param max_size: maximum size of the cache, in MB
+
+    """
+    def __init__(self, path, max_size=None):
+        self.path = path
+        if max_size is None:
+            max_size = DEFAULT_MAX_SIZE
+        self.max_size = max_size
+
+    def get_entry_path(self, key):
+        """ Path to the archive for the given key """
+        return os.path.join(self.path, key[:2], key + ".tar")
+
+    def restore(self, key, sdk_directory):
+        """ Replace the contents of the sdk directory by the entry
+        matching the key. Files written by qibuild (see
+        ``EXCLUDED_FILES``) are kept
+
+        :return: False if there is no such entry
+
+        """
+        entry_path = self.get_entry_path(key)
+        try:
+            archive = tarfile.open(entry_path, "r")
+        except (IOError, OSError, tarfile.TarError):
+            return False
+        try:
+            _check_members(archive)
+            _clear_sdk_directory(sdk_directory)
+            archive.extractall(sdk_directory)
+        except (IOError, OSError, tarfile.TarError) as e:
+            ui.warning("Could not restore", entry_path, "\n", e)
+            return False
+        finally:
+            archive.close()
+        # So that the entry is considered as recently used
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return True
+
+    def store(self, key, sdk_directory):
+        """ Store the contents of the sdk directory for the given key,
+        then remove old entries if the cache is full
+
+        """
+        entry_path = self.get_entry_path(key)
+        qisys.sh.mkdir(os.path.dirname(entry_path), recursive=True)
+        # Unique temporary name, so that several processes,
+        # maybe on several machines, can store the same entry
+        # at the same time
+        tmp_path = "%s.%s-%i.tmp" % (entry_path, socket.gethostname(),
+                                     os.getpid())
+        try:
+            archive = tarfile.open(tmp_path, "w")
+            try:
+                for name in sorted(os.listdir(sdk_directory)):
+                    archive.add(os.path.join(sdk_directory, name), arcname=name,
+                                filter=_exclude_generated)
+            finally:
+                archive.close()
+            if os.name == "nt" and os.path.exists(entry_path):
+                # os.rename does not overwrite files on Windows
+                os.remove(entry_path)
+            os.rename(tmp_path, entry_path)
+        except (IOError, OSError) as e:
+            qisys.sh.rm(tmp_path)
+            ui.warning("Could not store", sdk_directory, "in the artifact cache\n", e)
+            return
+        self.clean()
+
+    def clean(self):
+        """ Remove the least recently used entries until the size
+        of the cache is below its maximum size
+
+        """
+        entries = list()
+        total_size = 0
+        for (root, _, files) in os.walk(self.path):
+            for name in files:
+                if not name.endswith(".tar"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total_size += st.st_size
+        max_size = self.max_size * 1024 * 1024
+        entries.sort()
+        for (_, size, path) in entries:
+            if total_size <= max_size:
+                break
+            ui.debug("Removing", path, "from the artifact cache")
+            try:
+                os.remove(path)
+            except OSError:
+                # Already removed by someone else
+                pass
+            total_size -= size
+
+
+def _exclude_generated(tarinfo):
+    """ Filter for tarfile.add() """
+    if tarinfo.name in EXCLUDED_FILES:
+        return None
+    return tarinfo
+
+
+def _clear_sdk_directory(sdk_directory):
+    """ Remove everything in the sdk directory, except the files
+    written by qibuild
+
+    """
+    kept = dict()
+    for name in EXCLUDED_FILES:
+        path = os.path.join(sdk_directory, *name.split("/"))
+        if os.path.isfile(path):
+            with open(path, "rb") as fp:
+                kept[path] = fp.read()
+    qisys.sh.rm(sdk_directory)
+    qisys.sh.mkdir(sdk_directory, recursive=True)
+    for (path, contents) in kept.iteritems():
+        qisys.sh.mkdir(os.path.dirname(path), recursive=True)
+        with open(path, "wb") as fp:
+            fp.write(contents)
+
+
+def _is_safe(path, links):
+    """ Whether a path relative to the sdk directory, using ``/`` as
+    a separator, stays inside of it without going through any of the
+    given links. (Only its last component may be a link).
+
+    The path is checked component by component, so that a ``..``
+    following a link cannot be normalized away
+
+    """
+    if path.startswith("/") or os.path.isabs(path):
+        return False
+    components = [x for x in path.split("/") if x not in ("", ".")]
+    parts = list()
+    for (i, component) in enumerate(components):
+        if component == "..":
+            if not parts:
+                return False
+            parts.pop()
+            continue
+        parts.append(component)
+        if i != len(components) - 1 and "/".join(parts) in links:
+            return False
+    return True
+
+
+def _check_members(archive):
+    """ Make sure nothing will be extracted outside of the sdk directory:
+    no absolute path, no ``..``, no link pointing outside, and only
+    regular files, directories and links.
+
+    Symbolic links could be followed when extracting the members
+    after them, and when resolving the targets of other links, so no
+    path may go through a symbolic link of the archive, wherever it is
+    in the archive
+
+    """
+    members = archive.getmembers()
+    links = set(posixpath.normpath(x.name) for x in members if x.issym())
+    for member in members:
+        name = member.name
+        if ".." in name.split("/") or not _is_safe(name, links):
+            raise tarfile.TarError("Invalid path in archive: %s" % name)
+        if member.issym():
+            target = posixpath.join(posixpath.dirname(name), member.linkname)
+            if posixpath.isabs(member.linkname) or not _is_safe(target, links):
+                raise tarfile.TarError("Invalid link in archive: %s -> %s" %
+                                       (name, member.linkname))
+        elif member.islnk():
+            if not _is_safe(member.linkname, links):
+                raise tarfile.TarError("Invalid link in archive: %s -> %s" %
+                                       (name, member.linkname))
+        elif not (member.isfile() or member.isdir()):
+            raise tarfile.TarError("Invalid file type in archive: %s" % name)
@@ -2,6 +2,7 @@ import os
 import qisys.qixml
 
 
+import qibuild.compiler_cache
 import qibuild.config
 import qibuild.profile
 import qitoolchain
@@ -23,6 +24,8 @@ class CMakeBuildConfig(object):
         self._profile_flags = list()
         self.verbose_make = False
         self._default_config = None
+        self.local_settings = None
+        self._compiler_cache = None
         self.qibuild_cfg = self.read_global_qibuild_settings()
         self._cmake_generator = None
         self.read_local_settings()
@@ -108,10 +111,33 @@ class CMakeBuildConfig(object):
         ``os.environ`` will remain unchanged
 
         """
+        build_env = self._read_build_env()
+        compiler_cache = self.compiler_cache
+        if compiler_cache:
+            compiler_cache.setup_env(build_env)
+        return build_env
+
+    def _read_build_env(self):
+        """ The build environment, as set in the configuration files """
         envsetter = qisys.envsetter.EnvSetter()
         envsetter.read_config(self.qibuild_cfg)
         return envsetter.get_build_env()
 
+    @property
+    def compiler_cache(self):
+        """ The :py:class:`.CompilerCache` to use as a compiler launcher,
+        or None
+
+        """
+        if self._compiler_cache is None:
+            compiler_cache = qibuild.compiler_cache.get_compiler_cache(
+                    self.qibuild_cfg, self.local_settings.build,
+                    self._read_build_env(),
+                    worktree_root=self.build_worktree.root)
+            # False means: no compiler cache
+            self._compiler_cache = compiler_cache or False
+        return self._compiler_cache or None
+
     def build_directory(self, prefix="build"):
         """ Return a suitable build directory, depending on the
         build setting of the worktree: the name of the toolchain,
@@ -143,6 +169,10 @@ class CMakeBuildConfig(object):
             args.append("-DCMAKE_TOOLCHAIN_FILE=%s" % self.toolchain.toolchain_file)
         args.append("-DCMAKE_BUILD_TYPE=%s" % self.build_type)
 
+        compiler_cache = self.compiler_cache
+        if compiler_cache and not self.using_visual_studio:
+            for (name, value) in compiler_cache.cmake_flags:
+                args.append("-D%s=%s" % (name, value))
         for (name, value) in self._profile_flags:
             args.append("-D%s=%s" % (name, value))
         for (name, value) in self.user_flags:
@@ -166,6 +196,7 @@ class CMakeBuildConfig(object):
         local_settings = qibuild.config.LocalSettings()
         tree = qisys.qixml.read(self.build_worktree.qibuild_xml)
         local_settings.parse(tree)
+        self.local_settings = local_settings
         default_config = local_settings.defaults.config
         if not default_config:
             return
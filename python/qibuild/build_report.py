@@ -0,0 +1,394 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Record how long each project takes to configure, build and
+install, and display the critical path of multi-project builds
+
+Durations are stored in the ``build-times.json`` file of each build
+directory, for instance::
+
+    {
+      "build": {
+        "run_id": "20141021-101523-4242",
+        "start": 1413879323.56,
+        "duration": 12.3,
+        "status": "ok",
+        "average": 11.8
+      }
+    }
+
+Each ``qibuild configure``, ``qibuild make`` or ``qibuild install``
+gets a new ``run_id``, so that ``qibuild build-report`` only compares
+projects that were processed together.
+
+``average`` is a moving average of the durations of the successful
+runs, ignoring the runs where the project was up to date. It is
+used to start the longest chains of projects first (see
+:py:func:`get_durations`). Since build directories depend on the
+build config, so does the history.
+
+"""
+
+import cgi
+import contextlib
+import json
+import os
+import time
+
+from qisys import ui
+import qisys.lock
+import qisys.sh
+
+PHASES = ["configure", "build", "install"]
+
+TIMES_FILE = "build-times.json"
+
+GANTT_WIDTH = 50
+
+# Weight of the last run in the moving average
+HISTORY_WEIGHT = 0.3
+
+
+def new_run_id():
+    """ Return an identifier for the current qibuild invocation """
+    return "%s-%i" % (time.strftime("%Y%m%d-%H%M%S"), os.getpid())
+
+
+def get_times_path(project):
+    """ Path to the file containing the durations of the project """
+    return os.path.join(project.build_directory, TIMES_FILE)
+
+
+def read_times(project):
+    """ Return a dict phase -> entry, empty if nothing was recorded """
+    times_path = get_times_path(project)
+    if not os.path.exists(times_path):
+        return dict()
+    try:
+        with open(times_path, "r") as fp:
+            return json.load(fp)
+    except (IOError, ValueError) as e:
+        ui.debug("Could not read", times_path, e)
+        return dict()
+
+
+def get_durations(projects, phase):
+    """ Return a dict name -> usual duration of the phase, for the
+    projects having a history, to be used as ``costs`` by
+    :py:meth:`qibuild.deps.DepsSolver.get_dep_projects`
+
+    """
+    res = dict()
+    for project in projects:
+        entry = read_times(project).get(phase, dict())
+        if entry.get("average") is not None:
+            res[project.name] = entry["average"]
+    return res
+
+
+@contextlib.contextmanager
+def record(project, phase, run_id):
+    """ Record how long the body of the ``with`` statement takes,
+    as the ``phase`` of the project, even if it fails
+
+    Yields the entry to write, so that its ``status`` can be set
+    to ``skipped`` when the project was up to date
+
+    """
+    timer = ui.timer("%s %s" % (phase, project.name))
+    entry = {"run_id": run_id}
+    status = "failed"
+    timer.start()
+    try:
+        yield entry
+        status = entry.get("status", "ok")
+    finally:
+        timer.stop()
+        entry["start"] = _to_timestamp(timer.start_time)
+        entry["duration"] = _to_seconds(timer.elapsed_time)
+        entry["status"] = status
+        _write_entry(project, phase, entry)
+
+
+def add_entry(project, phase, run_id, start, duration, status="ok"):
+    """ Record a phase of the project measured by someone else,
+    ninja for instance
+
+    :param start: a timestamp, in seconds
+    :param duration: in seconds
+
+    """
+    entry = {
+        "run_id": run_id,
+        "start": start,
+        "duration": duration,
+        "status": status,
+    }
+    _write_entry(project, phase, entry)
+
+
+def _write_entry(project, phase, entry):
+    """ Helper for record() """
+    times_path = get_times_path(project)
+    try:
+        qisys.sh.mkdir(project.build_directory, recursive=True)
+        with qisys.lock.lock_dir(project.build_directory):
+            times = read_times(project)
+            average = times.get(phase, dict()).get("average")
+            if entry["status"] == "ok":
+                if average is None:
+                    average = entry["duration"]
+                else:
+                    average += HISTORY_WEIGHT * (entry["duration"] - average)
+            entry["average"] = average
+            times[phase] = entry
+            with open(times_path, "w") as fp:
+                json.dump(times, fp, indent=2, sort_keys=True)
+    except (IOError, OSError) as e:
+        # Never fail a build because of this
+        ui.debug("Could not write", times_path, e)
+
+
+def _to_timestamp(date):
+    return time.mktime(date.timetuple()) + date.microsecond / 1e6
+
+
+def _to_seconds(delta):
+    return delta.days * 86400 + delta.seconds + delta.microseconds / 1e6
+
+
+class BuildReport(object):
+    """ The durations of the last run of a phase, for a list of projects
+
+    :param projects: build projects, sorted so that dependencies come first
+
+    Only the projects processed during the last run of the
+    phase are taken into account.
+
+    """
+    def __init__(self, projects, phase="build"):
+        self.phase = phase
+        self.projects = list()
+        self.entries = dict()
+        self.run_id = None
+        self._path_times = dict()
+        all_entries = dict()
+        for project in projects:
+            entry = read_times(project).get(phase)
+            if entry:
+                all_entries[project.name] = entry
+        if not all_entries:
+            return
+        last = max(all_entries.values(), key=lambda x: x["start"])
+        self.run_id = last["run_id"]
+        for project in projects:
+            entry = all_entries.get(project.name)
+            if entry and entry["run_id"] == self.run_id:
+                self.projects.append(project)
+                self.entries[project.name] = entry
+
+    @property
+    def start(self):
+        """ When the first project started """
+        return min(x["start"] for x in self.entries.values())
+
+    @property
+    def wall_time(self):
+        """ Time elapsed between the start of the first project
+        and the end of the last one
+
+        """
+        end = max(x["start"] + x["duration"] for x in self.entries.values())
+        return end - self.start
+
+    @property
+    def total_time(self):
+        """ Sum of the durations of every project """
+        return sum(x["duration"] for x in self.entries.values())
+
+    def get_deps(self, project):
+        """ The build dependencies of the project which are part
+        of the report
+
+        """
+        return [x for x in self.projects if x.name in project.build_depends
+                and x.name != project.name]
+
+    def get_path_time(self, project):
+        """ Longest time from the start of the run to the end of
+        the project, if projects only had to wait for their
+        dependencies
+
+        """
+        if project.name in self._path_times:
+            return self._path_times[project.name]
+        res = self.entries[project.name]["duration"]
+        deps = self.get_deps(project)
+        if deps:
+            res += max(self.get_path_time(x) for x in deps)
+        self._path_times[project.name] = res
+        return res
+
+    @property
+    def critical_path(self):
+        """ The chain of dependencies taking the longest time,
+        starting from the first project to process
+
+        This is the minimum end-to-end time, however many jobs
+        are used, so the projects on this path are the ones to
+        split or to speed up
+
+        """
+        if not self.projects:
+            return list()
+        res = list()
+        project = max(self.projects, key=self.get_path_time)
+        while project:
+            res.insert(0, project)
+            deps = self.get_deps(project)
+            if deps:
+                project = max(deps, key=self.get_path_time)
+            else:
+                project = None
+        return res
+
+    def display(self):
+        """ Display the critical path, self times and timeline """
+        if not self.projects:
+            ui.info(ui.brown, "No", self.phase, "times recorded yet")
+            return
+        critical_path = self.critical_path
+        critical_time = sum(self.entries[x.name]["duration"] for x in critical_path)
+        ui.info(ui.green, "Last", self.phase, "of", len(self.projects),
+                "projects:", ui.reset,
+                "wall time:", _format_duration(self.wall_time),
+                "total time:", _format_duration(self.total_time))
+        ui.info()
+        ui.info(ui.green, "::", "Critical path", ui.reset,
+                "(%s)" % _format_duration(critical_time))
+        max_len = max(len(x.name) for x in self.projects)
+        for project in critical_path:
+            entry = self.entries[project.name]
+            ui.info(" *", ui.blue, project.name.ljust(max_len), ui.reset,
+                    _format_duration(entry["duration"]).rjust(9))
+        ui.info()
+        ui.info(ui.green, "::", "Self time")
+        by_duration = sorted(self.projects, reverse=True,
+                             key=lambda x: self.entries[x.name]["duration"])
+        for project in by_duration:
+            entry = self.entries[project.name]
+            ratio = 0
+            if self.total_time:
+                ratio = 100 * entry["duration"] / self.total_time
+            status = ""
+            if entry["status"] != "ok":
+                status = "(%s)" % entry["status"]
+            status_color = ui.brown
+            if entry["status"] == "failed":
+                status_color = ui.red
+            ui.info("  ", ui.blue, project.name.ljust(max_len), ui.reset,
+                    _format_duration(entry["duration"]).rjust(9),
+                    ("%i%%" % ratio).rjust(4), status_color, status)
+        ui.info()
+        ui.info(ui.green, "::", "Timeline")
+        for (project, offset, length) in self.get_gantt(GANTT_WIDTH):
+            color = ui.reset
+            if project in critical_path:
+                color = ui.red
+            bar = " " * offset + "#" * length
+            ui.info("  ", ui.blue, project.name.ljust(max_len), ui.reset,
+                    "|", color, bar.ljust(GANTT_WIDTH), ui.reset, "|",
+                    _format_duration(self.entries[project.name]["duration"]))
+
+    def get_gantt(self, width):
+        """ Return a list of (project, offset, length) tuples, sorted
+        by start time, scaled to fit in ``width`` columns
+
+        """
+        res = list()
+        wall_time = self.wall_time or 1
+        projects = sorted(self.projects,
+                          key=lambda x: self.entries[x.name]["start"])
+        for project in projects:
+            entry = self.entries[project.name]
+            offset = int(width * (entry["start"] - self.start) / wall_time)
+            offset = min(offset, width - 1)
+            length = int(round(width * entry["duration"] / wall_time))
+            length = max(1, min(length, width - offset))
+            res.append((project, offset, length))
+        return res
+
+    def write_html(self, output):
+        """ Write the report as a standalone HTML page """
+        critical_path = self.critical_path
+        wall_time = self.wall_time or 1
+        rows = list()
+        for (project, _, _) in self.get_gantt(GANTT_WIDTH):
+            entry = self.entries[project.name]
+            left = 100 * (entry["start"] - self.start) / wall_time
+            width = max(100 * entry["duration"] / wall_time, 0.2)
+            css_class = "bar"
+            if project in critical_path:
+                css_class += " critical"
+            if entry["status"] == "failed":
+                css_class += " failed"
+            rows.append(HTML_ROW % {
+                "name": cgi.escape(project.name),
+                "duration": _format_duration(entry["duration"]),
+                "class": css_class,
+                "left": left,
+                "width": width,
+            })
+        critical_names = " &rarr; ".join(cgi.escape(x.name) for x in critical_path)
+        html = HTML_PAGE % {
+            "phase": self.phase,
+            "run_id": cgi.escape(self.run_id),
+            "wall_time": _format_duration(self.wall_time),
+            "total_time": _format_duration(self.total_time),
+            "critical_path": critical_names,
+            "rows": "\n".join(rows),
+        }
+        with open(output, "w") as fp:
+            fp.write(html)
+
+
+def _format_duration(seconds):
+    if seconds < 60:
+        return "%.1fs" % seconds
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes < 60:
+        return "%im %02is" % (minutes, seconds)
+    hours, minutes = divmod(minutes, 60)
+    return "%ih %02im %02is" % (hours, minutes, seconds)
+
+
+HTML_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>qibuild %(phase)s report</title>
+<style>
+body { font-family: sans-serif; }
+table { width: 100%%; border-collapse: collapse; }
+td { padding: 2px 4px; white-space: nowrap; }
+td.timeline { width: 100%%; position: relative; }
+div.bar { position: relative; height: 1em; background: #729fcf; }
+div.critical { background: #ef2929; }
+div.failed { background: #555753; }
+</style>
+</head>
+<body>
+<h1>qibuild %(phase)s report</h1>
+<p>Run %(run_id)s: wall time %(wall_time)s, total time %(total_time)s</p>
+<p>Critical path: %(critical_path)s</p>
+<table>
+%(rows)s
+</table>
+</body>
+</html>
+"""
+
+HTML_ROW = """<tr><td>%(name)s</td><td>%(duration)s</td>\
+<td class="timeline"><div class="%(class)s" \
+style="left: %(left).2f%%; width: %(width).2f%%"></div></td></tr>"""
@@ -62,6 +62,26 @@ Please install it if necessary and re-run `qibuild config --wizard`\
         res.append(generator.strip())
     return res
 
+# cmake executable -> output of cmake --version
+_CMAKE_VERSIONS = dict()
+
+def get_cmake_version(env=None):
+    """ Return the output of ``cmake --version``, or an empty string if
+    cmake could not be run. The result is cached for each cmake
+    executable
+
+    """
+    cmake_ = qisys.command.find_program("cmake", env=env)
+    if not cmake_:
+        return ""
+    if cmake_ not in _CMAKE_VERSIONS:
+        try:
+            out = qisys.command.check_output([cmake_, "--version"], env=env)
+        except (OSError, qisys.command.CommandFailedException):
+            out = ""
+        _CMAKE_VERSIONS[cmake_] = out.strip()
+    return _CMAKE_VERSIONS[cmake_]
+
 def get_cached_var(build_dir, var, default=None):
     """Get a variable from cmake cache
 
@@ -81,7 +101,7 @@ def get_cached_var(build_dir, var, default=None):
 
 def cmake(source_dir, build_dir, cmake_args, env=None,
           clean_first=True, profiling=False, debug_trycompile=False,
-          trace_cmake=False, summarize_options=False):
+          trace_cmake=False, summarize_options=False, log_file=None):
     """Call cmake with from a build dir for a source dir.
     cmake_args are added on the command line.
 
@@ -89,6 +109,8 @@ def cmake(source_dir, build_dir, cmake_args, env=None,
                 ``os.environ`` will remain unchanged
     :param clean_first: Clean the cmake cache
     :param summarize_options: Whether to call :py:func:`display_options` at the end
+    :param log_file: Write the output of cmake in this file instead
+                     of displaying it
 
     For qibuild/CMake hackers:
 
@@ -131,7 +153,10 @@ def cmake(source_dir, build_dir, cmake_args, env=None,
     # the current working dir.
     cmake_args += [source_dir]
     if not profiling and not trace_cmake:
-        qisys.command.call(["cmake"] + cmake_args, cwd=build_dir, env=env)
+        if log_file:
+            _call_logged(["cmake"] + cmake_args, build_dir, env, log_file)
+        else:
+            qisys.command.call(["cmake"] + cmake_args, cwd=build_dir, env=env)
         if summarize_options:
             display_options(build_dir)
         return
@@ -160,6 +185,19 @@ def cmake(source_dir, build_dir, cmake_args, env=None,
     qibuild.cmake.profiling.gen_annotations(profiling_res, outdir, qibuild_dir)
     ui.info(ui.green, "Annotations generated in", outdir)
 
+def _call_logged(cmd, cwd, env, log_file):
+    """ Helper for cmake(): call cmd, writing its output in log_file """
+    exe_full_path = qisys.command.find_program(cmd[0], env=env)
+    if not exe_full_path:
+        raise qisys.command.NotInPath(cmd[0], env=env)
+    cmd[0] = exe_full_path
+    ui.debug("Calling:", " ".join(cmd))
+    with open(log_file, "w") as fp:
+        returncode = subprocess.call(cmd, cwd=cwd, env=env,
+                                     stdout=fp, stderr=subprocess.STDOUT)
+    if returncode != 0:
+        raise qisys.command.CommandFailedException(cmd, returncode, cwd)
+
 def display_options(build_dir):
     """ Display the options by looking in the CMake cache
 
@@ -1,12 +1,20 @@
 import os
 import functools
 import operator
+import time
 
 from qisys import ui
+import qisys.command
+import qisys.jobserver
+import qisys.parallel
 import qisys.sh
 import qisys.remote
+import qibuild.artifact_cache
+import qibuild.build_report
+import qibuild.cmake
 import qibuild.deploy
 import qibuild.deps
+import qibuild.superbuild
 from qisys.abstractbuilder import AbstractBuilder
 from qibuild.project       import write_qi_path_conf
 
@@ -76,15 +84,21 @@ class CMakeBuilder(AbstractBuilder):
 
     def bootstrap_projects(self):
         """ Write the dependencies.cmake and the qi/path.conf files for
-        every project
+        every project.
+
+        Files are only written when their contents change.
+
+        :return: the list of projects whose dependencies changed
 
         """
+        changed = list()
         projects = self.deps_solver.get_dep_projects(self.projects, ["build", "runtime", "test"])
         # subtle diffs here: dependencies.cmake must be written for *all* projects,
         # with the build dependencies
         for project in projects:
             sdk_dirs = self.deps_solver.get_sdk_dirs(project, ["build"])
-            project.write_dependencies_cmake(sdk_dirs)
+            if project.write_dependencies_cmake(sdk_dirs):
+                changed.append(project)
 
         qi_path_sdk_dirs = [p.sdk_directory for p in self.build_worktree.build_projects]
 
@@ -92,10 +106,13 @@ class CMakeBuilder(AbstractBuilder):
         # all the dependencies
         projects = self.deps_solver.get_dep_projects(self.projects, self.dep_types)
         for project in projects:
-            write_qi_path_conf(project.sdk_directory, qi_path_sdk_dirs)
+            if write_qi_path_conf(project.sdk_directory, qi_path_sdk_dirs):
+                if project not in changed:
+                    changed.append(project)
 
         # also write a path.conf in the .qi directory
         write_qi_path_conf(self.build_worktree.dot_qi, qi_path_sdk_dirs, sdk_layout=False)
+        return changed
 
     def pre_build(self, project):
         """ Called before building a project """
@@ -105,33 +122,298 @@ class CMakeBuilder(AbstractBuilder):
         paths.extend([package.path for package in packages])
         project.fix_shared_libs(paths)
 
-    def configure(self, *args, **kwargs):
-        """ Configure the projects in the correct order """
-        self.bootstrap_projects()
+    def get_sorted_projects(self, phase):
+        """ The projects with their dependencies, sorted so that among
+        the projects that can be processed, the ones starting the longest
+        chains of dependencies come first, according to how long the
+        given phase took the previous times
+
+        """
         projects = self.deps_solver.get_dep_projects(self.projects, self.dep_types)
+        costs = qibuild.build_report.get_durations(projects, phase)
+        if not costs:
+            return projects
+        return self.deps_solver.get_dep_projects(self.projects, self.dep_types,
+                                                 costs=costs)
+
+    def configure(self, *args, **kwargs):
+        """ Configure the projects in the correct order
+
+        :param num_jobs: the number of projects to configure at the same
+                         time. A project is configured as soon as its build
+                         dependencies are. The output of cmake is then
+                         written in the ``configure.log`` file of each
+                         build directory
+
+        """
+        num_jobs = kwargs.pop("num_jobs", None)
+        changed = self.bootstrap_projects()
+        if changed:
+            ui.info(ui.green, "Dependencies changed for:", ui.reset,
+                    ", ".join(x.name for x in changed))
+        projects = self.get_sorted_projects("configure")
+        run_id = qibuild.build_report.new_run_id()
+        if num_jobs > 1 and len(projects) > 1:
+            self._configure_parallel(projects, num_jobs, run_id, **kwargs)
+            return
 
         for i, project in enumerate(projects):
             ui.info_count(i, len(projects),
                           ui.green, "Configuring",
                           ui.blue, project.name)
-            project.configure(**kwargs)
+            with qibuild.build_report.record(project, "configure", run_id) as entry:
+                if not project.configure(**kwargs):
+                    entry["status"] = "skipped"
+
+    def _configure_parallel(self, projects, num_jobs, run_id, **kwargs):
+        """ Helper for configure() """
+        summarize_options = kwargs.pop("summarize_options", False)
+        failed = dict()
+        def configure_project(project):
+            log_file = os.path.join(project.build_directory, "configure.log")
+            try:
+                with qibuild.build_report.record(project, "configure", run_id) as entry:
+                    if not project.configure(log_file=log_file, **kwargs):
+                        entry["status"] = "skipped"
+            except Exception, e:
+                failed[project.name] = (log_file, e)
+                raise
+
+        def get_deps(project):
+            return [x for x in projects if x.name in project.build_depends]
+
+        done = list()
+        def on_result(_, project, __):
+            ui.info_count(len(done), len(projects),
+                          ui.green, "Configured",
+                          ui.blue, project.name)
+            done.append(project)
+            if summarize_options:
+                qibuild.cmake.display_options(project.build_directory)
+
+        ui.info(ui.green, "Configuring", len(projects), "projects",
+                "(%i jobs)" % num_jobs)
+        try:
+            qisys.parallel.run_graph(configure_project, projects, get_deps,
+                                     num_jobs=num_jobs, on_result=on_result)
+        except Exception:
+            if not failed:
+                raise
+            ui.error("Failed to configure some projects")
+            for project in projects:
+                if project.name in failed:
+                    (log_file, error) = failed[project.name]
+                    ui.info(ui.red, " * ", ui.reset, ui.blue, project.name)
+                    ui.info(ui.indent(_tail(log_file) or str(error), num=2))
+                    ui.info("  See", log_file)
+                elif project not in done:
+                    ui.info(ui.brown, " * ", ui.reset, ui.blue, project.name,
+                            ui.reset, "(skipped)")
+            raise
 
     @need_configure
     def build(self, *args, **kwargs):
-        """ Build the projects in the correct order """
-        projects = self.deps_solver.get_dep_projects(self.projects, self.dep_types)
+        """ Build the projects in the correct order
+
+        :param superbuild: build all the projects with a single ninja
+                           process (see :py:mod:`qibuild.superbuild`)
+
+        """
+        projects = self.get_sorted_projects("build")
+        if kwargs.pop("superbuild", False):
+            self._build_superbuild(projects, **kwargs)
+            return
+        artifact_cache = qibuild.artifact_cache.get_artifact_cache(
+            self.build_config.qibuild_cfg)
+        artifact_keys = dict()
+        compiler_cache = self.build_config.compiler_cache
+        build_env = self.build_env
+        jobserver = qisys.jobserver.get_jobserver(self.build_config.num_jobs)
+        run_id = qibuild.build_report.new_run_id()
+        sources = dict()
         for i, project in enumerate(projects):
             ui.info_count(i, len(projects),
                           ui.green, "Building",
                           ui.blue, project.name, update_title=True)
             self.pre_build(project)
-            project.build(**kwargs)
+            sdk_dirs = self.deps_solver.get_sdk_dirs(project, ["build"])
+            dep_sources = self.get_dep_sources(project, sources)
+            artifact_key = None
+            if artifact_cache:
+                artifact_key = self.get_artifact_key(project, artifact_keys)
+            stats_before = None
+            if compiler_cache:
+                stats_before = compiler_cache.get_stats(build_env)
+            with qibuild.build_report.record(project, "build", run_id) as entry:
+                if not project.build(sdk_dirs=sdk_dirs,
+                                     artifact_cache=artifact_cache,
+                                     artifact_key=artifact_key,
+                                     jobserver=jobserver,
+                                     dep_sources=dep_sources, **kwargs):
+                    entry["status"] = "skipped"
+            if stats_before:
+                stats_after = compiler_cache.get_stats(build_env)
+                if stats_after:
+                    display_compiler_cache_stats(compiler_cache,
+                                                 stats_before, stats_after)
+
+    def _build_superbuild(self, projects, rebuild=False, coverity=False,
+                          force=False, **kwargs):
+        """ Helper for build()
+
+        As with a regular build, projects are skipped when nothing
+        changed since their last successful build, but the artifact
+        cache is not used
+
+        ninja and the builds of the projects share the same jobserver,
+        so ninja >= 1.13 is required: otherwise each of the N projects
+        run by ninja could also run N jobs
+
+        """
+        if coverity:
+            raise Exception("Cannot use coverity with a superbuild")
+        build_env = self.build_env
+        ninja = qisys.command.find_program("ninja", env=build_env)
+        if not ninja:
+            raise Exception("ninja is required to build all projects at once")
+        if not qisys.jobserver.ninja_has_jobserver_client(build_env):
+            raise Exception("ninja >= 1.13 is required to build all projects "
+                            "at once, so that they share the same jobs")
+        num_jobs = qisys.parallel.get_num_jobs(self.build_config.num_jobs)
+        jobserver = qisys.jobserver.get_jobserver(num_jobs)
+        ninja_env = build_env.copy()
+        ninja_cmd = [ninja]
+        if jobserver:
+            jobserver.setup_env(ninja_env, ninja=True)
+        elif not qisys.jobserver.has_parent_jobserver(build_env, ninja=True):
+            raise Exception("Cannot build all projects at once without "
+                            "a jobserver, which requires a POSIX system,\n"
+                            "or a parent make using a FIFO jobserver")
+
+        run_id = qibuild.build_report.new_run_id()
+        sources = dict()
+        # name -> (sources, sdk_dirs, env, dep_sources), to write the
+        # build fingerprints once the projects are built
+        to_build = dict()
+        edges = list()
+        for project in projects:
+            self.pre_build(project)
+            sdk_dirs = self.deps_solver.get_sdk_dirs(project, ["build"])
+            dep_sources = self.get_dep_sources(project, sources)
+            if project.name not in sources:
+                sources[project.name] = project.get_sources_fingerprint()
+            project_env = project.fix_env(build_env.copy())
+            deps = [x.name for x in projects if x.name in project.build_depends
+                    and x.name != project.name]
+            fingerprint = project.get_build_fingerprint(
+                sources[project.name], sdk_dirs=sdk_dirs, env=project_env,
+                dep_sources=dep_sources)
+            # A project is up to date only if its dependencies are, since
+            # they are built after the fingerprints are computed
+            deps_built = not any(x in to_build for x in deps)
+            if not force and not rebuild and deps_built and \
+                    project.is_built(fingerprint):
+                qibuild.build_report.add_entry(project, "build", run_id,
+                                               time.time(), 0,
+                                               status="skipped")
+                continue
+            qisys.sh.rm(project.build_fingerprint_path)
+            to_build[project.name] = (sources[project.name], sdk_dirs,
+                                      project_env, dep_sources)
+            call_env = project_env.copy()
+            cmd = project.get_build_cmd(call_env, rebuild=rebuild,
+                                        jobserver=jobserver)
+            # Only pass what differs from the environment of ninja,
+            # None meaning the variable has to be removed
+            env = dict((k, v) for (k, v) in call_env.iteritems()
+                       if ninja_env.get(k) != v)
+            for k in ninja_env:
+                if k not in call_env:
+                    env[k] = None
+            deps = [x for x in deps if x in to_build]
+            edges.append((project.name, cmd, env, deps))
+
+        if not edges:
+            ui.info(ui.green, "Nothing changed since last build, skipping")
+            return
+
+        superbuild_dir = qibuild.superbuild.get_superbuild_dir(self.build_worktree)
+        ninja_file = os.path.join(superbuild_dir, qibuild.superbuild.NINJA_FILE)
+        qibuild.superbuild.write_ninja_file(ninja_file, edges)
+        # Every edge is built each time, so the log is only useful to
+        # know how long the projects of this run took
+        ninja_log = os.path.join(superbuild_dir, qibuild.superbuild.NINJA_LOG)
+        qisys.sh.rm(ninja_log)
+        ui.info(ui.green, "Building", len(edges), "projects using",
+                ui.reset, ninja_file)
+        start = time.time()
+        try:
+            qisys.command.call(ninja_cmd, cwd=superbuild_dir, env=ninja_env)
+        except qisys.command.CommandFailedException:
+            ui.error("Failed to build some projects")
+            raise
+        finally:
+            # Only the edges which succeeded are in the log
+            times = qibuild.superbuild.read_ninja_log(ninja_log)
+            for project in projects:
+                if project.name not in times or project.name not in to_build:
+                    continue
+                (begin, end) = times[project.name]
+                qibuild.build_report.add_entry(project, "build", run_id,
+                                               start + begin / 1000.0,
+                                               (end - begin) / 1000.0)
+                project.write_build_fingerprint(*to_build[project.name])
+
+    def get_dep_sources(self, project, fingerprints):
+        """ Return the source fingerprints of the build dependencies
+        of the project, recursively
+
+        :param fingerprints: a dict name -> source fingerprint, updated
+                             with the new fingerprints
+
+        """
+        res = list()
+        dep_projects = self.deps_solver.get_dep_projects([project], ["build"])
+        for dep_project in dep_projects:
+            if dep_project.name == project.name:
+                continue
+            if dep_project.name not in fingerprints:
+                fingerprints[dep_project.name] = \
+                        dep_project.get_sources_fingerprint()
+            res.append("%s %s" % (dep_project.name,
+                                  fingerprints[dep_project.name]))
+        return res
+
+    def get_artifact_key(self, project, keys):
+        """ Return the key of the project in the artifact cache,
+        computing the keys of its build dependencies first
+
+        :param keys: a dict name -> key, updated with the new keys
+
+        """
+        if project.name in keys:
+            return keys[project.name]
+        dep_projects = self.deps_solver.get_dep_projects([project], ["build"])
+        dep_keys = list()
+        for dep_project in dep_projects:
+            if dep_project.name == project.name:
+                continue
+            dep_keys.append(self.get_artifact_key(dep_project, keys))
+        res = project.get_artifact_key(dep_keys=dep_keys)
+        keys[project.name] = res
+        return res
 
     @need_configure
     def install(self, dest_dir, *args, **kwargs):
-        """ Install the projects and the packages to the dest_dir """
+        """ Install the projects and the packages to the dest_dir
+
+        When using ``-j``, several projects are installed at the same
+        time, each one as soon as its build dependencies are installed
+        (installing a project may build it)
+
+        """
         installed = list()
-        projects = self.deps_solver.get_dep_projects(self.projects, self.dep_types)
+        projects = self.get_sorted_projects("install")
         packages = self.deps_solver.get_dep_packages(self.projects, self.dep_types)
 
         # Compute the real path where to install the packages:
@@ -170,12 +452,82 @@ class CMakeBuilder(AbstractBuilder):
 
         if projects:
             ui.info(ui.green, ":: ", "installing projects")
+            installed.extend(self._install_projects(projects, dest_dir, **kwargs))
+        return installed
+
+    def _install_projects(self, projects, dest_dir, **kwargs):
+        """ Helper for install() """
+        num_jobs = self.build_config.num_jobs
+        jobserver = qisys.jobserver.get_jobserver(num_jobs)
+        run_id = qibuild.build_report.new_run_id()
+        # Projects may be built before being installed: use the same
+        # build fingerprints as build()
+        sources = dict()
+        build_args = dict()
+        for project in projects:
+            build_args[project.name] = {
+                "sdk_dirs": self.deps_solver.get_sdk_dirs(project, ["build"]),
+                "dep_sources": self.get_dep_sources(project, sources),
+            }
+        if not num_jobs > 1 or len(projects) < 2:
+            installed = list()
             for i, project in enumerate(projects):
                 ui.info_count(i, len(projects),
                             ui.green, "Installing",
                             ui.blue, project.name)
-                files = project.install(dest_dir, **kwargs)
+                project_kwargs = dict(kwargs, **build_args[project.name])
+                with qibuild.build_report.record(project, "install", run_id):
+                    files = project.install(dest_dir, jobserver=jobserver,
+                                            **project_kwargs)
                 installed.extend(files)
+            return installed
+
+        failed = dict()
+        def install_project(project):
+            try:
+                with qibuild.build_report.record(project, "install", run_id):
+                    project_kwargs = dict(kwargs, **build_args[project.name])
+                    if not jobserver:
+                        return project.install(dest_dir, **project_kwargs)
+                    with jobserver.slot():
+                        return project.install(dest_dir, jobserver=jobserver,
+                                               **project_kwargs)
+            except Exception, e:
+                failed[project.name] = e
+                raise
+
+        def get_deps(project):
+            return [x for x in projects if x.name in project.build_depends]
+
+        done = list()
+        def on_result(_, project, __):
+            ui.info_count(len(done), len(projects),
+                          ui.green, "Installed",
+                          ui.blue, project.name)
+            done.append(project)
+
+        ui.info(ui.green, "Installing", len(projects), "projects",
+                "(%i jobs)" % num_jobs)
+        try:
+            results = qisys.parallel.run_graph(install_project, projects,
+                                               get_deps, num_jobs=num_jobs,
+                                               on_result=on_result)
+        except Exception:
+            if not failed:
+                raise
+            ui.error("Failed to install some projects")
+            for project in projects:
+                if project.name in failed:
+                    ui.info(ui.red, " * ", ui.reset, ui.blue, project.name,
+                            ui.reset, failed[project.name])
+                elif project not in done:
+                    ui.info(ui.brown, " * ", ui.reset, ui.blue, project.name,
+                            ui.reset, "(skipped)")
+            raise
+        # Same order as when installing one project at a time
+        installed = list()
+        for files in results:
+            installed.extend(files)
         return installed
 
 
@@ -257,6 +609,28 @@ class CMakeBuilder(AbstractBuilder):
 
         print
 
+def display_compiler_cache_stats(compiler_cache, stats_before, stats_after):
+    """ Display the hits and misses of the compiler cache during the
+    build of a project
+
+    """
+    hits = stats_after[0] - stats_before[0]
+    misses = stats_after[1] - stats_before[1]
+    total = hits + misses
+    if total <= 0:
+        return
+    ui.info(ui.green, compiler_cache.name + ":", ui.reset,
+            "%i hits, %i misses" % (hits, misses),
+            "(%i%% hit rate)" % (hits * 100 / total))
+
+def _tail(path, num_lines=20):
+    """ Return the last lines of a log file """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as fp:
+        lines = fp.readlines()
+    return "".join(lines[-num_lines:]).rstrip()
+
 class NotConfigured(Exception):
     def __init__(self, project):
         self.project = project
@@ -0,0 +1,147 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Support for compiler caches (ccache, sccache) used as compiler
+launchers by CMake
+
+The compiler cache is set in the ``build`` node of the global
+qibuild.xml file::
+
+    <build compiler_cache="ccache" compiler_cache_size="20G" />
+
+The cache directory and its size can be overridden for a given worktree
+in ``.qi/qibuild.xml``::
+
+    <build compiler_cache_dir="/path/to/cache" />
+
+"""
+
+import json
+import os
+import subprocess
+
+from qisys import ui
+import qisys.command
+import qisys.sh
+
+KNOWN_COMPILER_CACHES = ["ccache", "sccache"]
+
+
+def get_compiler_cache(qibuild_cfg, local_build, env, worktree_root=None):
+    """ Return a :py:class:`CompilerCache` matching the global and
+    local build settings, or None if no compiler cache should be used
+
+    :param local_build: the ``<build>`` settings of the worktree
+    :param env: the build environment, used to find the compiler cache
+
+    """
+    name = qibuild_cfg.build.compiler_cache
+    if not name:
+        return None
+    if name not in KNOWN_COMPILER_CACHES:
+        ui.warning("Unknown compiler cache:", name, "\n",
+                   "Known compiler caches are:",
+                   ", ".join(KNOWN_COMPILER_CACHES))
+        return None
+    executable = qisys.command.find_program(name, env=env)
+    if not executable:
+        ui.warning(name, "not found, building without compiler cache")
+        return None
+    cache_dir = local_build.compiler_cache_dir or qibuild_cfg.build.compiler_cache_dir
+    if cache_dir:
+        cache_dir = qisys.sh.to_native_path(cache_dir)
+    max_size = local_build.compiler_cache_size or qibuild_cfg.build.compiler_cache_size
+    return CompilerCache(name, executable, cache_dir=cache_dir,
+                         max_size=max_size, base_dir=worktree_root)
+
+
+class CompilerCache(object):
+    """ A compiler cache program
+
+    :param cache_dir: where to store the cache. If None, the default
+                      of the program is used
+    :param max_size: a size with a unit (``5G``, ``500M``). If None,
+                     the default of the program is used
+    :param base_dir: paths below this directory are rewritten as
+                     relative paths by ccache, so that objects can be
+                     shared between worktrees
+
+    """
+    def __init__(self, name, executable, cache_dir=None, max_size=None,
+                 base_dir=None):
+        self.name = name
+        self.executable = executable
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.base_dir = base_dir
+
+    @property
+    def cmake_flags(self):
+        """ A list of (name, value) CMake flags """
+        launcher = qisys.sh.to_posix_path(self.executable)
+        return [("CMAKE_C_COMPILER_LAUNCHER", launcher),
+                ("CMAKE_CXX_COMPILER_LAUNCHER", launcher)]
+
+    def setup_env(self, env):
+        """ Add the settings of the cache to the build environment.
+        Variables already set by the user are left untouched
+
+        """
+        if self.name == "ccache":
+            to_set = [("CCACHE_DIR", self.cache_dir),
+                      ("CCACHE_MAXSIZE", self.max_size),
+                      ("CCACHE_BASEDIR", self.base_dir)]
+        else:
+            to_set = [("SCCACHE_DIR", self.cache_dir),
+                      ("SCCACHE_CACHE_SIZE", self.max_size)]
+        for (name, value) in to_set:
+            if value and name not in env:
+                env[name] = value
+
+    def get_stats(self, env):
+        """ Return a tuple (hits, misses) since the cache was created,
+        or None if the statistics cannot be read
+
+        """
+        if self.name == "ccache":
+            cmd = [self.executable, "--print-stats"]
+        else:
+            cmd = [self.executable, "--show-stats", "--stats-format=json"]
+        try:
+            process = subprocess.Popen(cmd, env=env,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+            (out, _) = process.communicate()
+        except OSError:
+            return None
+        if process.returncode != 0:
+            return None
+        try:
+            if self.name == "ccache":
+                return _parse_ccache_stats(out)
+            else:
+                return _parse_sccache_stats(out)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+def _parse_ccache_stats(out):
+    """ Parse the output of ``ccache --print-stats`` """
+    stats = dict()
+    for line in out.splitlines():
+        words = line.split("\t")
+        if len(words) == 2 and words[1].isdigit():
+            stats[words[0]] = int(words[1])
+    hits = stats.get("direct_cache_hit", 0) + \
+           stats.get("preprocessed_cache_hit", 0)
+    misses = stats["cache_miss"]
+    return (hits, misses)
+
+
+def _parse_sccache_stats(out):
+    """ Parse the output of ``sccache --show-stats --stats-format=json`` """
+    stats = json.loads(out)["stats"]
+    hits = sum(stats["cache_hits"]["counts"].values())
+    misses = sum(stats["cache_misses"]["counts"].values())
+    return (hits, misses)
@@ -7,12 +7,14 @@
 
 """
 
+import contextlib
 import os
 import operator
 
 
 from qisys import ui
 
+import qisys.lock
 import qisys.qixml
 import qisys.sh
 from qisys.qixml import etree
@@ -26,6 +28,25 @@ def get_global_cfg_path():
     return qisys.sh.get_config_path("qi", "qibuild.xml")
 
 
+@contextlib.contextmanager
+def edit_config(cfg_path=None):
+    """ Read the global config file, and write it back at the end of
+    the ``with`` statement, holding a lock in between so that changes
+    made by other processes are not lost::
+
+        with qibuild.config.edit_config() as qibuild_cfg:
+            qibuild_cfg.add_worktree(root)
+
+    """
+    if not cfg_path:
+        cfg_path = get_global_cfg_path()
+    with qisys.lock.lock_file(cfg_path):
+        qibuild_cfg = QiBuildConfig()
+        qibuild_cfg.read(cfg_path, create_if_missing=True)
+        yield qibuild_cfg
+        qibuild_cfg.write(cfg_path)
+
+
 class Env:
     def __init__(self):
         self.path = None
@@ -89,20 +110,52 @@ class IDE:
 class Build:
     def __init__(self):
         self.incredibuild = False
+        self.artifact_cache = None
+        self.artifact_cache_size = None
+        self.compiler_cache = None
+        self.compiler_cache_dir = None
+        self.compiler_cache_size = None
 
     def parse(self, tree):
         self.incredibuild = qisys.qixml.parse_bool_attr(tree, "incredibuild")
+        self.compiler_cache = tree.get("compiler_cache")
+        self.compiler_cache_dir = tree.get("compiler_cache_dir")
+        self.compiler_cache_size = tree.get("compiler_cache_size")
+        self.artifact_cache = tree.get("artifact_cache")
+        if tree.get("artifact_cache_size"):
+            self.artifact_cache_size = qisys.qixml.parse_int_attr(
+                tree, "artifact_cache_size")
 
     def tree(self):
         tree = etree.Element("build")
         if self.incredibuild:
             tree.set("incredibuild", "true")
+        if self.compiler_cache:
+            tree.set("compiler_cache", self.compiler_cache)
+        if self.compiler_cache_dir:
+            tree.set("compiler_cache_dir", self.compiler_cache_dir)
+        if self.compiler_cache_size:
+            tree.set("compiler_cache_size", self.compiler_cache_size)
+        if self.artifact_cache:
+            tree.set("artifact_cache", self.artifact_cache)
+        if self.artifact_cache_size is not None:
+            tree.set("artifact_cache_size", str(self.artifact_cache_size))
         return tree
 
     def __str__(self):
         res = ""
         if self.incredibuild:
             res += "incredibuild: %s\n" % self.incredibuild
+        if self.compiler_cache:
+            res += "compiler cache: %s\n" % self.compiler_cache
+        if self.compiler_cache_dir:
+            res += "compiler cache dir: %s\n" % self.compiler_cache_dir
+        if self.compiler_cache_size:
+            res += "compiler cache size: %s\n" % self.compiler_cache_size
+        if self.artifact_cache:
+            res += "artifact cache: %s\n" % self.artifact_cache
+        if self.artifact_cache_size is not None:
+            res += "artifact cache size: %i MB\n" % self.artifact_cache_size
         return res
 
 
@@ -303,12 +356,16 @@ class LocalBuild:
     def __init__(self):
         self.sdk_dir = None
         self.build_dir = None
+        self.compiler_cache_dir = None
+        self.compiler_cache_size = None
 
     def parse(self, tree):
         # Not calling to_native_path because build_dir and sdk_dir can be
         # relative to the worktree
         self.build_dir = tree.get("build_dir")
         self.sdk_dir = tree.get("sdk_dir")
+        self.compiler_cache_dir = tree.get("compiler_cache_dir")
+        self.compiler_cache_size = tree.get("compiler_cache_size")
 
     def tree(self):
         tree = etree.Element("build")
@@ -316,6 +373,10 @@ class LocalBuild:
             tree.set("build_dir", self.build_dir)
         if self.sdk_dir:
             tree.set("sdk_dir", self.sdk_dir)
+        if self.compiler_cache_dir:
+            tree.set("compiler_cache_dir", self.compiler_cache_dir)
+        if self.compiler_cache_size:
+            tree.set("compiler_cache_size", self.compiler_cache_size)
         return tree
 
     def __str__(self):
@@ -324,6 +385,10 @@ class LocalBuild:
             res += "build_dir: %s\n" % self.build_dir
         if self.sdk_dir:
             res += "sdk_dir: %s\n" % self.sdk_dir
+        if self.compiler_cache_dir:
+            res += "compiler_cache_dir: %s\n" % self.compiler_cache_dir
+        if self.compiler_cache_size:
+            res += "compiler_cache_size: %s\n" % self.compiler_cache_size
         return res
 
 
@@ -491,7 +556,8 @@ class QiBuildConfig:
     def write_local_config(self, local_xml_path):
         """ Dump local settings to a xml file """
         local_tree = self.local.tree()
-        qisys.qixml.write(local_tree, local_xml_path)
+        with qisys.lock.lock_file(local_xml_path):
+            qisys.qixml.write(local_tree, local_xml_path)
 
     def set_active_config(self, config):
         """ Merge various configs from <defaults> and the
@@ -638,7 +704,8 @@ class QiBuildConfig:
             worktree_tree = worktree.tree()
             qibuild_tree.append(worktree_tree)
 
-        qisys.qixml.write(qibuild_tree, xml_path)
+        with qisys.lock.lock_file(xml_path):
+            qisys.qixml.write(qibuild_tree, xml_path)
 
     def __str__(self):
         res = ""
@@ -8,16 +8,24 @@ class DepsSolver(object):
     def __init__(self, build_worktree):
         self.build_worktree = build_worktree
 
-    def get_dep_projects(self, projects, dep_types, reverse=False):
+    def get_dep_projects(self, projects, dep_types, reverse=False, costs=None):
         """ Solve the dependencies of the list of projects
 
         :param: dep_types A list of dependencies types
                 (``["build"]``, ``["runtime", "test"]``, etc.)
+        :param: costs A dict name -> time taken by the project. When
+                given, projects are still sorted so that dependencies
+                come first, but the projects starting the longest chains
+                come before their siblings
+                (see :py:func:`qisys.sort.critical_path_sort`)
         :return: a list of projects in the build worktree
 
         """
         sorted_names = self._get_sorted_names(projects, dep_types,
                                               reverse=reverse)
+        if costs and not reverse:
+            sorted_names = qisys.sort.critical_path_sort(
+                self._get_deps_dict(dep_types), sorted_names, costs)
 
         dep_projects = list()
 
@@ -80,7 +88,12 @@ class DepsSolver(object):
                         reverse_deps.add(project.name)
             return sorted(list(reverse_deps))
 
-        to_sort = dict()
+        to_sort = self._get_deps_dict(dep_types)
+        return qisys.sort.topological_sort(to_sort, [x.name for x in projects])
+
+    def _get_deps_dict(self, dep_types):
+        """ Helper for _get_sorted_names """
+        res = dict()
         for project in self.build_worktree.build_projects:
             deps = set()
             if "build" in dep_types:
@@ -89,8 +102,8 @@ class DepsSolver(object):
                 deps.update(project.run_depends)
             if "test" in dep_types:
                 deps.update(project.test_depends)
-            to_sort[project.name] = deps
-        return qisys.sort.topological_sort(to_sort, [x.name for x in projects])
+            res[project.name] = deps
+        return res
 
 
 def read_deps_from_xml(object, xml_elem):
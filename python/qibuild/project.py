@@ -1,13 +1,18 @@
 import argparse
+import functools
+import hashlib
 import json
 import os
 import platform
 import re
 import sys
+import threading
 from xml.etree import ElementTree as etree
 
 from qisys import ui
 import qisys.command
+import qisys.jobserver
+import qisys.lock
 import qisys.parsers
 import qisys.sh
 import qibuild.cmake
@@ -35,6 +40,10 @@ def write_qi_path_conf(directory, sdk_dirs, sdk_layout=True):
     can be used for instance by qi::path::find() functions, to
     find files from the dependencies' build directories
 
+    The file is only written if its contents changed.
+
+    :return: True if the file was written
+
     """
     to_write = "# File autogenerated by qibuild. Do not edit\n"
 
@@ -48,8 +57,124 @@ def write_qi_path_conf(directory, sdk_dirs, sdk_layout=True):
     else:
         path_conf = os.path.join(directory, "path.conf")
 
-    with open(path_conf, "w") as fp:
-        fp.write(to_write)
+    return qisys.sh.write_file_if_different(to_write, path_conf)
+
+
+# Environment variables that do not change the result of cmake or of
+# the build, and would prevent skipping them for no reason
+VOLATILE_ENV_VARS = ("_", "OLDPWD", "PWD", "SHLVL", "TERM", "COLUMNS",
+                     "LINES", "SSH_AUTH_SOCK", "SSH_CLIENT", "SSH_CONNECTION",
+                     "SSH_TTY", "WINDOWID", "DISPLAY")
+
+# Files that can be read by cmake while configuring
+CMAKE_FILE_RE = re.compile(r"^(CMakeLists\.txt|.*\.cmake|.*\.in)$")
+
+# In cmake_install.cmake, destinations relative to the install prefix
+# start with ${CMAKE_INSTALL_PREFIX}, absolute ones do not
+ABSOLUTE_DESTINATION_RE = re.compile(r'DESTINATION "[^$"]')
+
+# Lines of CMakeFiles/<version>/CMake<LANG>Compiler.cmake identifying
+# the compiler
+COMPILER_ID_RE = re.compile(r'^set\((CMAKE_\w+_COMPILER(_ID|_VERSION)?) "(.*)"\)$')
+
+# Entries of CMakeCache.txt: NAME:TYPE=VALUE
+CMAKE_CACHE_ENTRY_RE = re.compile(r"^([^#/][^:]*):(\w+)=(.*)$")
+
+# Lines of dependencies.cmake adding the sdk directory of a dependency
+PREFIX_PATH_RE = re.compile(r'^list\(INSERT CMAKE_PREFIX_PATH 0 "(.*)"\)$')
+
+# Projects installed at the same time may append to the same qitest.json
+_QITEST_JSON_LOCK = threading.Lock()
+
+
+def _read_if_exists(path):
+    """ Return the contents of a file, or None if it does not exist """
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as fp:
+        return fp.read()
+
+
+def _read_cmake_cache_entries(path):
+    """ Return the (name, type, value) entries of a CMakeCache.txt
+    file that can be set by the user, sorted by name
+
+    """
+    contents = _read_if_exists(path)
+    if contents is None:
+        return list()
+    res = list()
+    for line in contents.splitlines():
+        match = CMAKE_CACHE_ENTRY_RE.match(line)
+        if match and match.group(2) not in ("INTERNAL", "STATIC"):
+            res.append(match.groups())
+    return sorted(res)
+
+
+def _find_source_files(top, build_directory):
+    """ Yield the files in the given directory, skipping
+    hidden directories and build directories
+
+    """
+    build_directory = os.path.abspath(build_directory)
+    for (root, dirs, files) in os.walk(top):
+        dirs[:] = sorted(x for x in dirs if not x.startswith("."))
+        if root != top:
+            if os.path.abspath(root) == build_directory:
+                dirs[:] = list()
+                continue
+            if "CMakeCache.txt" in files or "dependencies.cmake" in files:
+                dirs[:] = list()
+                continue
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def _find_cmake_files(top, build_directory):
+    """ Yield the cmake files in the given directory, skipping
+    hidden directories and build directories
+
+    """
+    for path in _find_source_files(top, build_directory):
+        if CMAKE_FILE_RE.match(os.path.basename(path)):
+            yield path
+
+
+def _stat_token(path):
+    """ A string changing when the file is modified """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return "%i %r" % (st.st_size, st.st_mtime)
+
+
+def _parse_git_status(out):
+    """ Return the paths of a ``git status --porcelain -z`` output """
+    res = list()
+    entries = iter(out.split("\0"))
+    for entry in entries:
+        if len(entry) < 4:
+            continue
+        res.append(entry[3:])
+        if entry[0] in "RC":
+            # Renames and copies are followed by the original path
+            next(entries, None)
+    return res
+
+
+def lock_build_directory(func):
+    """ Decorator for the methods of BuildProject using the build
+    directory, so that several qibuild processes can not use the same
+    build directory at the same time
+
+    """
+    @functools.wraps(func)
+    def new_func(self, *args, **kwargs):
+        qisys.sh.mkdir(self.build_directory, recursive=True)
+        with qisys.lock.lock_dir(self.build_directory):
+            return func(self, *args, **kwargs)
+    return new_func
 
 
 class BuildProject(object):
@@ -91,6 +216,22 @@ class BuildProject(object):
     def qitest_json(self):
         return os.path.join(self.sdk_directory, "qitest.json")
 
+    @property
+    def configure_fingerprint_path(self):
+        """ Where the fingerprint of the last successful configure
+        is stored
+
+        """
+        return os.path.join(self.build_directory, "configure.sha1")
+
+    @property
+    def build_fingerprint_path(self):
+        """ Where the fingerprint of the last successful build
+        is stored
+
+        """
+        return os.path.join(self.build_directory, "build.sha1")
+
     @property
     def cmake_args(self):
         """ The list of CMake arguments to use when configuring the
@@ -128,11 +269,17 @@ class BuildProject(object):
     def verbose_make(self):
         return self.build_config.verbose_make
 
+    @lock_build_directory
     def write_dependencies_cmake(self, sdk_dirs):
         """ Write the dependencies.cmake file. This will be read by
         qibuild-config.cmake to set CMAKE_PREFIX_PATH and
         qibuild_DIR, so that just running `cmake ..` works
 
+        The file is only written if its contents changed, so that
+        cmake does not run again during the next build for nothing.
+
+        :return: True if the file was written
+
         """
         to_write = """
 #############################################
@@ -196,10 +343,19 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
 
         qisys.sh.mkdir(self.build_directory, recursive=True)
         dep_cmake = os.path.join(self.build_directory, "dependencies.cmake")
-        qisys.sh.write_file_if_different(to_write, dep_cmake)
+        return qisys.sh.write_file_if_different(to_write, dep_cmake)
+
+    @lock_build_directory
+    def configure(self, force=False, **kwargs):
+        """ Delegate to :py:func:`qibuild.cmake.cmake`
+
+        cmake is not called if nothing changed since the last successful
+        configure (see :py:meth:`get_configure_fingerprint`), unless
+        ``force`` is True
 
-    def configure(self, **kwargs):
-        """ Delegate to :py:func:`qibuild.cmake.cmake` """
+        :return: False if cmake was not called
+
+        """
         qisys.sh.mkdir(self.sdk_directory, recursive=True)
         cmake_args = self.cmake_args
         # only required the first time, afterwards this setting is
@@ -208,6 +364,18 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
         cmake_qibuild_dir = os.path.join(cmake_qibuild_dir, "qibuild")
         cmake_qibuild_dir = qisys.sh.to_posix_path(cmake_qibuild_dir)
         cmake_args.append("-Dqibuild_DIR=%s" % cmake_qibuild_dir)
+        fingerprint = None
+        debugging = [kwargs.get(x) for x in
+                     ("profiling", "trace_cmake", "debug_trycompile")]
+        if not any(debugging):
+            fingerprint = self.get_configure_fingerprint(cmake_args)
+            if not force and self.is_configured(fingerprint):
+                ui.info(ui.green, "Nothing changed since last configure,",
+                        "skipping", ui.reset, "(use --force to re-run cmake)")
+                if kwargs.get("summarize_options"):
+                    qibuild.cmake.display_options(self.build_directory)
+                return False
+        qisys.sh.rm(self.configure_fingerprint_path)
         try:
             qibuild.cmake.cmake(self.path, self.build_directory,
                                 cmake_args, env=self.build_env, **kwargs)
@@ -217,6 +385,69 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
         tests = self.parse_qitest_cmake()
         with open(self.qitest_json, "w") as fp:
             json.dump(tests, fp, indent=2)
+        if fingerprint:
+            with open(self.configure_fingerprint_path, "w") as fp:
+                fp.write(fingerprint + "\n")
+        return True
+
+    def is_configured(self, fingerprint):
+        """ Whether the last successful configure used the same inputs """
+        if not os.path.exists(self.cmake_cache):
+            return False
+        if not os.path.exists(self.qitest_json):
+            return False
+        if not os.path.exists(self.configure_fingerprint_path):
+            return False
+        with open(self.configure_fingerprint_path, "r") as fp:
+            return fp.read().strip() == fingerprint
+
+    def get_configure_fingerprint(self, cmake_args):
+        """ Return a sha1 of everything the result of cmake depends on:
+        the cmake arguments, the cmake version, the toolchain file and
+        the versions of its packages, the generated ``dependencies.cmake`` and ``path.conf`` files,
+        the ``-config.cmake`` files of the dependencies, the cmake
+        files of the project and of qibuild, and the build environment
+
+        """
+        sha1 = hashlib.sha1()
+        def add(*tokens):
+            for token in tokens:
+                sha1.update(str(token))
+                sha1.update("\0")
+
+        add("args", *cmake_args)
+        add("cmake", qibuild.cmake.get_cmake_version(env=self.build_env))
+        toolchain = self.build_config.toolchain
+        if toolchain:
+            add("toolchain", _read_if_exists(toolchain.toolchain_file))
+            # The toolchain file only lists the paths of the packages,
+            # which do not change when a package is updated
+            for (name, version) in self.get_toolchain_packages():
+                add("package", name, version)
+        dep_cmake = os.path.join(self.build_directory, "dependencies.cmake")
+        dep_cmake_contents = _read_if_exists(dep_cmake)
+        add("dependencies.cmake", dep_cmake_contents)
+        for line in (dep_cmake_contents or "").splitlines():
+            match = PREFIX_PATH_RE.match(line.strip())
+            if not match:
+                continue
+            config_dir = os.path.join(match.group(1), "cmake")
+            if not os.path.isdir(config_dir):
+                continue
+            for name in sorted(os.listdir(config_dir)):
+                if name.endswith("-config.cmake"):
+                    path = os.path.join(config_dir, name)
+                    add("dep config", match.group(1), name,
+                        _read_if_exists(path))
+        path_conf = os.path.join(self.sdk_directory, "share", "qi", "path.conf")
+        add("path.conf", _read_if_exists(path_conf))
+        for (name, value) in sorted(self.build_env.iteritems()):
+            if name not in VOLATILE_ENV_VARS:
+                add("env", name, value)
+        for top in (self.path, self.cmake_qibuild_dir):
+            for path in _find_cmake_files(top, self.build_directory):
+                add("file", os.path.relpath(path, top), _read_if_exists(path))
+        return sha1.hexdigest()
 
     def parse_qitest_cmake(self):
         """ The qitest.cmake is written from CMake """
@@ -257,12 +488,60 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
             tests.append(test)
         return tests
 
+    @lock_build_directory
     def build(self, num_jobs=None, rebuild=False, target=None,
-              coverity=False, env=None):
-        """ Build the project """
+              coverity=False, env=None, sdk_dirs=None, force=False,
+              artifact_cache=None, artifact_key=None, jobserver=None,
+              dep_sources=None):
+        """ Build the project
+
+        When building all the targets, the build is skipped if neither the
+        sources of the project nor the sdk directories of its dependencies
+        changed since the last successful build
+        (see :py:meth:`get_build_fingerprint`), unless ``force`` or
+        ``rebuild`` is True. Building a given target leaves the fingerprint
+        of the last build untouched
+
+        :param sdk_dirs: the sdk directories of the dependencies
+        :param dep_sources: the source fingerprints of the dependencies
+                            (see :py:meth:`get_build_fingerprint`)
+        :param artifact_cache: a :py:class:`qibuild.artifact_cache.ArtifactCache`.
+                               The sdk directory is restored from it instead
+                               of building if it contains ``artifact_key``,
+                               and is stored in it after a successful build
+        :param jobserver: a :py:class:`qisys.jobserver.JobServer` to use
+                          instead of ``-j``, when the generator supports it
+        :return: False if nothing had to be compiled
+
+        """
+        if not env:
+            build_env = self.build_env.copy()
+        else:
+            build_env = env
+        build_env = self.fix_env(build_env)
+
+        sources = None
+        if not target and not coverity:
+            sources = self.get_sources_fingerprint()
+            fingerprint = self.get_build_fingerprint(sources, sdk_dirs=sdk_dirs,
+                                                     env=build_env,
+                                                     dep_sources=dep_sources)
+            if not force and not rebuild and self.is_built(fingerprint):
+                ui.info(ui.green, "Nothing changed since last build, skipping")
+                return False
+            # The sdk directory is about to change
+            qisys.sh.rm(self.build_fingerprint_path)
+        if not artifact_key:
+            artifact_cache = None
+        if sources and artifact_cache and not force and not rebuild:
+            if artifact_cache.restore(artifact_key, self.sdk_directory):
+                ui.info(ui.green, "Restored from the artifact cache")
+                self.write_build_fingerprint(sources, sdk_dirs, build_env,
+                                              dep_sources)
+                return False
+
         timer = ui.timer("make %s" % self.name)
         timer.start()
-        build_type = self.build_config.build_type
 
         cmd = []
         if coverity:
@@ -272,34 +551,272 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
             qisys.sh.mkdir(cov_dir)
             cmd += ["cov-build", "--dir", cov_dir]
 
-        cmd += ["cmake", "--build", self.build_directory,
-                         "--config", build_type]
+        call_env = build_env.copy()
+        cmd += self.get_build_cmd(call_env, rebuild=rebuild, target=target,
+                                  jobserver=jobserver)
+        try:
+            qisys.command.call(cmd, env=call_env)
+        except qisys.command.CommandFailedException:
+            raise qibuild.build.BuildFailed(self)
+
+        if sources:
+            self.write_build_fingerprint(sources, sdk_dirs, build_env,
+                                          dep_sources)
+            if artifact_cache:
+                artifact_cache.store(artifact_key, self.sdk_directory)
+        timer.stop()
+        return True
 
+    def get_build_cmd(self, env, rebuild=False, target=None, jobserver=None):
+        """ Return the ``cmake --build`` command line for the project,
+        updating ``env`` with the variables the build tool needs
+
+        """
+        cmd = ["cmake", "--build", self.build_directory,
+                        "--config", self.build_config.build_type]
         if target:
             cmd += ["--target", target]
-
         if rebuild:
             cmd += ["--clean-first"]
         cmd += [ "--" ]
-        cmd += self.parse_num_jobs(self.build_config.num_jobs)
+        cmd += self.get_jobs_flags(env, jobserver=jobserver)
 
-        if not env:
-            build_env = self.build_env.copy()
-        else:
-            build_env = env
-        build_env = self.fix_env(build_env)
         if self.verbose_make:
             if self.cmake_generator:
                 if "Makefiles" in self.cmake_generator:
-                    build_env["VERBOSE"] = "1"
+                    env["VERBOSE"] = "1"
                 if self.cmake_generator == "Ninja":
                     cmd.append("-v")
-        try:
-            qisys.command.call(cmd, env=build_env)
-        except qisys.command.CommandFailedException:
-            raise qibuild.build.BuildFailed(self)
+        return cmd
 
-        timer.stop()
+    def write_build_fingerprint(self, sources, sdk_dirs, build_env,
+                                 dep_sources=None):
+        """ Called when the sdk directory is up to date, so that the
+        next build is skipped if nothing changes (see :py:meth:`is_built`)
+
+        """
+        fingerprint = self.get_build_fingerprint(sources, sdk_dirs=sdk_dirs,
+                                                 env=build_env,
+                                                 dep_sources=dep_sources)
+        with open(self.build_fingerprint_path, "w") as fp:
+            fp.write(fingerprint + "\n")
+
+    def is_built(self, fingerprint):
+        """ Whether the last successful build used the same inputs """
+        if not os.path.exists(self.build_fingerprint_path):
+            return False
+        with open(self.build_fingerprint_path, "r") as fp:
+            return fp.read().strip() == fingerprint
+
+    def get_sources_fingerprint(self):
+        """ Return a sha1 of the state of the sources.
+
+        For projects in a git repository, this is the tree of the
+        project in HEAD, plus the size and modification time of the
+        files reported by ``git status``. Otherwise, the size and
+        modification time of every file of the project are used
+
+        """
+        sha1 = hashlib.sha1()
+        (tree, paths) = self._get_source_files()
+        if tree:
+            sha1.update("git %s\0" % tree)
+        for path in paths:
+            sha1.update("%s %s\0" % (path, _stat_token(path)))
+        return sha1.hexdigest()
+
+    def get_sources_hash(self):
+        """ Same as :py:meth:`get_sources_fingerprint`, but using the
+        contents of the files instead of their modification times, so
+        that the result does not depend on the machine
+
+        """
+        sha1 = hashlib.sha1()
+        (tree, paths) = self._get_source_files()
+        if tree:
+            sha1.update("git %s\0" % tree)
+        for path in paths:
+            contents = _read_if_exists(path)
+            if contents is not None:
+                contents = hashlib.sha1(contents).hexdigest()
+            sha1.update("%s %s\0" % (os.path.relpath(path, self.path), contents))
+        return sha1.hexdigest()
+
+    def _get_source_files(self):
+        """ Return a tuple (tree, paths), where tree is the sha1 of the
+        project directory in HEAD, and paths the files modified since
+        HEAD, or (None, every file) if the project is not in a git
+        repository
+
+        """
+        git = qisrc.git.Git(self.path)
+        (rc, out) = git.call("rev-parse", "--show-toplevel", "HEAD:./",
+                             raises=False)
+        if rc == 0:
+            (repo_root, tree) = out.splitlines()[-2:]
+            (rc, out) = git.call("status", "--porcelain", "-z",
+                                 "--untracked-files=all", "--",
+                                 ".", ":(exclude)build-*", ":(exclude).*",
+                                 raises=False)
+            if rc == 0:
+                paths = [os.path.join(repo_root, x)
+                         for x in _parse_git_status(out)]
+                return (tree, sorted(paths))
+        return (None, _find_source_files(self.path, self.build_directory))
+
+    def get_artifact_key(self, dep_keys=None):
+        """ Return the key of the sdk directory of the project in the
+        artifact cache.
+
+        It depends on the contents of the sources, the build settings
+        (toolchain and its packages, or the compiler found by cmake when
+        there is no toolchain, profiles, build type, cmake flags, the
+        entries of the cmake cache, build environment), the qibuild
+        cmake files, and the keys of the build dependencies.
+        The path of the build directory is also used, because files
+        generated in the sdk directory contain absolute paths
+
+        :param dep_keys: the keys of the build dependencies
+
+        """
+        sha1 = hashlib.sha1()
+        def add(*tokens):
+            for token in tokens:
+                sha1.update(str(token))
+                sha1.update("\0")
+
+        add("sources", self.get_sources_hash())
+        add("build directory", qisys.sh.to_posix_path(self.build_directory))
+        add("platform", platform.system(), platform.machine())
+        toolchain = self.build_config.toolchain
+        if toolchain:
+            add("toolchain", toolchain.name)
+            for (name, version) in self.get_toolchain_packages():
+                add("package", name, version)
+        else:
+            add("compiler", *self.get_compiler_identity())
+        add("build type", self.build_config.build_type)
+        add("profiles", *self.build_config.profiles)
+        for arg in self.cmake_args:
+            if not arg.startswith("-DCMAKE_TOOLCHAIN_FILE="):
+                add("arg", arg)
+        # Also catches values changed with ccmake
+        for entry in _read_cmake_cache_entries(self.cmake_cache):
+            add("cache", *entry)
+        build_env = self.fix_env(self.build_env.copy())
+        for (name, value) in sorted(build_env.iteritems()):
+            if name not in VOLATILE_ENV_VARS:
+                add("env", name, value)
+        for path in _find_cmake_files(self.cmake_qibuild_dir,
+                                      self.build_directory):
+            add(os.path.relpath(path, self.cmake_qibuild_dir),
+                _read_if_exists(path))
+        for dep_key in sorted(dep_keys or list()):
+            add("dep", dep_key)
+        return sha1.hexdigest()
+
+    def get_toolchain_packages(self):
+        """ Return the names and versions of the packages of the
+        toolchain, sorted by name, or an empty list when there is no
+        toolchain
+
+        """
+        toolchain = self.build_config.toolchain
+        if not toolchain:
+            return list()
+        packages = sorted(toolchain.packages, key=lambda x: x.name)
+        return [(x.name, x.version) for x in packages]
+
+    def get_compiler_identity(self):
+        """ Return the paths, ids and versions of the compilers found
+        by cmake, read from the CMakeFiles directory of the build
+        directory
+
+        """
+        res = list()
+        cmake_files = os.path.join(self.build_directory, "CMakeFiles")
+        if not os.path.isdir(cmake_files):
+            return res
+        for name in sorted(os.listdir(cmake_files)):
+            version_dir = os.path.join(cmake_files, name)
+            if not os.path.isdir(version_dir):
+                continue
+            for filename in sorted(os.listdir(version_dir)):
+                if not (filename.startswith("CMake") and
+                        filename.endswith("Compiler.cmake")):
+                    continue
+                with open(os.path.join(version_dir, filename), "r") as fp:
+                    for line in fp:
+                        match = COMPILER_ID_RE.match(line.strip())
+                        if match:
+                            res.append("%s=%s" % (match.group(1), match.group(3)))
+        return res
+
+    def get_build_fingerprint(self, sources, sdk_dirs=None, env=None,
+                              dep_sources=None):
+        """ Return a sha1 of everything the result of a build depends on:
+        the fingerprint of the sources, the configuration of the
+        build directory, the versions of the toolchain packages, the build
+        environment, and the files in the sdk directories of the project
+        and of its dependencies
+
+        :param dep_sources: the source fingerprints of the build
+                            dependencies, recursively. Staged include
+                            directories point to the sources of the
+                            dependencies, so changing a header there
+                            does not always change their sdk directories
+
+        """
+        sha1 = hashlib.sha1()
+        def add(*tokens):
+            for token in tokens:
+                sha1.update(str(token))
+                sha1.update("\0")
+
+        add("sources", sources)
+        add("dep sources", *(dep_sources or list()))
+        add("build type", self.build_config.build_type)
+        # Updated packages keep their path, so their sdk directories may
+        # look the same
+        for (name, version) in self.get_toolchain_packages():
+            add("package", name, version)
+        add("configure", _read_if_exists(self.configure_fingerprint_path),
+            _stat_token(self.cmake_cache))
+        for (name, value) in sorted((env or dict()).iteritems()):
+            if name not in VOLATILE_ENV_VARS:
+                add("env", name, value)
+        for sdk_dir in [self.sdk_directory] + list(sdk_dirs or list()):
+            add("sdk", sdk_dir)
+            for (root, dirs, files) in os.walk(sdk_dir):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    add(os.path.relpath(path, sdk_dir), _stat_token(path))
+        return sha1.hexdigest()
+
+    def get_jobs_flags(self, env, jobserver=None):
+        """ Return the ``-j`` flags for the build tool.
+
+        When the build tool can use a jobserver (the given one, or one
+        from a parent make), no flag is returned and ``env`` is updated
+        so that the build tool uses the jobserver instead
+
+        """
+        cmake_generator = self.cmake_generator or ""
+        if "Makefiles" in cmake_generator and "NMake" not in cmake_generator:
+            if qisys.jobserver.has_parent_jobserver(env):
+                return list()
+            if jobserver:
+                jobserver.setup_env(env)
+                return list()
+        if cmake_generator == "Ninja" and \
+                qisys.jobserver.ninja_has_jobserver_client(env):
+            if qisys.jobserver.has_parent_jobserver(env, ninja=True):
+                return list()
+            if jobserver:
+                jobserver.setup_env(env, ninja=True)
+                return list()
+        return self.parse_num_jobs(self.build_config.num_jobs)
 
     def parse_num_jobs(self, num_jobs, cmake_generator=None):
         """ Convert a number of jobs to a list of cmake args """
@@ -325,20 +842,32 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
         return list()
 
 
+    @lock_build_directory
     def install(self, destdir, prefix="/", components=None, num_jobs=1,
-                split_debug=False):
+                split_debug=False, jobserver=None, sdk_dirs=None,
+                dep_sources=None):
         """ Install the project
 
         :param project: project name.
-        :param destdir: destination. Note that when using `qibuild install`,
-          we will first call `cmake` to make sure `CMAKE_INSTALL_PREFIX` is
-          ``/``. But this function simply calls ``cmake --target install``
-          in the simple case.
+        :param destdir: destination. When ``prefix`` is not the
+          ``CMAKE_INSTALL_PREFIX`` used at configure time, it is given to
+          ``cmake_install.cmake`` instead, so that the project is not
+          re-configured. (Unless some files are installed to absolute
+          destinations, which may depend on the configured prefix).
+          In the simple case this function just calls
+          ``cmake --target install``.
         :param runtime: Whether to install the project as a runtime
            package or not.
            (see :ref:`cmake-install` section for the details)
         :package split_debug: split the debug symbols out of the binaries
             useful for `qibuild deploy`
+        :param jobserver: a :py:class:`qisys.jobserver.JobServer` to use
+            when the project has to be built before being installed
+        :param sdk_dirs: the sdk directories of the dependencies
+        :param dep_sources: the source fingerprints of the dependencies.
+            Both are given to :py:meth:`build` when the project has to be
+            built before being installed, so that its build fingerprint is
+            the same as with ``qibuild make``
 
         """
         installed = list()
@@ -355,25 +884,39 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
 
         cprefix = qibuild.cmake.get_cached_var(self.build_directory,
                                                "CMAKE_INSTALL_PREFIX")
-        if cprefix != prefix:
+        install_prefix = None
+        if cprefix == prefix:
+            mess = "Skipping configuration of project %s\n" % self.name
+            mess += "CMAKE_INSTALL_PREFIX is already correct"
+            ui.debug(mess)
+        elif self.has_absolute_install_destinations():
             qibuild.cmake.cmake(self.path, self.build_directory,
                 ['-DCMAKE_INSTALL_PREFIX=%s' % prefix],
                 clean_first=False,
                 env=build_env)
         else:
-            mess = "Skipping configuration of project %s\n" % self.name
-            mess += "CMAKE_INSTALL_PREFIX is already correct"
-            ui.debug(mess)
+            install_prefix = prefix
 
         # Hack for http://www.cmake.org/Bug/print_bug_page.php?bug_id=13934
-        if "Unix Makefiles" in self.cmake_generator:
-            self.build(target="preinstall", num_jobs=num_jobs, env=build_env)
+        makefiles = "Unix Makefiles" in self.cmake_generator
+        if makefiles:
+            self.build(target="preinstall", num_jobs=num_jobs, env=build_env,
+                       jobserver=jobserver)
         if components:
             for component in components:
-                files = self._install_component(destdir, component)
+                files = self._install_component(destdir, component,
+                                                prefix=install_prefix)
                 installed.extend(files)
+        elif install_prefix:
+            # Same as the install target, which uses the configured prefix
+            if not makefiles:
+                # DESTDIR is only needed when installing
+                self.build(jobserver=jobserver, sdk_dirs=sdk_dirs,
+                           dep_sources=dep_sources)
+            files = self._install_component(destdir, prefix=install_prefix)
+            installed.extend(files)
         else:
-            self.build(target="install", env=build_env)
+            self.build(target="install", env=build_env, jobserver=jobserver)
             manifest_path = os.path.join(self.build_directory, "install_manifest.txt")
             installed.extend(read_install_manifest(manifest_path, destdir))
         if "test" in components:
@@ -384,18 +927,44 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
 
         return installed
 
-    def _install_component(self, destdir, component):
+    def has_absolute_install_destinations(self):
+        """ Whether some files are installed to an absolute destination,
+        which may have been computed from the configured install prefix
+
+        """
+        for (root, dirs, files) in os.walk(self.build_directory):
+            dirs[:] = [x for x in dirs if x not in ("CMakeFiles", "sdk")]
+            if "cmake_install.cmake" not in files:
+                continue
+            with open(os.path.join(root, "cmake_install.cmake"), "r") as fp:
+                if ABSOLUTE_DESTINATION_RE.search(fp.read()):
+                    return True
+        return False
+
+    def _install_component(self, destdir, component=None, prefix=None):
+        """ Run cmake_install.cmake, for one component or for all of them
+
+        :param prefix: overrides the CMAKE_INSTALL_PREFIX used at
+                       configure time
+
+        """
         build_env = self.build_env.copy()
         build_env["DESTDIR"] = destdir
 
         cmake_args = list()
         cmake_args += ["-DBUILD_TYPE=%s" % self.build_config.build_type]
-        cmake_args += ["-DCOMPONENT=%s" % component]
+        if component:
+            cmake_args += ["-DCOMPONENT=%s" % component]
+            manifest_name = "install_manifest_%s.txt" % component
+        else:
+            manifest_name = "install_manifest.txt"
+        if prefix:
+            cmake_args += ["-DCMAKE_INSTALL_PREFIX=%s" % prefix]
         cmake_args += ["-P", "cmake_install.cmake", "--"]
-        ui.debug("Installing", component)
+        ui.debug("Installing", component or "all components")
         qisys.command.call(["cmake"] + cmake_args, cwd=self.build_directory,
                             env=build_env)
-        manifest_path = os.path.join(self.build_directory, "install_manifest_%s.txt" % component)
+        manifest_path = os.path.join(self.build_directory, manifest_name)
         installed = read_install_manifest(manifest_path, destdir)
         return installed
 
@@ -404,7 +973,9 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
             return
         tests = qitest.conf.parse_tests(self.qitest_json)
         tests = qitest.conf.relocate_tests(self, tests)
-        qitest.conf.write_tests(tests, os.path.join(destdir, "qitest.json"), append=True)
+        with _QITEST_JSON_LOCK:
+            qitest.conf.write_tests(tests, os.path.join(destdir, "qitest.json"),
+                                    append=True)
 
 
     def run_tests(self, **kwargs):
@@ -0,0 +1,114 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Build several projects with a single ninja process
+
+A ``build.ninja`` file is generated in
+``<worktree>/.qi/superbuild-<config>``, with one edge per project
+running ``cmake --build`` in the build directory of the project,
+and depending on the edges of the build dependencies of the project.
+
+ninja then starts each project as soon as its dependencies are
+built, so the build of a project does not have to wait for the
+slowest targets of the projects it does not depend on.
+
+"""
+
+import os
+import pipes
+import subprocess
+
+import qisys.sh
+
+NINJA_FILE = "build.ninja"
+NINJA_LOG = ".ninja_log"
+
+
+def get_superbuild_dir(build_worktree):
+    """ The directory containing the generated ninja file """
+    build_config = build_worktree.build_config
+    name = build_config.build_directory(prefix="superbuild")
+    return os.path.join(build_worktree.root, ".qi", name)
+
+
+def write_ninja_file(ninja_file, edges):
+    """ Write a ninja file building the given edges
+
+    :param edges: a list of ``(name, command, env, deps)`` tuples,
+                  sorted so that dependencies come first.
+                  ``command`` is a list of arguments, ``env`` a dict
+                  of variables to set for this command only (or to
+                  remove, when the value is None), ``deps`` the names
+                  of the edges to build first
+
+    :return: True if the file changed
+
+    """
+    lines = [
+        "# Generated by qibuild, do not edit",
+        "ninja_required_version = 1.3",
+        "",
+        "rule cmake_build",
+        "  command = $cmd",
+        "  description = Building $project",
+        "",
+    ]
+    names = list()
+    for (name, command, env, deps) in edges:
+        if env:
+            env_args = list()
+            for (k, v) in sorted(env.items()):
+                if v is None:
+                    env_args.append("--unset=%s" % k)
+                else:
+                    env_args.append("%s=%s" % (k, v))
+            command = ["cmake", "-E", "env"] + env_args + command
+        build_line = "build %s: cmake_build" % _escape_path(name)
+        if deps:
+            build_line += " " + " ".join(_escape_path(x) for x in deps)
+        lines.append(build_line)
+        lines.append("  project = %s" % _escape_value(name))
+        lines.append("  cmd = %s" % _escape_value(_to_shell(command)))
+        lines.append("")
+        names.append(name)
+    lines.append("default " + " ".join(_escape_path(x) for x in names))
+    lines.append("")
+    qisys.sh.mkdir(os.path.dirname(ninja_file), recursive=True)
+    return qisys.sh.write_file_if_different("\n".join(lines), ninja_file)
+
+
+def read_ninja_log(ninja_log):
+    """ Return a dict name -> (start, end) in milliseconds since ninja
+    started, from the last time each edge was built
+
+    """
+    res = dict()
+    if not os.path.exists(ninja_log):
+        return res
+    with open(ninja_log, "r") as fp:
+        for line in fp:
+            if line.startswith("#"):
+                continue
+            words = line.rstrip("\n").split("\t")
+            if len(words) < 4:
+                continue
+            try:
+                res[words[3]] = (int(words[0]), int(words[1]))
+            except ValueError:
+                continue
+    return res
+
+
+def _to_shell(command):
+    if os.name == "nt":
+        return subprocess.list2cmdline(command)
+    return " ".join(pipes.quote(x) for x in command)
+
+
+def _escape_path(path):
+    return path.replace("$", "$$").replace(" ", "$ ").replace(":", "$:")
+
+
+def _escape_value(value):
+    return value.replace("$", "$$")
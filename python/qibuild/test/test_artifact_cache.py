@@ -0,0 +1,144 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import os
+import tarfile
+
+import pytest
+
+import qibuild.artifact_cache
+import qibuild.config
+
+
+def test_store_and_restore(tmpdir):
+    cache = qibuild.artifact_cache.ArtifactCache(tmpdir.join("cache").strpath)
+    sdk = tmpdir.mkdir("sdk")
+    sdk.ensure("lib", "libfoo.so", file=True).write("foo")
+    sdk.ensure("qitest.json", file=True)
+    sdk.ensure("share", "qi", "path.conf", file=True)
+    if os.name != "nt":
+        sdk.join("lib", "libfoo.so.1").mksymlinkto("libfoo.so")
+    assert not cache.restore("abcdef", tmpdir.join("other").strpath)
+    cache.store("abcdef", sdk.strpath)
+
+    other = tmpdir.join("other")
+    assert cache.restore("abcdef", other.strpath)
+    assert other.join("lib", "libfoo.so").read() == "foo"
+    if os.name != "nt":
+        assert other.join("lib", "libfoo.so.1").islink()
+    # Generated by qibuild for each worktree, so not stored
+    assert not other.join("qitest.json").check()
+    assert not other.join("share", "qi", "path.conf").check()
+
+
+def test_restore_replaces_sdk(tmpdir):
+    cache = qibuild.artifact_cache.ArtifactCache(tmpdir.join("cache").strpath)
+    sdk = tmpdir.mkdir("sdk")
+    sdk.ensure("lib", "libfoo.so", file=True).write("foo")
+    cache.store("abcdef", sdk.strpath)
+
+    other = tmpdir.mkdir("other")
+    other.ensure("lib", "libstale.so", file=True)
+    other.ensure("qitest.json", file=True).write("[]")
+    assert cache.restore("abcdef", other.strpath)
+    assert other.join("lib", "libfoo.so").check(file=True)
+    assert not other.join("lib", "libstale.so").check()
+    assert other.join("qitest.json").read() == "[]"
+
+
+def _write_archive(cache, key, members):
+    entry_path = cache.get_entry_path(key)
+    if not os.path.isdir(os.path.dirname(entry_path)):
+        os.makedirs(os.path.dirname(entry_path))
+    archive = tarfile.open(entry_path, "w:gz")
+    for member in members:
+        archive.addfile(member)
+    archive.close()
+
+
+def _link(name, linkname, type=tarfile.SYMTYPE):
+    member = tarfile.TarInfo(name)
+    member.type = type
+    member.linkname = linkname
+    return member
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs symlinks")
+@pytest.mark.parametrize("linkname", ["/tmp", "../..", "lib/../../.."])
+def test_restore_rejects_symlinks_outside(tmpdir, linkname):
+    cache = qibuild.artifact_cache.ArtifactCache(tmpdir.join("cache").strpath)
+    outside = tmpdir.mkdir("outside")
+    # A symlink to a directory outside of the sdk, followed by a file
+    # extracted through it
+    evil = _link("evil", linkname)
+    through = tarfile.TarInfo("evil/pwned")
+    _write_archive(cache, "abcdef", [evil, through])
+    sdk = outside.mkdir("sdk")
+    assert not cache.restore("abcdef", sdk.strpath)
+    assert not sdk.join("evil").check()
+    assert not outside.join("pwned").check()
+    assert not tmpdir.join("pwned").check()
+
+
+def test_check_members():
+    check = qibuild.artifact_cache._check_members
+    class FakeArchive(object):
+        def __init__(self, *members):
+            self.members = members
+        def getmembers(self):
+            return self.members
+
+    check(FakeArchive(_link("lib/libfoo.so.1", "libfoo.so"),
+                      _link("lib/libbar.so", "lib/libfoo.so", tarfile.LNKTYPE),
+                      _link("bin/foo", "../lib/foo")))
+    for member in [
+            _link("lib/libfoo.so", "/usr/lib/libfoo.so"),
+            _link("lib/libfoo.so", "../../libfoo.so"),
+            _link("lib/libfoo.so", "../etc/passwd", tarfile.LNKTYPE),
+            _link("lib/libfoo.so", "/etc/passwd", tarfile.LNKTYPE),
+            _link("dev/null", "", tarfile.CHRTYPE),
+            _link("dev/sda", "", tarfile.BLKTYPE),
+            _link("fifo", "", tarfile.FIFOTYPE),
+            tarfile.TarInfo("../foo"),
+            tarfile.TarInfo("/foo")]:
+        with pytest.raises(tarfile.TarError):
+            check(FakeArchive(member))
+
+    # Links through other links: x/a -> x/b/../.. is the parent of the
+    # sdk directory, even if it looks like x/..
+    for members in [
+            [_link("x/b", ".."), _link("x/a", "b/../.."),
+             tarfile.TarInfo("x/a/file")],
+            [_link("x/a", "c/../.."), _link("x/c", ".")],
+            [_link("x/b", "."), _link("x/a", "x/b/../../etc/passwd", tarfile.LNKTYPE)],
+            [_link("x/b", "."), tarfile.TarInfo("x/b/file")]]:
+        with pytest.raises(tarfile.TarError):
+            check(FakeArchive(*members))
+
+
+def test_lru_eviction(tmpdir):
+    cache = qibuild.artifact_cache.ArtifactCache(tmpdir.join("cache").strpath,
+                                                 max_size=1)
+    for (i, key) in enumerate(["aa", "bb", "cc"]):
+        sdk = tmpdir.mkdir("sdk-%s" % key)
+        sdk.join("big").write("x" * 400 * 1024)
+        cache.store(key, sdk.strpath)
+        os.utime(cache.get_entry_path(key), (i, i))
+        if key == "bb":
+            # Using aa makes bb the least recently used entry
+            assert cache.restore("aa", tmpdir.join("restored").strpath)
+            os.utime(cache.get_entry_path("aa"), (10, 10))
+    cache.clean()
+    assert os.path.exists(cache.get_entry_path("aa"))
+    assert not os.path.exists(cache.get_entry_path("bb"))
+    assert os.path.exists(cache.get_entry_path("cc"))
+
+
+def test_get_artifact_cache():
+    qibuild_cfg = qibuild.config.QiBuildConfig()
+    assert qibuild.artifact_cache.get_artifact_cache(qibuild_cfg) is None
+    qibuild_cfg.build.artifact_cache = "/path/to/cache"
+    qibuild_cfg.build.artifact_cache_size = 42
+    cache = qibuild.artifact_cache.get_artifact_cache(qibuild_cfg)
+    assert cache.max_size == 42
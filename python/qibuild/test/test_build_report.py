@@ -0,0 +1,68 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import qibuild.build_report
+
+
+def write_entry(project, start, duration, run_id="run"):
+    qibuild.build_report.add_entry(project, "build", run_id, start, duration)
+
+
+def test_critical_path(build_worktree):
+    # base -> (slow, fast) -> app
+    base = build_worktree.create_project("base")
+    slow = build_worktree.create_project("slow", build_depends=["base"])
+    fast = build_worktree.create_project("fast", build_depends=["base"])
+    app = build_worktree.create_project("app", build_depends=["slow", "fast"])
+    write_entry(base, 100, 2)
+    write_entry(slow, 102, 10)
+    write_entry(fast, 102, 1)
+    write_entry(app, 112, 3)
+    report = qibuild.build_report.BuildReport([base, slow, fast, app])
+    assert report.critical_path == [base, slow, app]
+    assert report.wall_time == 15
+    assert report.total_time == 16
+    gantt = report.get_gantt(15)
+    assert gantt[0] == (base, 0, 2)
+    assert (slow, 2, 10) in gantt
+    assert gantt[-1] == (app, 12, 3)
+
+
+def test_only_last_run(build_worktree):
+    world = build_worktree.create_project("world")
+    hello = build_worktree.create_project("hello", build_depends=["world"])
+    write_entry(world, 100, 50, run_id="old")
+    write_entry(hello, 200, 5, run_id="new")
+    report = qibuild.build_report.BuildReport([world, hello])
+    assert report.run_id == "new"
+    assert report.projects == [hello]
+    assert report.critical_path == [hello]
+
+
+def test_record(build_worktree):
+    world = build_worktree.create_project("world")
+    with qibuild.build_report.record(world, "configure", "run"):
+        pass
+    try:
+        with qibuild.build_report.record(world, "build", "run"):
+            raise Exception("Build failed")
+    except Exception:
+        pass
+    times = qibuild.build_report.read_times(world)
+    assert times["configure"]["status"] == "ok"
+    assert times["build"]["status"] == "failed"
+    assert times["build"]["duration"] >= 0
+
+
+def test_durations_history(build_worktree):
+    world = build_worktree.create_project("world")
+    hello = build_worktree.create_project("hello")
+    assert qibuild.build_report.get_durations([world], "build") == dict()
+    write_entry(world, 100, 10)
+    write_entry(world, 200, 20)
+    qibuild.build_report.add_entry(world, "build", "run", 300, 0.1,
+                                   status="skipped")
+    durations = qibuild.build_report.get_durations([world, hello], "build")
+    # Up to date projects do not change the history
+    assert durations == {"world": 13}
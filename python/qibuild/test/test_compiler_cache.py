@@ -0,0 +1,121 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import os
+import stat
+
+import qisys.command
+import qisys.sh
+import qibuild.build_config
+import qibuild.compiler_cache
+
+import pytest
+
+FAKE_CCACHE = """#!/bin/sh
+stats="$CCACHE_DIR/stats"
+if [ "$1" = "--print-stats" ]; then
+  echo "direct_cache_hit	0"
+  echo "preprocessed_cache_hit	0"
+  echo "cache_miss	$(cat "$stats" 2>/dev/null || echo 0)"
+  exit 0
+fi
+echo $(( $(cat "$stats" 2>/dev/null || echo 0) + 1 )) > "$stats"
+exec "$@"
+"""
+
+
+def write_fake_ccache(tmpdir):
+    bin_dir = tmpdir.mkdir("bin")
+    ccache = bin_dir.join("ccache")
+    ccache.write(FAKE_CCACHE)
+    os.chmod(ccache.strpath, stat.S_IRWXU)
+    return bin_dir.strpath
+
+
+@pytest.fixture
+def fake_ccache(request, tmpdir):
+    if os.name == "nt":
+        pytest.skip("fake ccache is a shell script")
+    bin_dir = write_fake_ccache(tmpdir)
+    def fin():
+        qisys.command._FIND_PROGRAM_CACHE.pop("ccache", None)
+    request.addfinalizer(fin)
+    return bin_dir
+
+
+def test_parse_ccache_stats():
+    out = "\n".join(["cache_miss\t3", "direct_cache_hit\t2",
+                     "preprocessed_cache_hit\t1", "stats_updated_timestamp\t0"])
+    assert qibuild.compiler_cache._parse_ccache_stats(out) == (3, 3)
+
+
+def test_parse_sccache_stats():
+    out = """{"stats": {"cache_hits": {"counts": {"C/C++": 4}},
+                        "cache_misses": {"counts": {"C/C++": 1, "Rust": 1}}}}"""
+    assert qibuild.compiler_cache._parse_sccache_stats(out) == (4, 2)
+
+
+def test_ccache_env():
+    compiler_cache = qibuild.compiler_cache.CompilerCache("ccache", "/usr/bin/ccache",
+        cache_dir="/path/to/cache", max_size="5G", base_dir="/work")
+    env = {"CCACHE_MAXSIZE": "1G"}
+    compiler_cache.setup_env(env)
+    assert env == {"CCACHE_DIR": "/path/to/cache",
+                   "CCACHE_MAXSIZE": "1G",
+                   "CCACHE_BASEDIR": "/work"}
+
+
+def test_cmake_args(build_worktree, fake_ccache, tmpdir):
+    qibuild_xml = qisys.sh.get_config_path("qi", "qibuild.xml")
+    with open(qibuild_xml, "w") as fp:
+        fp.write("""
+<qibuild>
+  <build compiler_cache="ccache" compiler_cache_dir="/global/cache" />
+  <defaults>
+    <env path="%s" />
+  </defaults>
+</qibuild>
+""" % fake_ccache)
+    local_xml = build_worktree.qibuild_xml
+    with open(local_xml, "w") as fp:
+        fp.write("""
+<qibuild version="1">
+  <build compiler_cache_dir="/local/cache" compiler_cache_size="2G" />
+</qibuild>
+""")
+    build_config = qibuild.build_config.CMakeBuildConfig(build_worktree)
+    ccache = os.path.join(fake_ccache, "ccache")
+    assert "-DCMAKE_CXX_COMPILER_LAUNCHER=%s" % ccache in build_config.cmake_args
+    build_env = build_config.build_env
+    assert build_env["CCACHE_DIR"] == "/local/cache"
+    assert build_env["CCACHE_MAXSIZE"] == "2G"
+    assert build_env["CCACHE_BASEDIR"] == build_worktree.root
+
+
+def test_no_compiler_cache(build_worktree, record_messages):
+    qibuild_xml = qisys.sh.get_config_path("qi", "qibuild.xml")
+    with open(qibuild_xml, "w") as fp:
+        fp.write("""<qibuild><build compiler_cache="nosuchcache" /></qibuild>""")
+    build_config = qibuild.build_config.CMakeBuildConfig(build_worktree)
+    assert not any("LAUNCHER" in x for x in build_config.cmake_args)
+    assert record_messages.find("Unknown compiler cache")
+
+
+def test_stats_after_build(qibuild_action, fake_ccache, tmpdir, record_messages):
+    qibuild_xml = qisys.sh.get_config_path("qi", "qibuild.xml")
+    cache_dir = tmpdir.mkdir("cache")
+    with open(qibuild_xml, "w") as fp:
+        fp.write("""
+<qibuild>
+  <build compiler_cache="ccache" compiler_cache_dir="%s" />
+  <defaults>
+    <env path="%s" />
+  </defaults>
+</qibuild>
+""" % (cache_dir.strpath, fake_ccache))
+    qibuild_action.add_test_project("world")
+    qibuild_action("configure", "world")
+    qibuild_action("make", "world")
+    assert cache_dir.join("stats").check(file=True)
+    assert record_messages.find(r"ccache: 0 hits, \d+ misses")
@@ -7,6 +7,8 @@
 """
 
 import os
+import threading
+import time
 import unittest
 from StringIO import StringIO
 
@@ -500,3 +502,26 @@ def test_do_not_leak_default_config(tmpdir):
     assert qibuild_cfg.env.path is None
     assert qibuild_cfg.env.bat_file is None
     assert qibuild_cfg.ide is None
+
+def test_edit_config_keeps_changes_from_others(tmpdir):
+    global_xml = tmpdir.join("global.xml")
+    global_xml.write("""
+<qibuild>
+    <worktree path="/path/to/a" />
+</qibuild>
+""")
+    def add_c():
+        with qibuild.config.edit_config(global_xml.strpath) as other_cfg:
+            other_cfg.add_worktree("/path/to/c")
+    thread = threading.Thread(target=add_c)
+    with qibuild.config.edit_config(global_xml.strpath) as qibuild_cfg:
+        qibuild_cfg.add_worktree("/path/to/b")
+        # The other edit has to wait until this one is written
+        thread.start()
+        time.sleep(0.1)
+        assert thread.is_alive()
+    thread.join()
+    qibuild_cfg = qibuild.config.QiBuildConfig()
+    qibuild_cfg.read(global_xml.strpath)
+    for name in ["a", "b", "c"]:
+        assert "/path/to/" + name in qibuild_cfg.worktrees
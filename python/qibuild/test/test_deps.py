@@ -105,3 +105,16 @@ def test_complex_reverse_deps(build_worktree):
 
     assert deps_solver.get_dep_projects([libworld], ["build", "runtime"],
         reverse=True) == [hello, libhello]
+
+def test_start_longest_chains_first(build_worktree):
+    base = build_worktree.create_project("base")
+    fast = build_worktree.create_project("fast", build_depends=["base"])
+    slow = build_worktree.create_project("slow", build_depends=["base"])
+    app = build_worktree.create_project("app", build_depends=["fast", "slow"])
+    deps_solver = DepsSolver(build_worktree)
+    costs = {"base": 1, "fast": 1, "slow": 10, "app": 1}
+    dep_projects = deps_solver.get_dep_projects([app], ["build"], costs=costs)
+    assert dep_projects == [base, slow, fast, app]
+    costs = {"base": 1, "fast": 10, "slow": 1, "app": 1}
+    dep_projects = deps_solver.get_dep_projects([app], ["build"], costs=costs)
+    assert dep_projects == [base, fast, slow, app]
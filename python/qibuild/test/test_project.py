@@ -1,7 +1,9 @@
 import os
 
 import qisys.qixml
+import qibuild.project
 import qisrc.git
+import qitoolchain
 
 import pytest
 
@@ -14,6 +16,27 @@ def test_dependencies_cmake(build_worktree):
     # cmake projects, so no other assertions here
     assert os.path.exists(dep_cmake)
 
+def test_dependencies_cmake_only_written_when_changed(build_worktree):
+    world_proj = build_worktree.create_project("world")
+    hello_proj = build_worktree.create_project("hello")
+    assert hello_proj.write_dependencies_cmake(list()) is True
+    dep_cmake = os.path.join(hello_proj.build_directory,
+                             "dependencies.cmake")
+    os.utime(dep_cmake, (0, 0))
+    assert hello_proj.write_dependencies_cmake(list()) is False
+    assert os.stat(dep_cmake).st_mtime == 0
+    assert hello_proj.write_dependencies_cmake([world_proj.sdk_directory]) is True
+    assert os.stat(dep_cmake).st_mtime != 0
+
+def test_path_conf_only_written_when_changed(tmpdir):
+    assert qibuild.project.write_qi_path_conf(tmpdir.strpath, ["/a"]) is True
+    path_conf = tmpdir.join("share", "qi", "path.conf")
+    path_conf.setmtime(0)
+    assert qibuild.project.write_qi_path_conf(tmpdir.strpath, ["/a"]) is False
+    assert path_conf.mtime() == 0
+    assert qibuild.project.write_qi_path_conf(tmpdir.strpath, ["/a", "/b"]) is True
+    assert path_conf.read().splitlines()[1:] == ["/a", "/b"]
+
 def test_parse_num_jobs_happy_path(build_worktree):
     hello = build_worktree.create_project("hello")
     assert hello.parse_num_jobs(3, cmake_generator="Unix Makefiles") ==  ["-j", "3"]
@@ -53,3 +76,71 @@ def test_gen_scm_info(build_worktree, tmpdir):
     scm_elem = tree.find("scm")
     git_elem = scm_elem.find("git")
     assert git_elem.get("revision") == sha1
+
+def test_artifact_key_depends_on_compiler(build_worktree):
+    hello_proj = build_worktree.create_project("hello")
+    compiler_dir = os.path.join(hello_proj.build_directory,
+                                "CMakeFiles", "3.0.0")
+    os.makedirs(compiler_dir)
+    compiler_cmake = os.path.join(compiler_dir, "CMakeCXXCompiler.cmake")
+    with open(compiler_cmake, "w") as fp:
+        fp.write('set(CMAKE_CXX_COMPILER "/usr/bin/c++")\n')
+        fp.write('set(CMAKE_CXX_COMPILER_ID "GNU")\n')
+        fp.write('set(CMAKE_CXX_COMPILER_VERSION "4.8.2")\n')
+        fp.write('set(CMAKE_CXX_COMPILER_WORKS TRUE)\n')
+    assert hello_proj.get_compiler_identity() == [
+        "CMAKE_CXX_COMPILER=/usr/bin/c++",
+        "CMAKE_CXX_COMPILER_ID=GNU",
+        "CMAKE_CXX_COMPILER_VERSION=4.8.2"]
+    key = hello_proj.get_artifact_key()
+    with open(compiler_cmake, "w") as fp:
+        fp.write('set(CMAKE_CXX_COMPILER "/usr/bin/clang++")\n')
+    assert hello_proj.get_artifact_key() != key
+
+def test_configure_fingerprint_depends_on_package_versions(build_worktree,
+                                                           toolchains):
+    hello_proj = build_worktree.create_project("hello")
+    toolchains.create("foo")
+    build_worktree.set_active_config("foo")
+    bar_package = toolchains.add_package("foo", "bar")
+    fingerprint = hello_proj.get_configure_fingerprint(list())
+    assert hello_proj.get_configure_fingerprint(list()) == fingerprint
+
+    # Updating a package does not change its path
+    bar_package.version = "r2"
+    toolchain = qitoolchain.get_toolchain("foo")
+    toolchain.add_package(bar_package)
+    assert hello_proj.get_configure_fingerprint(list()) != fingerprint
+
+def test_build_fingerprint_depends_on_package_versions(build_worktree,
+                                                       toolchains):
+    hello_proj = build_worktree.create_project("hello")
+    toolchains.create("foo")
+    build_worktree.set_active_config("foo")
+    bar_package = toolchains.add_package("foo", "bar")
+    fingerprint = hello_proj.get_build_fingerprint("sources",
+                                                   sdk_dirs=[bar_package.path])
+    bar_package.version = "r2"
+    toolchain = qitoolchain.get_toolchain("foo")
+    toolchain.add_package(bar_package)
+    assert hello_proj.get_build_fingerprint("sources",
+                                            sdk_dirs=[bar_package.path]) != fingerprint
+
+def test_artifact_key_depends_on_build_settings(build_worktree, monkeypatch):
+    hello_proj = build_worktree.create_project("hello")
+    os.makedirs(hello_proj.build_directory)
+    with open(hello_proj.cmake_cache, "w") as fp:
+        fp.write("# This is the CMakeCache file.\n"
+                 "//Flags used by the compiler\n"
+                 "CMAKE_CXX_FLAGS:STRING=\n"
+                 "CMAKE_CACHEFILE_DIR:INTERNAL=%s\n" % hello_proj.build_directory)
+    key = hello_proj.get_artifact_key()
+
+    # As done by ccmake
+    with open(hello_proj.cmake_cache, "w") as fp:
+        fp.write("CMAKE_CXX_FLAGS:STRING=-O3\n")
+    cache_key = hello_proj.get_artifact_key()
+    assert cache_key != key
+
+    monkeypatch.setenv("CXXFLAGS", "-march=native")
+    assert hello_proj.get_artifact_key() != cache_key
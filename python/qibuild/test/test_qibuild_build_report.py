@@ -0,0 +1,22 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+def test_build_report(qibuild_action, record_messages, tmpdir):
+    qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("build-report", "hello")
+    assert record_messages.find("No build times recorded yet")
+
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello")
+    record_messages.reset()
+    html = tmpdir.join("report.html")
+    report = qibuild_action("build-report", "hello", "--html", html.strpath)
+    assert [x.name for x in report.critical_path] == ["world", "hello"]
+    assert record_messages.find("Critical path")
+    assert record_messages.find("Timeline")
+    assert "hello" in html.read()
+
+    report = qibuild_action("build-report", "hello", "--phase", "configure")
+    assert [x.name for x in report.projects] == ["world", "hello"]
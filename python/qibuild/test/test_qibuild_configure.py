@@ -28,6 +28,86 @@ def test_deps(qibuild_action):
     qibuild_action("configure", "-a")
 
 
+def test_configure_parallel(qibuild_action):
+    world_proj = qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "-a", "-j", "2")
+    for proj in (world_proj, hello_proj):
+        assert os.path.exists(proj.cmake_cache)
+        configure_log = os.path.join(proj.build_directory, "configure.log")
+        assert os.path.exists(configure_log)
+
+
+def test_configure_parallel_failure(qibuild_action, record_messages):
+    broken_proj = qibuild_action.create_project("broken")
+    qibuild_action.create_project("app", build_depends=["broken"])
+    broken_cmake = os.path.join(broken_proj.path, "CMakeLists.txt")
+    with open(broken_cmake, "a") as fp:
+        fp.write('message(FATAL_ERROR "broken on purpose")\n')
+    # pylint: disable-msg=E1101
+    with pytest.raises(Exception):
+        qibuild_action("configure", "-a", "-j", "2")
+    assert record_messages.find("Failed to configure some projects")
+    assert record_messages.find("broken on purpose")
+    assert record_messages.find(r"app.*\(skipped\)")
+
+
+def test_skip_when_nothing_changed(qibuild_action, record_messages):
+    world_proj = qibuild_action.add_test_project("world")
+    qibuild_action("configure", "world")
+    assert not record_messages.find("Nothing changed since last configure")
+
+    record_messages.reset()
+    qibuild_action("configure", "world")
+    assert record_messages.find("Nothing changed since last configure")
+
+    record_messages.reset()
+    qibuild_action("configure", "world", "--force")
+    assert not record_messages.find("Nothing changed since last configure")
+
+    record_messages.reset()
+    qibuild_action("configure", "world", "-DFOO=BAR")
+    assert not record_messages.find("Nothing changed since last configure")
+    cache = qibuild.cmake.read_cmake_cache(world_proj.cmake_cache)
+    assert cache["FOO"] == "BAR"
+
+    record_messages.reset()
+    cmake_lists = os.path.join(world_proj.path, "CMakeLists.txt")
+    with open(cmake_lists, "a") as fp:
+        fp.write("# changed\n")
+    qibuild_action("configure", "world", "-DFOO=BAR")
+    assert not record_messages.find("Nothing changed since last configure")
+
+
+def test_reconfigure_when_dep_config_changes(qibuild_action):
+    world_proj = qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    with open(hello_proj.configure_fingerprint_path, "r") as fp:
+        fingerprint = fp.read()
+
+    # world-config.cmake is what find_package(world) reads when
+    # configuring hello
+    world_config = os.path.join(world_proj.sdk_directory, "cmake",
+                                "world-config.cmake")
+    with open(world_config, "a") as fp:
+        fp.write("# changed\n")
+    qibuild_action("configure", "hello")
+    with open(hello_proj.configure_fingerprint_path, "r") as fp:
+        assert fp.read() != fingerprint
+
+
+def test_reconfigure_after_failure(qibuild_action, record_messages):
+    use_lib_proj = qibuild_action.add_test_project("uselib")
+    qibuild_action("configure", "uselib")
+    # pylint: disable-msg=E1101
+    with pytest.raises(Exception):
+        qibuild_action("configure", "uselib", "-DSHOULD_FAIL=ON")
+    record_messages.reset()
+    qibuild_action("configure", "uselib")
+    assert not record_messages.find("Nothing changed since last configure")
+
+
 def test_qi_use_lib(qibuild_action):
     use_lib_proj = qibuild_action.add_test_project("uselib")
     qibuild_action("configure", "uselib")
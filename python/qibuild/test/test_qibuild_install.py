@@ -1,8 +1,11 @@
 import sys
 import os
 
+import pytest
+
 import qisys.command
 import qitest.project
+import qibuild.cmake
 import qibuild.find
 
 from qisys.test.conftest import skip_on_win
@@ -187,3 +190,69 @@ def test_do_not_write_tests_twice(qibuild_action, tmpdir):
     tests = qitest.conf.parse_tests(qitest_json.strpath)
     second = len(tests)
     assert first == second
+
+def test_prefix_without_reconfigure(qibuild_action, tmpdir):
+    qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello")
+    qibuild_action("install", "--prefix=/usr", "hello", tmpdir.strpath)
+    assert qibuild.find.find_bin([tmpdir.join("usr").strpath], "hello")
+    assert tmpdir.join("usr", "include", "world", "world.h").check()
+    cache = qibuild.cmake.read_cmake_cache(hello_proj.cmake_cache)
+    assert cache["CMAKE_INSTALL_PREFIX"] == "/"
+
+def test_prefix_with_absolute_destinations(qibuild_action, tmpdir):
+    abs_proj = qibuild_action.create_project("abs")
+    with open(os.path.join(abs_proj.path, "CMakeLists.txt"), "a") as fp:
+        fp.write('install(FILES CMakeLists.txt '
+                 'DESTINATION "${CMAKE_INSTALL_PREFIX}/etc")\n')
+    qibuild_action("configure", "abs")
+    qibuild_action("install", "--prefix=/opt", "abs", tmpdir.strpath)
+    # The destination depends on the configured prefix, so the project
+    # had to be configured again
+    assert tmpdir.join("opt", "etc", "CMakeLists.txt").check()
+    cache = qibuild.cmake.read_cmake_cache(abs_proj.cmake_cache)
+    assert cache["CMAKE_INSTALL_PREFIX"] == "/opt"
+
+def test_parallel_install(qibuild_action, tmpdir):
+    qibuild_action.add_test_project("testme")
+    qibuild_action.add_test_project("world")
+    qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "--all")
+    qibuild_action("make", "--all")
+    dest = tmpdir.join("dest")
+    qibuild_action("install", "--all", "--with-tests", "-j", "3", dest.strpath)
+    assert qibuild.find.find_bin([dest.strpath], "hello")
+    tests = qitest.conf.parse_tests(dest.join("qitest.json").strpath)
+    test_names = [x["name"] for x in tests]
+    assert "zero_test" in test_names
+    assert "ok" in test_names
+
+def test_install_keeps_build_fingerprint(qibuild_action, tmpdir,
+                                         record_messages):
+    qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello")
+    qibuild_action("install", "--prefix=/opt", "hello", tmpdir.strpath)
+    assert os.path.exists(hello_proj.build_fingerprint_path)
+    record_messages.reset()
+    qibuild_action("make", "hello", "--single")
+    assert record_messages.find("Nothing changed since last build")
+
+# pylint: disable-msg=E1101
+@pytest.mark.skipif(not qisys.command.find_program("ninja"),
+                    reason="ninja not found")
+def test_install_keeps_build_fingerprint_ninja(qibuild_action, tmpdir):
+    qibuild_action.add_test_project("world")
+    qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "-G", "Ninja", "hello")
+    qibuild_action("install", "--prefix=/opt", "hello", tmpdir.strpath)
+    assert qibuild.find.find_bin([tmpdir.join("opt").strpath], "hello")
+    # The projects were built during install, with the same fingerprints
+    # as qibuild make
+    qibuild_action("make", "hello")
+    report = qibuild_action("build-report", "hello")
+    assert report.entries["world"]["status"] == "skipped"
+    assert report.entries["hello"]["status"] == "skipped"
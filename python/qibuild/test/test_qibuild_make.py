@@ -1,7 +1,11 @@
 import os
 
 import qisys.command
+import qisys.jobserver
+import qisys.sh
+import qibuild.config
 import qibuild.find
+import qisrc.git
 
 import pytest
 
@@ -33,3 +37,191 @@ def test_running_from_build_dir_incremental(qibuild_action):
     qibuild_action("make", "hello")
     hello = qibuild.find.find_bin([hello_proj.sdk_directory], "hello")
     qisys.command.call([hello])
+
+def test_skip_when_nothing_changed(qibuild_action, record_messages):
+    world_proj = qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello")
+    assert not record_messages.find("Nothing changed since last build")
+
+    record_messages.reset()
+    qibuild_action("make", "hello")
+    assert record_messages.find("Nothing changed since last build")
+
+    record_messages.reset()
+    qibuild_action("make", "hello", "--force")
+    assert not record_messages.find("Nothing changed since last build")
+
+    # Changing world sources should rebuild world, and hello because
+    # the world sdk directory changed
+    record_messages.reset()
+    world_cpp = os.path.join(world_proj.path, "world", "world.cpp")
+    with open(world_cpp, "a") as fp:
+        fp.write("// changed\n")
+    qibuild_action("make", "hello")
+    assert not record_messages.find("Nothing changed since last build")
+
+    # Removing an output should rebuild the project
+    record_messages.reset()
+    hello = qibuild.find.find_bin([hello_proj.sdk_directory], "hello")
+    os.remove(hello)
+    qibuild_action("make", "-s", "hello")
+    assert not record_messages.find("Nothing changed since last build")
+    qisys.command.call([hello])
+
+
+def test_rebuild_when_dep_header_changes(qibuild_action):
+    # Include directories of header-only libraries point to their
+    # sources, so the sdk directory of the dependency does not change
+    headers_proj = qibuild_action.create_project("headers")
+    headers_proj_path = headers_proj.path
+    with open(os.path.join(headers_proj_path, "CMakeLists.txt"), "w") as fp:
+        fp.write("cmake_minimum_required(VERSION 2.8)\n"
+                 "project(headers C)\n"
+                 "find_package(qibuild)\n"
+                 "qi_stage_header_only_lib(headers)\n")
+    headers_h = os.path.join(headers_proj_path, "headers.h")
+    with open(headers_h, "w") as fp:
+        fp.write("#define VALUE 0\n")
+    app_proj = qibuild_action.create_project("app", build_depends=["headers"])
+    with open(os.path.join(app_proj.path, "CMakeLists.txt"), "a") as fp:
+        fp.write("qi_use_lib(app headers)\n")
+    with open(os.path.join(app_proj.path, "main.c"), "w") as fp:
+        fp.write("#include <headers.h>\n"
+                 "int main() { return VALUE; }\n")
+    qibuild_action("configure", "app")
+    qibuild_action("make", "app")
+    app = qibuild.find.find_bin([app_proj.sdk_directory], "app")
+    qisys.command.call([app])
+
+    with open(headers_h, "w") as fp:
+        fp.write("#define VALUE 42\n")
+    qibuild_action("make", "app")
+    rc = qisys.command.call([app], ignore_ret_code=True)
+    assert rc == 42
+
+
+def test_skip_git_project(qibuild_action, record_messages):
+    world_proj = qibuild_action.add_test_project("world")
+    git = qisrc.git.Git(world_proj.path)
+    git.init()
+    git.call("add", ".")
+    git.commit("--message", "initial commit")
+    qibuild_action("configure", "world")
+    qibuild_action("make", "world")
+    record_messages.reset()
+    qibuild_action("make", "world")
+    assert record_messages.find("Nothing changed since last build")
+
+    record_messages.reset()
+    world_cpp = os.path.join(world_proj.path, "world", "world.cpp")
+    with open(world_cpp, "a") as fp:
+        fp.write("// changed\n")
+    qibuild_action("make", "world")
+    assert not record_messages.find("Nothing changed since last build")
+
+    record_messages.reset()
+    qibuild_action("make", "world")
+    assert record_messages.find("Nothing changed since last build")
+
+
+def test_artifact_cache(qibuild_action, tmpdir, record_messages):
+    qibuild_cfg = qibuild.config.QiBuildConfig()
+    qibuild_cfg.read(create_if_missing=True)
+    qibuild_cfg.build.artifact_cache = tmpdir.join("cache").strpath
+    qibuild_cfg.write()
+    world_proj = qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello")
+    assert not record_messages.find("Restored from the artifact cache")
+
+    # Simulate a new build directory with the same inputs
+    record_messages.reset()
+    for proj in (world_proj, hello_proj):
+        qisys.sh.rm(proj.sdk_directory)
+        os.remove(proj.build_fingerprint_path)
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello")
+    assert record_messages.find("Restored from the artifact cache")
+    hello = qibuild.find.find_bin([hello_proj.sdk_directory], "hello")
+    qisys.command.call([hello])
+
+    # Changing world sources should invalidate both entries
+    record_messages.reset()
+    world_cpp = os.path.join(world_proj.path, "world", "world.cpp")
+    with open(world_cpp, "a") as fp:
+        fp.write("// changed\n")
+    qibuild_action("make", "hello")
+    assert not record_messages.find("Restored from the artifact cache")
+
+
+# pylint: disable-msg=E1101
+@pytest.mark.skipif(os.name != "posix", reason="jobserver only supported on POSIX")
+def test_make_uses_jobserver(qibuild_action):
+    world_proj = qibuild_action.add_test_project("world")
+    qibuild_action("configure", "world", "-G", "Unix Makefiles")
+    jobserver = qisys.jobserver.JobServer(2)
+    try:
+        env = dict()
+        assert world_proj.get_jobs_flags(env, jobserver=jobserver) == list()
+        assert "--jobserver-auth" in env["MAKEFLAGS"]
+        world_proj.build(jobserver=jobserver)
+    finally:
+        jobserver.close()
+    # Without jobserver, -j is passed as usual
+    world_proj.build_config.num_jobs = 3
+    assert world_proj.get_jobs_flags(dict()) == ["-j", "3"]
+    # A jobserver from a parent make is used as is
+    env = {"MAKEFLAGS": "-j --jobserver-auth=3,4"}
+    assert world_proj.get_jobs_flags(env) == list()
+
+
+# pylint: disable-msg=E1101
+@pytest.mark.skipif(not qisys.jobserver.ninja_has_jobserver_client(),
+                    reason="ninja >= 1.13 not found")
+def test_superbuild(qibuild_action, record_messages):
+    world_proj = qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello", "--superbuild", "-j", "2")
+    assert qibuild.find.find_bin([hello_proj.sdk_directory], "hello")
+    report = qibuild_action("build-report", "hello")
+    assert [x.name for x in report.critical_path] == ["world", "hello"]
+
+    # Fingerprints are written, so up to date projects are skipped,
+    # with or without --superbuild
+    record_messages.reset()
+    qibuild_action("make", "hello", "--superbuild")
+    assert record_messages.find("Nothing changed since last build")
+    report = qibuild_action("build-report", "hello")
+    assert report.entries["hello"]["status"] == "skipped"
+    record_messages.reset()
+    qibuild_action("make", "hello")
+    assert record_messages.find("Nothing changed since last build")
+
+    # Changing world rebuilds both projects
+    world_cpp = os.path.join(world_proj.path, "world", "world.cpp")
+    with open(world_cpp, "a") as fp:
+        fp.write("// changed\n")
+    record_messages.reset()
+    qibuild_action("make", "hello", "--superbuild")
+    assert record_messages.find("Building 2 projects")
+    report = qibuild_action("build-report", "hello")
+    assert report.entries["world"]["status"] == "ok"
+    assert report.entries["hello"]["status"] == "ok"
+
+
+# pylint: disable-msg=E1101
+@pytest.mark.skipif(not qisys.command.find_program("ninja"),
+                    reason="ninja not found")
+def test_superbuild_needs_ninja_jobserver(qibuild_action, monkeypatch):
+    qibuild_action.add_test_project("world")
+    qibuild_action("configure", "world")
+    # Otherwise each project could run as many jobs as ninja
+    monkeypatch.setattr(qisys.jobserver, "ninja_has_jobserver_client",
+                        lambda env=None: False)
+    with pytest.raises(Exception) as e:
+        qibuild_action("make", "world", "--superbuild", "-j", "2")
+    assert "ninja >= 1.13" in str(e.value)
@@ -0,0 +1,36 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import qibuild.superbuild
+
+
+def test_write_ninja_file(tmpdir):
+    ninja_file = tmpdir.join("superbuild", "build.ninja")
+    edges = [
+        ("world", ["cmake", "--build", "/path/to/world"], dict(), list()),
+        ("hello", ["cmake", "--build", "/path/to/hello world"],
+         {"MAKEFLAGS": "-j --jobserver-auth=3,4", "VERBOSE": None},
+         ["world"]),
+    ]
+    assert qibuild.superbuild.write_ninja_file(ninja_file.strpath, edges)
+    assert not qibuild.superbuild.write_ninja_file(ninja_file.strpath, edges)
+    contents = ninja_file.read()
+    assert "build world: cmake_build\n" in contents
+    assert "build hello: cmake_build world\n" in contents
+    assert "  cmd = cmake -E env 'MAKEFLAGS=-j --jobserver-auth=3,4' " \
+           "--unset=VERBOSE cmake --build '/path/to/hello world'\n" in contents
+    assert contents.endswith("default world hello\n")
+
+
+def test_read_ninja_log(tmpdir):
+    ninja_log = tmpdir.join(".ninja_log")
+    assert qibuild.superbuild.read_ninja_log(ninja_log.strpath) == dict()
+    ninja_log.write("""\
+# ninja log v5
+0\t200\t0\tworld\tf52b340ce6c853de
+0\t250\t0\tworld\tf52b340ce6c853de
+250\t300\t0\thello\t5e041fe8d590e5a1
+""")
+    times = qibuild.superbuild.read_ninja_log(ninja_log.strpath)
+    assert times == {"world": (0, 250), "hello": (250, 300)}
@@ -6,6 +6,7 @@ in the worktree
 """
 
 from qisys import ui
+import qisys.parsers
 import qisrc.parsers
 
 import sys
@@ -16,6 +17,8 @@ def configure_parser(parser):
     group.add_argument("branch")
     group.add_argument("-f", "--force", action="store_true", dest="force",
                         help="Discard local changes. Use with caution")
+    qisys.parsers.jobs_parser(parser,
+                              help="Number of projects to checkout in parallel")
     parser.set_defaults(force=False)
 
 def do(args):
@@ -24,5 +27,12 @@ def do(args):
     manifest = git_worktree.manifest
     groups = manifest.groups
     branch = args.branch
+    ok = git_worktree.check_checkout(branch, force=args.force,
+                                     num_jobs=args.num_jobs)
+    if not ok:
+        sys.exit(1)
     git_worktree.configure_manifest(manifest.url, groups=groups, branch=branch)
-    git_worktree.checkout(branch, force=args.force)
+    ok = git_worktree.checkout(branch, force=args.force,
+                               num_jobs=args.num_jobs)
+    if not ok:
+        sys.exit(1)
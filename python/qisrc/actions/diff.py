@@ -8,6 +8,7 @@ def configure_parser(parser):
     qisys.parsers.project_parser(parser)
     qisrc.parsers.worktree_parser(parser)
     parser.add_argument("branch")
+    qisys.parsers.jobs_parser(parser)
 
 def do(args):
     branch = args.branch
@@ -16,4 +17,5 @@ def do(args):
                                                   default_all=False,
                                                   use_build_deps=True)
     qisrc.diff.diff_worktree(git_worktree, git_projects, branch,
-                             cmd=["diff", "--stat"])
+                             cmd=["diff", "--stat"],
+                             num_jobs=args.num_jobs)
@@ -24,6 +24,11 @@ def configure_parser(parser):
     parser.add_argument("command", metavar="COMMAND", nargs="+")
     parser.add_argument("-c", "--ignore-errors", "--continue",
         action="store_true", help="continue on error")
+    qisys.parsers.jobs_parser(parser, default=1)
+    parser.add_argument("--stream", action="store_true",
+                        help="when using -j, display the output of each "
+                             "project as soon as it is done, instead of "
+                             "in the order of the projects")
     parser.set_defaults(git_only=True)
 
 def do(args):
@@ -36,4 +41,5 @@ def do(args):
         projects = worktree.projects
 
     qisys.actions.foreach(projects, args.command,
-                          ignore_errors=args.ignore_errors)
+                          ignore_errors=args.ignore_errors,
+                          num_jobs=args.num_jobs, stream=args.stream)
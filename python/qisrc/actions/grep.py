@@ -8,13 +8,22 @@ Options are the same as in git grep, e.g.:
 
   qisrc grep -- -niC2 foo
 
+Projects are searched in parallel, and matches are displayed
+as soon as each project is done.
+
 """
 
+import json
 import os
+import re
+import subprocess
 import sys
+import threading
 
 from qisys import ui
-import qisrc.git
+import qisys.command
+import qisys.parallel
+import qisys.parsers
 import qisrc.parsers
 import qibuild.parsers
 
@@ -22,27 +31,49 @@ def configure_parser(parser):
     """Configure parser for this action."""
     qisrc.parsers.worktree_parser(parser)
     qibuild.parsers.project_parser(parser, positional=False)
+    qisys.parsers.jobs_parser(parser,
+                              help="Number of projects to search in parallel. "
+                                   "Defaults to the number of cpus")
     parser.add_argument("--path", help="type of patch to print",
             default="project", choices=['none', 'absolute', 'worktree', 'project'])
+    parser.add_argument("--max-matches", type=int, metavar="N",
+                        help="stop after N matching lines")
+    parser.add_argument("--json", action="store_true",
+                        help="output one JSON object per match, for editors and scripts")
     parser.add_argument("git_grep_opts", metavar="-- git grep options", nargs="*",
                         help="git grep options preceded with -- to escape the leading '-'")
     parser.add_argument("pattern", metavar="PATTERN",
                         help="pattern to be matched")
 
+# Escape sequences added by --color=always
+COLOR_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+class MaxMatchesReached(Exception):
+    """ Used to stop searching when --max-matches is reached """
+    pass
+
 def do(args):
     """Main entry point."""
     git_worktree = qisrc.parsers.get_git_worktree(args)
     git_projects = qisrc.parsers.get_git_projects(git_worktree, args, default_all=True,
                                                   use_build_deps=args.use_deps)
+    git = qisys.command.find_program("git", raises=True)
     git_grep_opts = args.git_grep_opts
-    if args.path == 'none':
+    if args.json:
+        git_grep_opts.extend(["-n", "-I", "--null"])
+    elif args.path == 'none':
         git_grep_opts.append("-h")
     else:
         git_grep_opts.append("-H")
         if args.path == 'absolute' or args.path == 'worktree':
             git_grep_opts.append("-I")
             git_grep_opts.append("--null")
-    if ui.config_color(sys.stdout):
+    # Only matches get a column number, which tells them apart from
+    # context lines
+    use_column = bool(args.max_matches or args.json) and has_column_option(git)
+    if use_column:
+        git_grep_opts.extend(["--column", "--null"])
+    if ui.config_color(sys.stdout) and not args.json:
         git_grep_opts.append("--color=always")
     git_grep_opts.append(args.pattern)
 
@@ -51,27 +82,167 @@ def do(args):
         sys.exit(0)
 
     max_src = max(len(x.src) for x in git_projects)
-    retcode = 1
-    for i, project in enumerate(git_projects):
-        ui.info_count(i, len(git_projects),
-                      ui.green, "Looking in",
-                      ui.blue, project.src.ljust(max_src),
-                      end="\r")
-        git = qisrc.git.Git(project.path)
-        (status, out) = git.call("grep", *git_grep_opts, raises=False)
-        if out != "":
-            if args.path == 'absolute' or args.path == 'worktree':
-                lines = out.splitlines()
-                out_lines = list()
-                for line in lines:
-                    line_split = line.split('\0')
-                    prepend = project.src if args.path == 'worktree' else project.path
-                    line_split[0] = os.path.join(prepend, line_split[0])
-                    out_lines.append(":".join(line_split))
-                out = '\n'.join(out_lines)
-            ui.info("\n", ui.reset, out)
+    found = list()
+    done = list()
+    printed = list()
+    matches = list()
+    # git processes still running, killed when --max-matches is reached
+    processes = set()
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def grep(project):
+        with lock:
+            if stopped.is_set():
+                return (None, "")
+            process = subprocess.Popen([git, "grep"] + git_grep_opts,
+                                       cwd=project.path,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT)
+            processes.add(process)
+        out = process.communicate()[0]
+        with lock:
+            processes.discard(process)
+        return (process.returncode, out.rstrip("\n"))
+
+    def stop():
+        with lock:
+            stopped.set()
+            for process in processes:
+                try:
+                    process.terminate()
+                except OSError:
+                    # Already finished
+                    pass
+
+    def on_result(_, project, res):
+        (status, out) = res
+        if not args.json:
+            ui.info_count(len(done), len(git_projects),
+                          ui.green, "Looking in",
+                          ui.blue, project.src.ljust(max_src),
+                          end="\r")
+        done.append(project)
         if status == 0:
-            retcode = 0
-    if not out:
+            found.append(project)
+        if not out:
+            return
+        lines = out.splitlines()
+        if use_column:
+            (fields, flags) = parse_column_output(lines)
+        else:
+            # Every line is counted as a match
+            fields = [x.split("\0") for x in lines]
+            flags = [True] * len(lines)
+        if args.max_matches:
+            (fields, flags) = limit_matches(fields, flags,
+                                            args.max_matches - len(matches))
+        matches.extend(x for (x, flag) in zip(fields, flags) if flag)
+        printed.extend(fields)
+        if args.json:
+            for (line_fields, flag) in zip(fields, flags):
+                if not flag:
+                    continue
+                match = json_match(project, "\0".join(line_fields))
+                if match:
+                    sys.stdout.write(json.dumps(match) + "\n")
+        else:
+            out_lines = list()
+            for (line_fields, flag) in zip(fields, flags):
+                if len(line_fields) > 1 and \
+                        (args.path == 'absolute' or args.path == 'worktree'):
+                    prepend = project.src if args.path == 'worktree' else project.path
+                    line_fields[0] = os.path.join(prepend, line_fields[0])
+                # Same separators as git grep without --null
+                out_lines.append((":" if flag else "-").join(line_fields))
+            ui.info("\n", ui.reset, "\n".join(out_lines))
+        if args.max_matches and len(matches) >= args.max_matches:
+            stop()
+            raise MaxMatchesReached()
+
+    # Matches are displayed as soon as each project is done
+    try:
+        qisys.parallel.run(grep, git_projects, num_jobs=args.num_jobs,
+                           on_result=on_result)
+    except MaxMatchesReached:
+        pass
+    if not printed and not args.json:
         ui.info(ui.reset)
-    sys.exit(retcode)
+    if found:
+        sys.exit(0)
+    sys.exit(1)
+
+def has_column_option(git):
+    """ Whether git grep knows --column (git >= 2.19) """
+    try:
+        out = qisys.command.check_output([git, "--version"])
+        version = tuple(int(x) for x in out.split()[2].split(".")[:2])
+    except (qisys.command.CommandFailedException, OSError,
+            IndexError, ValueError):
+        return False
+    return version >= (2, 19)
+
+def parse_column_output(lines):
+    """ Split the lines of ``git grep --column --null`` output in
+    fields, and tell which lines are matches, and not context lines
+    or separators.
+
+    Only matches have a column number, so they have one field more
+    than the other lines. The column numbers are removed from the
+    returned fields
+
+    Return a tuple (fields, flags)
+
+    """
+    fields = [x.split("\0") for x in lines]
+    counts = [len(x) for x in fields]
+    if len(set(counts)) == 1:
+        # No context lines
+        flags = [True] * len(lines)
+    else:
+        flags = [x == max(counts) for x in counts]
+    for (line_fields, flag) in zip(fields, flags):
+        if flag and len(line_fields) > 1 and \
+                COLOR_RE.sub("", line_fields[-2]).isdigit():
+            del line_fields[-2]
+    return (fields, flags)
+
+def limit_matches(lines, flags, max_matches):
+    """ Keep the lines up to the ``max_matches``-th match, and return
+    the kept lines and flags
+
+    The context lines after the last match are dropped, since they
+    can not be told apart from the context of the next match
+
+    """
+    count = 0
+    for (i, flag) in enumerate(flags):
+        if not flag:
+            continue
+        count += 1
+        if count == max_matches:
+            return (lines[:i + 1], flags[:i + 1])
+    return (lines, flags)
+
+def json_match(project, line):
+    """ Convert a line of ``git grep -n --null`` output to a dict.
+    Return None for lines that are not matches
+
+    """
+    line_split = line.split('\0', 2)
+    if len(line_split) == 3:
+        (filename, line_number, text) = line_split
+    elif len(line_split) == 2 and ":" in line_split[1]:
+        # Older git versions only use \0 after the file name
+        filename = line_split[0]
+        (line_number, text) = line_split[1].split(":", 1)
+    else:
+        return None
+    if not line_number.isdigit():
+        return None
+    return {
+        "project" : project.src,
+        "path" : os.path.join(project.src, filename),
+        "line" : int(line_number),
+        "text" : text,
+    }
@@ -8,6 +8,7 @@ def configure_parser(parser):
     qisys.parsers.project_parser(parser)
     qisrc.parsers.worktree_parser(parser)
     parser.add_argument("branch")
+    qisys.parsers.jobs_parser(parser)
     parser.add_argument("--short", action="store_true")
     parser.set_defaults(short=False)
 
@@ -23,4 +24,5 @@ def do(args):
     git_projects = qisrc.parsers.get_git_projects(git_worktree, args,
                                                   default_all=False,
                                                   use_build_deps=True)
-    qisrc.diff.diff_worktree(git_worktree, git_projects, branch, log_cmd)
+    qisrc.diff.diff_worktree(git_worktree, git_projects, branch, log_cmd,
+                             num_jobs=args.num_jobs)
@@ -0,0 +1,72 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Run git housekeeping on every project, in parallel
+
+Remove stale remote-tracking refs, pack loose objects, and write
+multi-pack-index and commit-graph files, so that git commands run
+by qisrc stay fast.
+
+"""
+
+import sys
+
+from qisys import ui
+import qisys.parallel
+import qisys.parsers
+import qisrc.maintenance
+import qisrc.parsers
+import qisrc.worktree
+
+
+def configure_parser(parser):
+    """Configure parser for this action """
+    qisys.parsers.worktree_parser(parser)
+    qisys.parsers.project_parser(parser)
+    qisys.parsers.jobs_parser(parser,
+                              help="Number of projects to process in parallel. "
+                                   "Defaults to the number of cpus")
+    parser.add_argument("--no-prune", action="store_false",
+                        dest="prune_remotes",
+                        help="Do not remove stale remote-tracking refs. "
+                             "Use this to work offline")
+    parser.set_defaults(prune_remotes=True)
+
+def do(args):
+    """Main entry point"""
+    git_worktree = qisrc.parsers.get_git_worktree(args)
+    git_projects = qisrc.parsers.get_git_projects(git_worktree, args,
+                                                  default_all=True)
+    if not git_projects:
+        qisrc.worktree.on_no_matching_projects(git_worktree, groups=args.groups)
+        return
+
+    ui.info(ui.green, ":: Running maintenance ...")
+    max_src = max(len(x.src) for x in git_projects)
+    n = len(git_projects)
+    done = list()
+    failed = list()
+    def on_result(_, git_project, res):
+        reclaimed = qisrc.maintenance.format_size(res.reclaimed)
+        size = qisrc.maintenance.format_size(res.size_after)
+        ui.info_count(len(done), n, ui.blue, git_project.src.ljust(max_src),
+                      ui.reset, size, ui.green, "(%s reclaimed)" % reclaimed)
+        done.append(git_project)
+        if not res.ok:
+            failed.append((git_project.src, res.errors))
+
+    results = qisys.parallel.run(
+        lambda x: qisrc.maintenance.maintain(x, prune_remotes=args.prune_remotes),
+        git_projects, num_jobs=args.num_jobs, on_result=on_result)
+    total = sum(x.reclaimed for x in results)
+    ui.info(ui.green, "Total reclaimed:",
+            ui.reset, qisrc.maintenance.format_size(total))
+    if not failed:
+        return
+    ui.error("Maintenance failed for some projects")
+    for (src, errors) in failed:
+        ui.info(ui.green, " * ", ui.reset, ui.blue, src)
+        for error in errors:
+            ui.info(ui.indent(error, num=2))
+    sys.exit(1)
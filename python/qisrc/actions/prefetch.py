@@ -0,0 +1,61 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Fetch the remotes of every project, in parallel, without touching
+branches or working trees
+
+Commits are stored in refs/prefetch/<remote>/<branch>, so it is safe
+to run this from a cron job, and a later ``qisrc sync --fast``
+will not have to download anything.
+
+"""
+
+import sys
+
+from qisys import ui
+import qisys.parallel
+import qisys.parsers
+import qisrc.parsers
+import qisrc.worktree
+
+
+def configure_parser(parser):
+    """Configure parser for this action """
+    qisys.parsers.worktree_parser(parser)
+    qisys.parsers.project_parser(parser)
+    qisys.parsers.jobs_parser(parser, default=8,
+                              help="Number of projects to fetch in parallel")
+
+def do(args):
+    """Main entry point"""
+    git_worktree = qisrc.parsers.get_git_worktree(args)
+    git_projects = qisrc.parsers.get_git_projects(git_worktree, args,
+                                                  default_all=True)
+    if not git_projects:
+        qisrc.worktree.on_no_matching_projects(git_worktree, groups=args.groups)
+        return
+
+    ui.info(ui.green, ":: Prefetching projects ...")
+    max_src = max(len(x.src) for x in git_projects)
+    n = len(git_projects)
+    done = list()
+    failed = list()
+    def on_result(_, git_project, res):
+        (ok, out) = res
+        ui.info_count(len(done), n,
+                      ui.blue, git_project.src.ljust(max_src), end="\r")
+        done.append(git_project)
+        if not ok:
+            failed.append((git_project.src, out))
+
+    qisys.parallel.run(lambda x: x.prefetch(), git_projects,
+                       num_jobs=args.num_jobs, on_result=on_result)
+    ui.info(" " * (max_src + 12), end="\r")
+    if not failed:
+        return
+    ui.error("Failed to fetch some projects")
+    for (src, out) in failed:
+        ui.info(ui.green, " * ", ui.reset, ui.blue, src)
+        ui.info(ui.indent(out, num=2))
+    sys.exit(1)
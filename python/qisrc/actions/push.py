@@ -8,8 +8,10 @@
 import sys
 
 from qisys import ui
-import qisys
-import qisrc
+import qisys.parsers
+import qisrc.git
+import qisrc.parsers
+import qisrc.review
 
 def configure_parser(parser):
     """Configure parser for this action """
@@ -24,6 +26,8 @@ def configure_parser(parser):
              "if the domain is the same as yours)")
     parser.add_argument("-t", "--topic", dest="topic",
         help="Add a topic to your code review. Useful for grouping patches together")
+    qisys.parsers.jobs_parser(parser, default=8,
+                              help="Number of projects to push in parallel")
     parser.set_defaults(review=True, dry_run=False)
 
 
@@ -31,19 +35,56 @@ def do(args):
     """ Main entry point """
     git_worktree = qisrc.parsers.get_git_worktree(args)
     git_projects = qisrc.parsers.get_git_projects(git_worktree, args)
+    branches = dict()
     for git_project in git_projects:
         git = qisrc.git.Git(git_project.path)
         current_branch = git.get_current_branch()
         if not current_branch:
             ui.error("Not currently on any branch")
             sys.exit(2)
+        branches[git_project.src] = current_branch
+    env = qisrc.review.get_ssh_env()
+
+    def push_project(git_project):
+        current_branch = branches[git_project.src]
+        if git_project.review:
+            return qisrc.review.push(git_project, current_branch,
+                                     bypass_review=(not args.review),
+                                     dry_run=args.dry_run,
+                                     reviewers=args.reviewers,
+                                     topic=args.topic, env=env)
+        git = qisrc.git.Git(git_project.path)
+        push_args = list()
+        if args.dry_run:
+            push_args.append("-n")
+        (rc, out) = git.push(*push_args, raises=False, env=env)
+        return (rc == 0, out)
+
+    def get_url(git_project):
         if git_project.review:
-            qisrc.review.push(git_project, current_branch,
-                              bypass_review=(not args.review),
-                              dry_run=args.dry_run, reviewers=args.reviewers,
-                              topic=args.topic)
+            return git_project.review_remote.url
+        if git_project.default_remote:
+            return git_project.default_remote.url
+        return ""
+
+    failed = list()
+    def on_result(_, git_project, res):
+        (ok, out) = res
+        if ok:
+            ui.info(ui.green, " * ", ui.reset, ui.blue, git_project.src)
+            if out:
+                ui.info(ui.indent(out, num=2))
         else:
-            if args.dry_run:
-                git.push("-n")
-            else:
-                git.push()
+            failed.append((git_project.src, out))
+
+    if git_projects:
+        ui.info(ui.green, ":: Pushing projects ...")
+    qisrc.review.run_by_ssh_host(push_project, git_projects, get_url,
+                                 num_jobs=args.num_jobs, on_result=on_result)
+    if not failed:
+        return
+    ui.error("Failed to push some projects")
+    for (src, out) in failed:
+        ui.info(ui.green, " * ", ui.reset, ui.blue, src)
+        ui.info(ui.indent(out, num=2))
+    sys.exit(1)
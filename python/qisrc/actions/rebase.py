@@ -17,6 +17,8 @@ def configure_parser(parser):
                         help="Dry run")
     parser.add_argument("--force-run", action="store_false", dest="dry_run",
                         help="Use push --force. Use with caution.")
+    qisys.parsers.jobs_parser(parser,
+                              help="Number of projects to process in parallel")
     parser.set_defaults(branch="master", push=False, dry_run=True)
 
 def do(args):
@@ -31,4 +33,5 @@ def do(args):
                                                   use_build_deps=True)
 
     qisrc.rebase.rebase_worktree(git_worktree, git_projects, branch,
-                                 push=push, dry_run=dry_run, verbose=verbose)
+                                 push=push, dry_run=dry_run, verbose=verbose,
+                                 num_jobs=args.num_jobs)
@@ -11,6 +11,7 @@ By default, make sure the repository is on the correct branch
 import sys
 
 from qisys import ui
+import qisys.parallel
 import qisys.parsers
 import qisys.worktree
 import qisys.interact
@@ -29,6 +30,9 @@ def configure_parser(parser):
     parser.add_argument("--tag", help="Reset everything to the given tag")
     parser.add_argument("--snapshot", help="Reset everything using the given "
                         "snapshot")
+    qisys.parsers.jobs_parser(parser,
+                              help="Number of projects to reset in parallel. "
+                                   "Defaults to the number of cpus")
 
 def do(args):
     """Main entry points."""
@@ -46,37 +50,21 @@ def do(args):
                                                   default_all=True,
                                                   use_build_deps=True)
     errors = list()
-    for i, git_project in enumerate(git_projects):
+
+    def reset(git_project):
+        return reset_project(git_project, snapshot=snapshot,
+                             tag=args.tag, force=args.force)
+
+    def on_result(i, git_project, res):
+        (ok, message) = res
         ui.info_count(i, len(git_projects), "Reset", git_project.src)
-        src = git_project.src
-        git = qisrc.git.Git(git_project.path)
-        ok, message = git.require_clean_worktree()
-        if not ok and not args.force:
+        if message:
             ui.warning(message)
-            errors.append(src)
-            continue
-        git.checkout(".")
-        if not git_project.default_branch:
-            ui.warning(git_project.src, "not in any manifest, skipping")
-            continue
-        branch = git_project.default_branch.name
-        remote = git_project.default_remote.name
-        git.safe_checkout(branch, remote, force=True)
-
-        to_reset = None
-        if args.snapshot:
-            to_reset = snapshot.refs.get(src)
-            if not to_reset:
-                ui.warning(src, "not found in the snapshot")
-                continue
-        elif args.tag:
-            to_reset = args.tag
-        else:
-            to_reset = "%s/%s" % (remote, branch)
-        try:
-            qisrc.reset.clever_reset_ref(git_project, to_reset)
-        except:
-            errors.append(src)
+        if ok is False:
+            errors.append(git_project.src)
+
+    qisys.parallel.run(reset, git_projects, num_jobs=args.num_jobs,
+                       on_result=on_result, ordered=True)
 
     if not errors:
         return
@@ -85,6 +73,40 @@ def do(args):
         ui.info(ui.red, " * ", error)
     sys.exit(1)
 
+def reset_project(git_project, snapshot=None, tag=None, force=False):
+    """ Reset one project.
+
+    Return a tuple (ok, message) where ok is either True, False
+    in case of error, or None if the project was skipped
+
+    """
+    src = git_project.src
+    git = qisrc.git.Git(git_project.path)
+    ok, message = git.require_clean_worktree()
+    if not ok and not force:
+        return False, message
+    git.checkout("--quiet", ".")
+    if not git_project.default_branch:
+        return None, "%s not in any manifest, skipping" % src
+    branch = git_project.default_branch.name
+    remote = git_project.default_remote.name
+    git.safe_checkout(branch, remote, force=True)
+
+    to_reset = None
+    if snapshot:
+        to_reset = snapshot.refs.get(src)
+        if not to_reset:
+            return None, "%s not found in the snapshot" % src
+    elif tag:
+        to_reset = tag
+    else:
+        to_reset = "%s/%s" % (remote, branch)
+    try:
+        qisrc.reset.clever_reset_ref(git_project, to_reset)
+    except Exception as e:
+        return False, str(e)
+    return True, None
+
 def reset_manifest(git_worktree, snapshot, groups=None):
     manifest = snapshot.manifest
     if not groups:
@@ -20,6 +20,9 @@ def configure_parser(parser):
         "Use `qisrc reset --force --snapshot snapshot_path` to load a snapshot" )
     group.add_argument("--deprecated-format", action="store_true",
                        help="Only used for retro-compatibility")
+    qisys.parsers.jobs_parser(parser,
+                              help="Number of projects to inspect in parallel. "
+                                   "Defaults to the number of cpus")
     parser.set_defaults(deprecated_format=False)
 
 
@@ -29,4 +32,5 @@ def do(args):
     ui.info(ui.green, "Current worktree:", ui.reset, ui.bold, git_worktree.root)
     snapshot_path = args.snapshot_path
     qisrc.snapshot.generate_snapshot(git_worktree, snapshot_path,
-                                     deprecated_format=args.deprecated_format)
+                                     deprecated_format=args.deprecated_format,
+                                     num_jobs=args.num_jobs)
@@ -9,6 +9,8 @@ import sys
 
 from qisys import ui
 import qisys
+import qisys.parallel
+import qisys.parsers
 import qisrc.parsers
 import qisrc.status
 
@@ -17,6 +19,9 @@ def configure_parser(parser):
     """Configure parser for this action """
     qisys.parsers.worktree_parser(parser)
     qisys.parsers.project_parser(parser)
+    qisys.parsers.jobs_parser(parser,
+                              help="Number of projects to check in parallel. "
+                                   "Defaults to the number of cpus")
     group = parser.add_argument_group("qisrc status options")
     group.add_argument("--untracked-files", "-u",
         dest="untracked_files",
@@ -35,18 +40,22 @@ def do(args):
 
     num_projs = len(git_projects)
     max_len = max(len(p.src) for p in git_projects)
-    state_projects = list()
+    checked = list()
 
-    for (i, git_project) in enumerate(git_projects, start = 1):
+    def on_result(_, git_project, state_project):
+        checked.append(state_project)
         if sys.stdout.isatty():
             src = git_project.src
-            to_write = "Checking (%d/%d) " % (i, num_projs)
+            to_write = "Checking (%d/%d) " % (len(checked), num_projs)
             to_write += src.ljust(max_len)
             sys.stdout.write(to_write + "\r")
             sys.stdout.flush()
 
-        state_project = qisrc.status.check_state(git_project, args.untracked_files)
-        state_projects.append(state_project)
+    # Results are returned in the order of the projects, whatever
+    # the order in which the checks finished
+    state_projects = qisys.parallel.run(
+        lambda x: qisrc.status.check_state(x, args.untracked_files),
+        git_projects, num_jobs=args.num_jobs, on_result=on_result)
 
     if sys.stdout.isatty():
         ui.info("Checking (%d/%d):" % (num_projs, num_projs), "done",
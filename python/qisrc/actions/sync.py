@@ -26,6 +26,9 @@ def configure_parser(parser):
     group = parser.add_argument_group("qisrc sync options")
     group.add_argument("--rebase-devel", action="store_true",
                        help="Rebase development branches. Advanced users only")
+    group.add_argument("--fast", action="store_true",
+                       help="Compare remote tips first, and skip fetching and "
+                            "rebasing projects that did not change")
 
 def print_overview(total, skipped, failed):
     out = [ ui.green, "Success:", ui.white, total - skipped - failed ]
@@ -45,7 +48,7 @@ def print_overview(total, skipped, failed):
 def do(args):
     """Main entry point"""
     git_worktree = qisrc.parsers.get_git_worktree(args)
-    sync_ok = git_worktree.sync()
+    sync_ok = git_worktree.sync(fast=args.fast)
     git_projects = qisrc.parsers.get_git_projects(git_worktree, args,
                                                   default_all=True,
                                                   use_build_deps=True)
@@ -61,7 +64,8 @@ def do(args):
         ui.info_count(i, len(git_projects),
                       ui.blue, git_project.src.ljust(max_src), end="\r")
 
-        (status, out) = git_project.sync(rebase_devel=args.rebase_devel)
+        (status, out) = git_project.sync(rebase_devel=args.rebase_devel,
+                                         fast=args.fast)
         if status is None:
             ui.info("\n", ui.brown, "  [skipped]")
             skipped.append((git_project.src, out))
@@ -0,0 +1,188 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Read HEAD, refs and config directly from a .git directory,
+without spawning any git process
+
+Only the common layout is supported (a .git directory with loose refs
+and a packed-refs file). For anything else, :py:class:`Unsupported` is
+raised, and the caller should fall back to calling git.
+
+"""
+
+import os
+import re
+
+
+class Unsupported(Exception):
+    """ Raised when the repository can not be read without calling git """
+    pass
+
+
+SHA1_RE = re.compile(r"^[0-9a-f]{40}$")
+
+
+def get_git_dir(repo):
+    """ Return the path to the .git directory of the repository.
+
+    Raise Unsupported for anything unusual (.git file used by
+    submodules and worktrees, reftable backend, ...)
+
+    """
+    git_dir = os.path.join(repo, ".git")
+    if not os.path.isdir(git_dir):
+        raise Unsupported()
+    if os.path.exists(os.path.join(git_dir, "reftable")):
+        raise Unsupported()
+    if os.path.exists(os.path.join(git_dir, "commondir")):
+        raise Unsupported()
+    return git_dir
+
+
+def read_head(repo):
+    """ Read .git/HEAD
+
+    :returns: a tuple (ref, sha1): ref is the full name of the
+              branch HEAD points to, or None if HEAD is detached,
+              in which case sha1 is set
+
+    """
+    git_dir = get_git_dir(repo)
+    contents = _read_file(os.path.join(git_dir, "HEAD"))
+    if contents is None:
+        raise Unsupported()
+    if contents.startswith("ref: "):
+        return (contents[5:].strip(), None)
+    if SHA1_RE.match(contents):
+        return (None, contents)
+    raise Unsupported()
+
+
+def resolve_ref(repo, ref):
+    """ Return the sha1 of a full ref name (refs/heads/master, ...),
+    looking in the loose refs first, then in packed-refs.
+    None if the ref does not exist.
+
+    """
+    if not ref.startswith("refs/"):
+        raise Unsupported()
+    git_dir = get_git_dir(repo)
+    contents = _read_file(os.path.join(git_dir, *ref.split("/")))
+    if contents is not None:
+        if SHA1_RE.match(contents):
+            return contents
+        # symbolic refs and other exotic things
+        raise Unsupported()
+    return read_packed_refs(git_dir).get(ref)
+
+
+def read_packed_refs(git_dir):
+    """ Parse .git/packed-refs and return a dict ref -> sha1 """
+    res = dict()
+    packed_refs = os.path.join(git_dir, "packed-refs")
+    if not os.path.exists(packed_refs):
+        return res
+    with open(packed_refs, "r") as fp:
+        for line in fp:
+            # Skip comments and peeled tags
+            if line.startswith(("#", "^")):
+                continue
+            words = line.split()
+            if len(words) != 2 or not SHA1_RE.match(words[0]):
+                raise Unsupported()
+            res[words[1]] = words[0]
+    return res
+
+
+def read_config(repo):
+    """ Parse .git/config and return a dict name -> value, where
+    names are normalized the same way git does, for instance
+    ``branch.master.remote``.
+
+    Note: only the config of the repository is read, not the global
+    or the system one. Values that are not trivial to parse (quoted
+    values, ...) are not in the dict either.
+
+    """
+    git_dir = get_git_dir(repo)
+    config_path = os.path.join(git_dir, "config")
+    if not os.path.exists(config_path):
+        raise Unsupported()
+    res = dict()
+    section = None
+    with open(config_path, "r") as fp:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith(("#", ";")):
+                continue
+            if line.startswith("["):
+                section = _parse_section(line)
+                if section.split(".")[0] in ("include", "includeif"):
+                    raise Unsupported()
+                continue
+            if section is None:
+                raise Unsupported()
+            if line.endswith("\\"):
+                # Line continuation
+                raise Unsupported()
+            if "=" in line:
+                (key, value) = line.split("=", 1)
+                value = _parse_value(value)
+            else:
+                # Boolean shortcut
+                (key, value) = (line, None)
+            name = "%s.%s" % (section, key.strip().lower())
+            if value is None:
+                # Leave it to git
+                res.pop(name, None)
+            else:
+                res[name] = value
+    return res
+
+
+def _parse_section(line):
+    """ Parse a [section "subsection"] line """
+    match = re.match(r'^\[\s*([\w.-]+)\s*(?:"((?:[^"\\]|\\.)*)")?\s*\]$', line)
+    if not match:
+        raise Unsupported()
+    (name, subsection) = match.groups()
+    name = name.lower()
+    if subsection is None:
+        return name
+    subsection = re.sub(r"\\(.)", r"\1", subsection)
+    return "%s.%s" % (name, subsection)
+
+
+def _parse_value(value):
+    """ Handle escapes and comments in a config value.
+    Return None for values git should parse itself
+
+    """
+    res = ""
+    chars = iter(value)
+    escapes = {"n": "\n", "t": "\t", "b": "\b", "\\": "\\"}
+    for char in chars:
+        if char == '"':
+            return None
+        if char == "\\":
+            escaped = next(chars, None)
+            if escaped not in escapes:
+                return None
+            res += escapes[escaped]
+        elif char in "#;":
+            break
+        else:
+            res += char
+    return res.strip()
+
+
+def _read_file(path):
+    """ Return the stripped contents of a file, or None if it
+    does not exist
+
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as fp:
+        return fp.read().strip()
@@ -14,6 +14,7 @@ import functools
 from qisys import ui
 import qisys
 import qisys.command
+import qisrc.dot_git
 
 class Git(object):
     """ The Git represent a git tree """
@@ -93,6 +94,13 @@ class Git(object):
         Return None if not found
 
         """
+        try:
+            value = qisrc.dot_git.read_config(self.repo).get(_normalize_config_name(name))
+            if value is not None:
+                return value
+        except qisrc.dot_git.Unsupported:
+            pass
+        # Not in .git/config, but may be in the global config
         (status, out) = self.config("--get", name, raises=False)
         if status != 0:
             return None
@@ -117,6 +125,12 @@ class Git(object):
         git symbolic-ref HEAD
         else: git name-rev --name-only --always HEAD
         """
+        if ref == "HEAD":
+            try:
+                (symbolic_ref, _) = qisrc.dot_git.read_head(self.repo)
+                return symbolic_ref
+            except qisrc.dot_git.Unsupported:
+                pass
         (status, out) = self.call("symbolic-ref", ref, raises=False)
         lines = out.splitlines()
         if len(lines) < 1:
@@ -396,12 +410,46 @@ class Git(object):
 
     def get_ref_sha1(self, ref):
         """Return the sha1 from a ref. None if not found."""
+        try:
+            return qisrc.dot_git.resolve_ref(self.repo, ref)
+        except qisrc.dot_git.Unsupported:
+            pass
         (ret, sha1) = self.call("show-ref", "--verify", "--hash",
                                ref, raises=False)
 
         if ret == 0:
             return sha1
 
+    def get_remote_sha1(self, remote, branch):
+        """ Return the sha1 of the given branch on the given remote,
+        as reported by ``git ls-remote``, without fetching anything.
+        None if not found.
+
+        """
+        ref = "refs/heads/%s" % branch
+        (ret, out) = self.call("ls-remote", "--heads", remote, ref,
+                               raises=False)
+        if ret != 0:
+            return None
+        for line in out.splitlines():
+            words = line.split()
+            if len(words) == 2 and words[1] == ref:
+                return words[0]
+
+    def prefetch(self, remote):
+        """ Fetch every branch of the remote in refs/prefetch/<remote>/,
+        leaving local branches, remote-tracking refs and the working
+        tree untouched
+
+        Return a tuple (retcode, output)
+
+        """
+        refspec = "+refs/heads/*:refs/prefetch/%s/*" % remote
+        # Empty --refmap: do not update remote-tracking refs as a side
+        # effect of giving an explicit refspec
+        return self.fetch("--quiet", "--no-tags", "--prune", "--refmap=",
+                          remote, refspec, raises=False)
+
     def sync_branch_devel(self, local_branch, master_branch, fetch_first=True):
         """ Make sure master stays compatible with your development branch
         Checks if your local master branch can be fast-forwarded to remote
@@ -439,6 +487,20 @@ class Git(object):
         return True, "Fast-forwarded %s. Feel free to rebase on %s" % \
                                         ((master_branch.name,) * 2)
 
+    def get_current_sha1(self):
+        """ Return the sha1 HEAD points to. None if not found """
+        try:
+            (symbolic_ref, sha1) = qisrc.dot_git.read_head(self.repo)
+            if symbolic_ref:
+                sha1 = qisrc.dot_git.resolve_ref(self.repo, symbolic_ref)
+            if sha1:
+                return sha1
+        except qisrc.dot_git.Unsupported:
+            pass
+        (ret, out) = self.call("rev-parse", "HEAD", raises=False)
+        if ret == 0:
+            return out.strip()
+
     def get_log(self, before_ref, after_ref):
         """ Return a list of commits between two refspecs, in
         natural order (most recent commits last)
@@ -560,6 +622,23 @@ def is_submodule(path):
         return True
 
 
+def _normalize_config_name(name):
+    """ Section and key names are case-insensitive,
+    but not subsection names
+
+    >>> _normalize_config_name("Branch.Foo.Remote")
+    'branch.Foo.remote'
+
+    """
+    if not "." in name:
+        return name.lower()
+    (section, rest) = name.split(".", 1)
+    if not "." in rest:
+        return "%s.%s" % (section.lower(), rest.lower())
+    (subsection, key) = rest.rsplit(".", 1)
+    return "%s.%s.%s" % (section.lower(), subsection, key.lower())
+
+
 def is_git(path):
     """Return true if .git directory exists"""
     return os.path.isdir(os.path.join(path, ".git"))
@@ -0,0 +1,88 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Housekeeping of the object stores of git projects
+
+"""
+
+import os
+
+import qisrc.git
+
+
+class MaintenanceResult(object):
+    """ What happened when running maintenance on a project """
+    def __init__(self):
+        self.ok = True
+        self.errors = list()
+        self.size_before = 0
+        self.size_after = 0
+
+    @property
+    def reclaimed(self):
+        return self.size_before - self.size_after
+
+
+def maintain(git_project, prune_remotes=True):
+    """ Run git housekeeping on a project:
+
+    * remove remote-tracking refs that no longer exist on the
+      remotes (this needs network access)
+    * pack loose objects in a new pack, without repacking
+      existing packs
+    * write a multi-pack-index, and remove packs it no longer uses
+    * write a commit-graph file
+
+    Does not display anything, so that it can be called from
+    several threads.
+
+    :return: a :py:class:`MaintenanceResult`
+
+    """
+    res = MaintenanceResult()
+    git = qisrc.git.Git(git_project.path)
+    objects_dir = os.path.join(git_project.path, ".git", "objects")
+    res.size_before = get_size(objects_dir)
+
+    commands = list()
+    if prune_remotes:
+        for remote in git_project.remotes:
+            commands.append(["remote", "prune", remote.name])
+    commands.extend([
+        ["repack", "-d", "-l", "-q"],
+        ["prune-packed", "-q"],
+        ["multi-pack-index", "write"],
+        ["multi-pack-index", "expire"],
+        ["commit-graph", "write", "--reachable"],
+    ])
+    for cmd in commands:
+        rc, out = git.call(*cmd, raises=False)
+        if rc != 0:
+            res.ok = False
+            res.errors.append("git %s failed\n%s" % (" ".join(cmd), out))
+
+    res.size_after = get_size(objects_dir)
+    return res
+
+
+def get_size(path):
+    """ Total size of the files in a directory, in bytes """
+    res = 0
+    for (root, _, filenames) in os.walk(path):
+        for filename in filenames:
+            try:
+                res += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                # Removed by git in the mean time
+                pass
+    return res
+
+
+def format_size(size):
+    """ Format a size in bytes for humans """
+    for unit in ["B", "KiB", "MiB"]:
+        if abs(size) < 1024:
+            return "%i %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GiB" % size
@@ -146,19 +146,35 @@ class GitProject(object):
             if ok:
                 self.review = True
 
-    def sync(self, rebase_devel=False, **kwargs):
+    def sync(self, rebase_devel=False, fast=False, **kwargs):
         """ Synchronize remote changes with the underlying git repository
         Calls py:meth:`qisys.git.Git.sync`
 
+        :param fast: first compare the remote tip with the local
+                     remote-tracking ref, and skip fetching (and
+                     rebasing, if the local branch is already there)
+                     when they match
+
         """
         git = qisrc.git.Git(self.path)
         branch = self.default_branch
         if not branch:
             return None, "No branch given, and no branch configured by default"
 
-        rc, out = git.fetch(raises=False)
-        if rc != 0:
-            return False, "fetch failed\n" + out
+        tracking_sha1 = None
+        if fast:
+            remote_sha1 = self.get_remote_sha1(git=git)
+            if remote_sha1:
+                tracking_sha1 = self.get_fetched_sha1(git=git,
+                                                      remote_sha1=remote_sha1)
+            if remote_sha1 and not tracking_sha1:
+                tracking_sha1 = self.update_remote_ref_from_prefetch(
+                    git=git, remote_sha1=remote_sha1)
+
+        if not tracking_sha1:
+            rc, out = git.fetch(raises=False)
+            if rc != 0:
+                return False, "fetch failed\n" + out
 
         current_branch = git.get_current_branch()
         if not current_branch:
@@ -171,10 +187,109 @@ class GitProject(object):
         if current_branch != branch.name and rebase_devel:
             return git.sync_branch_devel(current_branch, branch, fetch_first=False)
 
+        if tracking_sha1:
+            local_sha1 = git.get_ref_sha1("refs/heads/%s" % branch.name)
+            if local_sha1 == tracking_sha1:
+                # Nothing changed since last sync
+                return True, ""
+
         # Here current_branch == branch.name
         return git.sync_branch(branch, fetch_first=False)
 
 
+    def prefetch(self):
+        """ Fetch all the remotes in the background, see
+        :py:meth:`qisrc.git.Git.prefetch`
+
+        Return a tuple (ok, message)
+
+        """
+        git = qisrc.git.Git(self.path)
+        message = ""
+        ok = True
+        for remote in self.remotes:
+            rc, out = git.prefetch(remote.name)
+            if rc != 0:
+                ok = False
+                message += "Fetching %s failed\n%s\n" % (remote.name, out)
+        return ok, message
+
+    def _get_remote_branch(self):
+        """ Return a tuple (remote, branch) for the remote branch
+        tracked by the default branch, or None
+
+        """
+        branch = self.default_branch
+        if not branch or not branch.tracks:
+            return None
+        remote_branch = branch.remote_branch
+        if not remote_branch:
+            remote_branch = branch.name
+        return (branch.tracks, remote_branch)
+
+    def get_remote_sha1(self, git=None):
+        """ Return the sha1 of the tip of the remote branch tracked by
+        the default branch, as given by the remote, or None
+
+        """
+        remote_branch = self._get_remote_branch()
+        if not remote_branch:
+            return None
+        if git is None:
+            git = qisrc.git.Git(self.path)
+        return git.get_remote_sha1(*remote_branch)
+
+    def get_fetched_sha1(self, git=None, remote_sha1=None):
+        """ Return the sha1 of the remote-tracking ref of the default
+        branch if it already matches the tip of the remote (so that
+        there is no need to fetch), else None
+
+        :param remote_sha1: the tip of the remote, if already known
+                            (see :py:meth:`get_remote_sha1`)
+
+        """
+        remote_branch = self._get_remote_branch()
+        if not remote_branch:
+            return None
+        if git is None:
+            git = qisrc.git.Git(self.path)
+        if remote_sha1 is None:
+            remote_sha1 = git.get_remote_sha1(*remote_branch)
+        if not remote_sha1:
+            return None
+        tracking_sha1 = git.get_ref_sha1("refs/remotes/%s/%s" % remote_branch)
+        if tracking_sha1 != remote_sha1:
+            return None
+        return tracking_sha1
+
+    def update_remote_ref_from_prefetch(self, git=None, remote_sha1=None):
+        """ If the tip of the remote has already been fetched by
+        ``qisrc prefetch``, move the remote-tracking ref of the default
+        branch there, and return its sha1. Else return None
+
+        :param remote_sha1: the tip of the remote, if already known
+                            (see :py:meth:`get_remote_sha1`)
+
+        """
+        remote_branch = self._get_remote_branch()
+        if not remote_branch:
+            return None
+        if git is None:
+            git = qisrc.git.Git(self.path)
+        if remote_sha1 is None:
+            remote_sha1 = git.get_remote_sha1(*remote_branch)
+        if not remote_sha1:
+            return None
+        prefetch_ref = "refs/prefetch/%s/%s" % remote_branch
+        if git.get_ref_sha1(prefetch_ref) != remote_sha1:
+            return None
+        tracking_ref = "refs/remotes/%s/%s" % remote_branch
+        rc, _ = git.call("update-ref", "-m", "qisrc: use prefetched ref",
+                         tracking_ref, remote_sha1, raises=False)
+        if rc != 0:
+            return None
+        return remote_sha1
+
     def apply_config(self):
         """ Apply configuration to the underlying git
         repository
@@ -1,119 +1,178 @@
 from qisys import ui
 import qisys.interact
+import qisys.parallel
 
+import qisrc.git
 import qisrc.manifest
+import qisrc.review
 
 def rebase_worktree(git_worktree, git_projects, branch=None,
-                    push=False, dry_run=False, verbose=False):
+                    push=False, dry_run=False, verbose=False, num_jobs=None):
     if not git_projects:
         return
     upstream_projects = git_worktree.get_projects_on_branch(branch)
-    rebased_projects, errors = rebase_projects(git_projects, upstream_projects, branch, verbose)
+    rebased_projects, errors = rebase_projects(git_projects, upstream_projects,
+                                               branch, verbose,
+                                               num_jobs=num_jobs)
     if errors:
         raise Exception("Failed to rebase some projects")
 
     if push:
-        push_projects(rebased_projects, dry_run=dry_run)
+        push_projects(rebased_projects, dry_run=dry_run, num_jobs=num_jobs)
 
 
-def push_projects(git_projects, dry_run=False):
+def push_projects(git_projects, dry_run=False, num_jobs=None):
+    """ Ask confirmation for each project, then push all the
+    confirmed projects in parallel
+
+    """
     if not git_projects:
         return
     ui.info(ui.green, "Pushing ", len(git_projects), "projects")
+    to_push = list()
     for i, git_project in enumerate(git_projects):
         default_branch = git_project.default_branch.name
         remote_branch = git_project.default_branch.remote_branch
         ui.info_count(i, len(git_projects), git_project.src)
         git = qisrc.git.Git(git_project.path)
-        if git_project.review:
-            push_remote = git_project.review_remote
-        else:
-            push_remote = git_project.default_remote
-        remote_ref = "%s/%s" % (push_remote.name, remote_branch)
+        remote_ref = "%s/%s" % (get_push_remote(git_project).name, remote_branch)
         display_changes(git, default_branch, remote_ref)
         answer = qisys.interact.ask_yes_no("OK to push?", default=False)
         if not answer:
-            return
-        to_push = "%s:%s" % (default_branch, remote_branch)
-        push_args = [push_remote.name, to_push]
+            break
+        to_push.append(git_project)
+
+    env = qisrc.review.get_ssh_env()
+    def push_project(git_project):
+        default_branch = git_project.default_branch.name
+        remote_branch = git_project.default_branch.remote_branch
+        push_remote = get_push_remote(git_project)
+        git = qisrc.git.Git(git_project.path)
+        refspec = "%s:%s" % (default_branch, remote_branch)
+        push_args = [push_remote.name, refspec]
         push_args.append("--force")
         if dry_run:
             push_args.append("--dry-run")
-        rc, out = git.push(*push_args, raises=False)
+        return git.push(*push_args, raises=False, env=env)
+
+    def on_result(_, git_project, res):
+        (rc, out) = res
+        ui.info(ui.blue, git_project.src)
         if rc == 0:
             ui.info(out)
         else:
             ui.error(out)
 
+    qisrc.review.run_by_ssh_host(push_project, to_push,
+                                 lambda x: get_push_remote(x).url,
+                                 num_jobs=num_jobs, on_result=on_result)
+
+
+def get_push_remote(git_project):
+    if git_project.review:
+        return git_project.review_remote
+    else:
+        return git_project.default_remote
 
-def rebase_projects(git_projects, upstream_projects, branch, verbose):
+
+def rebase_projects(git_projects, upstream_projects, branch, verbose,
+                    num_jobs=None):
+    """ Rebase the projects in parallel.
+
+    Conflicts are reported once every project has been processed
+
+    :return: a tuple (rebased projects, projects that failed to rebase)
+
+    """
     rebased_projects = list()
     errors = list()
-    max_src = max(len(x.src) for x in git_projects)
     eol = "\n" if verbose else ""
-    fetch_quiet = False if verbose else True
-    for i, git_project in enumerate(git_projects):
-        ui.info_count(i, len(git_projects), git_project.src, end=eol)
-        git = qisrc.git.Git(git_project.path)
-        git.fetch(quiet=fetch_quiet)
-        if not git_project.default_remote:
-            ui.info("\n", ui.brown, git_project.src, "[skipped]")
-            ui.info("No default remote", "\n")
-            continue
-        if not git_project.default_branch:
-            ui.info("\n", ui.brown, git_project.src, "[skipped]")
-            ui.info("No default branch", "\n")
-            continue
-        local_branch = git_project.default_branch.name
-        remote_branch = git_project.default_branch.remote_branch
-        remote_name = git_project.default_remote.name
-        remote_ref = "%s/%s" % (remote_name, remote_branch)
-        if git.get_current_branch() != local_branch:
+    n = len(git_projects)
+    def on_result(i, git_project, res):
+        (status, message) = res
+        if status == "skipped":
+            ui.info_count(i, n, git_project.src, end=eol)
             ui.info("\n", ui.brown, git_project.src, "[skipped]")
-            ui.info("Not on %s branch" % local_branch, "\n")
-            continue
+            ui.info(message, "\n")
+        elif status == "failed":
+            ui.info_count(i, n, git_project.src, end=eol)
+            ui.info("\n", ui.red, git_project.src, "  [failed]")
+            errors.append((git_project, message))
+        elif status == "no-diff":
+            if verbose:
+                ui.info_count(i, n, git_project.src, end=eol)
+                ui.info("\n", "no changes", "\n")
+        else:
+            ui.info_count(i, n, git_project.src, end=eol)
+            if not verbose:
+                ui.info()
+            rebased_projects.append(git_project)
 
-        if not git_project.src in upstream_projects:
-            ui.info("\n", ui.brown, git_project.src, "[skipped]")
-            ui.info("No match for %s on %s branch" % (git_project.src, branch), "\n")
-            continue
+    qisys.parallel.run(lambda x: rebase_project(x, upstream_projects, branch),
+                       git_projects, num_jobs=num_jobs, on_result=on_result,
+                       ordered=True)
+    if errors:
+        ui.error("Failed to rebase some projects")
+        for (git_project, message) in errors:
+            ui.info(ui.green, " * ", ui.reset, ui.blue, git_project.src)
+            ui.info(ui.indent(message, num=2))
+    return rebased_projects, [x[0] for x in errors]
 
-        status = qisrc.git.get_status(git, local_branch, remote_ref)
-        if status == "ahead":
-            ui.info("\n", ui.brown, git_project.src, "[skipped]")
-            ui.info("You have local changes not pushed yet", "\n")
-            continue
-        if status == "behind":
-            ui.info("\n", ui.brown, git_project.src, "[skipped]")
-            ui.info("Local branch is not up-to-date", "\n")
-            continue
 
-        upstream_project = upstream_projects[git_project.src]
-        upstream_branch = upstream_project.default_branch.name
-        upstream_ref = "%s/%s" % (upstream_project.default_remote.name, upstream_branch)
+def rebase_project(git_project, upstream_projects, branch):
+    """ Rebase one project on the matching project of the
+    given branch of the manifest.
 
-        status = qisrc.git.get_status(git, local_branch, upstream_ref)
-        if status == "no-diff":
-            if verbose:
-                ui.info("\n", "no changes", "\n")
-            else:
-                ui.info("\r" + " ".ljust(ui.get_console_size()[0]), sep="", end="\r")
-            continue
-        if status == "behind":
-            git.merge(upstream_ref)
-            rebased_projects.append(git_project)
-        else:
-            git.call("tag", "-f", "before-rebase")
-            rc, out = git.call("rebase", upstream_ref, raises=False)
-            if rc == 0:
-                rebased_projects.append(git_project)
-            else:
-                ui.info("\n", ui.red, git_project.src, "  [failed]")
-                ui.info(out, "\n")
-                git.call("rebase", "--abort", raises=False)
-                errors.append(git_project)
-                continue
-    return rebased_projects, errors
+    Does not display anything, so that it can be called from
+    several threads.
+
+    :return: a tuple (status, message), where status is
+             one of "skipped", "no-diff", "rebased" or "failed"
+
+    """
+    git = qisrc.git.Git(git_project.path)
+    rc, out = git.fetch("--quiet", raises=False)
+    if rc != 0:
+        return "failed", "git fetch failed:\n" + out
+    if not git_project.default_remote:
+        return "skipped", "No default remote"
+    if not git_project.default_branch:
+        return "skipped", "No default branch"
+    local_branch = git_project.default_branch.name
+    remote_branch = git_project.default_branch.remote_branch
+    remote_name = git_project.default_remote.name
+    remote_ref = "%s/%s" % (remote_name, remote_branch)
+    if git.get_current_branch() != local_branch:
+        return "skipped", "Not on %s branch" % local_branch
+
+    if not git_project.src in upstream_projects:
+        return "skipped", "No match for %s on %s branch" % (git_project.src,
+                                                            branch)
+
+    status = qisrc.git.get_status(git, local_branch, remote_ref)
+    if status == "ahead":
+        return "skipped", "You have local changes not pushed yet"
+    if status == "behind":
+        return "skipped", "Local branch is not up-to-date"
+
+    upstream_project = upstream_projects[git_project.src]
+    upstream_branch = upstream_project.default_branch.name
+    upstream_ref = "%s/%s" % (upstream_project.default_remote.name, upstream_branch)
+
+    status = qisrc.git.get_status(git, local_branch, upstream_ref)
+    if status == "no-diff":
+        return "no-diff", None
+    if status == "behind":
+        rc, out = git.merge(upstream_ref, raises=False)
+        if rc != 0:
+            return "failed", out
+        return "rebased", None
+    git.call("tag", "-f", "before-rebase", raises=False)
+    rc, out = git.call("rebase", upstream_ref, raises=False)
+    if rc == 0:
+        return "rebased", None
+    git.call("rebase", "--abort", raises=False)
+    return "failed", out
 
 def display_changes(git, remote_ref, branch_name):
     rc, out = git.call("log", "--color", "--graph", "--abbrev-commit",
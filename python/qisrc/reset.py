@@ -9,7 +9,12 @@ import qisrc.git
 
 
 def clever_reset_ref(git_project, ref):
-    """ Resets only if needed, fetches only if needed """
+    """ Resets only if needed, fetches only if needed
+
+    Raise an Exception containing the output of git if
+    something went wrong
+
+    """
     try:
         remote_name = git_project.default_remote.name
     except AttributeError:
@@ -19,16 +24,22 @@ def clever_reset_ref(git_project, ref):
 
     git = qisrc.git.Git(git_project.path)
     if ref.startswith("refs/"):
-        git.fetch(remote_name, ref)
-        git.reset("--hard", "FETCH_HEAD")
+        _check_call(git, "fetch", "--quiet", remote_name, ref)
+        _check_call(git, "reset", "--quiet", "--hard", "FETCH_HEAD")
         return
-    _, actual_sha1 = git.call("rev-parse", "HEAD", raises=False)
+    actual_sha1 = git.get_current_sha1()
     if actual_sha1 == ref:  # Nothing to do
         return
     ret, _ = git.call("show", "--oneline", ref, raises=False)
-    if ret == 0:  # SHA-1 exists locally
-        git.reset("--hard", ref)
-    else:  # Full fetch in this case
-        git.fetch(remote_name)
-        git.reset("--hard", ref)
+    if ret != 0:  # SHA-1 does not exist locally, full fetch in this case
+        _check_call(git, "fetch", "--quiet", remote_name)
+    _check_call(git, "reset", "--quiet", "--hard", ref)
+
+def _check_call(git, *args):
+    """ Run a git command, without mixing its output with the
+    one of other projects being reset at the same time
 
+    """
+    ret, out = git.call(*args, raises=False)
+    if ret != 0:
+        raise Exception("git %s failed in %s\n%s" % (" ".join(args), git.repo, out))
@@ -7,14 +7,22 @@
 """
 
 import os
+import re
 import sys
+import stat
+import pipes
+import tempfile
 import subprocess
 
 from qisys import ui
 import qisrc.git
 import qisys.interact
+import qisys.parallel
 import qibuild.config
 
+# How long shared ssh connections stay open after the last git command
+SSH_CONTROL_PERSIST = 60
+
 
 def fetch_gerrit_hook_ssh(path, username, server, port=None):
     """ Fetch the ``commit-msg`` hook from gerrit
@@ -102,8 +110,8 @@ def get_gerrit_username(server, ssh_port):
             return None
 
     # Add it to config so we ask only once
-    qibuild_cfg.set_server_access(server, username)
-    qibuild_cfg.write()
+    with qibuild.config.edit_config() as qibuild_cfg:
+        qibuild_cfg.set_server_access(server, username)
     return username
 
 
@@ -157,14 +165,119 @@ def guess_emails(git, reviewers):
             reviewers[idx] = reviewer + "@" + domain_name
     return reviewers
 
+def get_ssh_host(url):
+    """ Return the ``[user@]server[:port]`` part of an ssh url,
+    or None if the url does not use ssh
+
+    """
+    match = re.match(r"ssh://([^/]+)", url)
+    if match:
+        return match.group(1)
+    if "://" in url:
+        return None
+    # scp-like syntax: [user@]server:path
+    match = re.match(r"([^/:]+):", url)
+    if match:
+        return match.group(1)
+    return None
+
+def get_ssh_env(env=None):
+    """ Return an environment in which all the ssh connections
+    git makes to the same host go through one shared connection
+    (using OpenSSH ``ControlMaster``), instead of opening a new
+    connection for each project.
+
+    Nothing is changed on Windows, or when ``GIT_SSH`` or
+    ``GIT_SSH_COMMAND`` are already set.
+
+    """
+    if env is None:
+        env = os.environ
+    env = env.copy()
+    if os.name == "nt":
+        return env
+    if env.get("GIT_SSH") or env.get("GIT_SSH_COMMAND"):
+        return env
+    control_dir = get_ssh_control_dir(env)
+    if not control_dir:
+        return env
+    control_path = os.path.join(control_dir, "%r@%h:%p")
+    ssh_cmd = ["ssh",
+               "-o", "ControlMaster=auto",
+               "-o", "ControlPath=%s" % control_path,
+               "-o", "ControlPersist=%i" % SSH_CONTROL_PERSIST]
+    env["GIT_SSH_COMMAND"] = " ".join(pipes.quote(x) for x in ssh_cmd)
+    return env
+
+def get_ssh_control_dir(env):
+    """ Return a directory to put the ssh control sockets in, or None
+    if no safe one could be found.
+
+    ``$XDG_RUNTIME_DIR`` is used when set, otherwise a
+    ``qisrc-ssh-<uid>`` directory in the temporary directory.
+    The directory must be a real directory, owned by the current
+    user, and only accessible by this user, so that nobody else can
+    hijack the shared connections
+
+    """
+    parent = env.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    control_dir = os.path.join(parent, "qisrc-ssh-%i" % os.getuid())
+    try:
+        os.mkdir(control_dir, 0700)
+    except OSError:
+        # Already there, maybe created by an other qisrc process
+        pass
+    try:
+        st = os.lstat(control_dir)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or \
+            stat.S_IMODE(st.st_mode) != 0700:
+        ui.debug("Not sharing ssh connections: unsafe directory", control_dir)
+        return None
+    return control_dir
+
+def run_by_ssh_host(func, items, get_url, num_jobs=None, on_result=None):
+    """ Same as :py:func:`qisys.parallel.run`, but only one item
+    per ssh host is processed at first. The other items are processed
+    once the shared ssh connection to their host is open (see
+    :py:func:`get_ssh_env`)
+
+    :param get_url: a function returning the url of an item
+
+    """
+    items = list(items)
+    first = list()
+    rest = list()
+    hosts = set()
+    for (i, item) in enumerate(items):
+        host = get_ssh_host(get_url(item))
+        if host and host in hosts:
+            rest.append(i)
+        else:
+            hosts.add(host)
+            first.append(i)
+    results = [None] * len(items)
+    for indexes in (first, rest):
+        def callback(j, item, result):
+            if on_result:
+                on_result(indexes[j], item, result)
+        wave = qisys.parallel.run(func, [items[i] for i in indexes],
+                                  num_jobs=num_jobs, on_result=callback)
+        for (i, result) in zip(indexes, wave):
+            results[i] = result
+    return results
+
 def push(project,  branch, bypass_review=False, dry_run=False,
-         reviewers=None, topic=None):
+         reviewers=None, topic=None, env=None):
     """ Push the changes for review.
 
     Unless review is False, in this case, simply update
     the remote gerrit branch
 
     :param reviewers: A list of reviewers to invite to review
+    :param env: the environment to use for git, see :py:func:`get_ssh_env`
+    :return: a tuple (ok, output of git push)
 
     """
     git = qisrc.git.Git(project.path)
@@ -176,7 +289,6 @@ def push(project,  branch, bypass_review=False, dry_run=False,
     if bypass_review:
         args.append("%s:%s" % (branch, branch))
     else:
-        ui.info("Pushing code to", review_remote.name, "for review.")
         remote_ref = "refs/for/%s" % branch
         if topic:
             remote_ref = "%s/%s" % (remote_ref, topic)
@@ -187,4 +299,5 @@ def push(project,  branch, bypass_review=False, dry_run=False,
             for reviewer in reviewers:
                 receive_pack += " --reviewer=%s" % reviewer
             args = ["--receive-pack=%s" % receive_pack] + args
-    git.push(*args)
+    (rc, out) = git.push(*args, raises=False, env=env)
+    return (rc == 0, out)
@@ -9,6 +9,7 @@ import json
 
 from qisys import ui
 
+import qisys.parallel
 import qisrc.git
 import qisrc.status
 import qisrc.reset
@@ -95,18 +96,48 @@ class Snapshot(object):
     def __ne__(self, other):
         return not self.__eq__(other)
 
-def generate_snapshot(git_worktree, output_path, deprecated_format=True):
-    snapshot = git_worktree.snapshot()
+def generate_snapshot(git_worktree, output_path, deprecated_format=True,
+                      num_jobs=None):
+    snapshot = git_worktree.snapshot(num_jobs=num_jobs)
     return snapshot.dump(output_path, deprecated_format=deprecated_format)
     ui.info(ui.green, "Snapshot generated in", ui.white, output_path)
 
-def load_snapshot(git_worktree, input_path):
-    """Load a snapshot file and reset projects."""
+def load_snapshot(git_worktree, input_path, num_jobs=None):
+    """Load a snapshot file and reset projects.
+
+    :param num_jobs: number of projects to reset in parallel
+    :return: True if every project could be reset
+
+    """
     snapshot = Snapshot()
     ui.info(ui.green, "Loading snapshot from", ui.white,  input_path)
     snapshot.load(input_path)
+    to_reset = list()
     for (src, ref) in snapshot.refs.iteritems():
-        ui.info("Loading", src)
         git_project = git_worktree.get_git_project(src, raises=False)
         if git_project:
+            to_reset.append((git_project, ref))
+    errors = list()
+
+    def reset(item):
+        (git_project, ref) = item
+        try:
             qisrc.reset.clever_reset_ref(git_project, ref)
+        except Exception as e:
+            return e
+
+    def on_result(i, item, error):
+        (git_project, _) = item
+        ui.info_count(i, len(to_reset), "Loading", git_project.src)
+        if error:
+            errors.append((git_project.src, error))
+
+    qisys.parallel.run(reset, to_reset, num_jobs=num_jobs,
+                       on_result=on_result, ordered=True)
+    if not errors:
+        return True
+    ui.error("Failed to load snapshot for some projects")
+    for (src, error) in errors:
+        ui.info(ui.green, " * ", ui.reset, ui.blue, src)
+        ui.info(ui.indent(str(error), num=2))
+    return False
@@ -4,22 +4,75 @@
 
 """A set of function to know the status of a git repository."""
 
+import os
+
 import qisrc.git
 from qisys import ui
 
 def stat_tracking_remote(git, branch, tracking):
     """Check if branch is ahead and / or behind tracking."""
-    behind = 0
-    ahead = 0
-    (ret, out) = git.call("rev-list", "--left-right",
-                          "%s..%s" % (tracking, branch), raises=False)
-    if ret == 0:
-        ahead = len(out.split())
-    (ret, out) = git.call("rev-list", "--left-right",
-                          "%s..%s" % (branch, tracking), raises=False)
-    if ret == 0:
-        behind = len(out.split())
-    return (ahead, behind)
+    (ret, out) = git.call("rev-list", "--left-right", "--count",
+                          "%s...%s" % (branch, tracking), raises=False)
+    if ret != 0:
+        return (0, 0)
+    (ahead, behind) = out.split()[-2:]
+    return (int(ahead), int(behind))
+
+class GitStatus():
+    """ The result of ``git status --porcelain=v2 --branch``
+
+    ``lines`` are converted to the format of ``git status --porcelain``
+
+    """
+    def __init__(self):
+        self.branch = None
+        self.upstream = None
+        self.ahead = 0
+        self.behind = 0
+        self.lines = list()
+
+def read_status(git, untracked=True):
+    """ Get everything we need to know about a project with a single
+    call to git status. Return None if git status failed
+
+    """
+    args = ["--porcelain=v2", "--branch", "-z"]
+    if not untracked:
+        args.append("--untracked-files=no")
+    (ret, out) = git.status(*args, raises=False)
+    if ret != 0:
+        return None
+    res = GitStatus()
+    entries = iter(out.split("\0"))
+    for entry in entries:
+        if entry.startswith("# branch.head "):
+            branch = entry[14:]
+            if branch != "(detached)":
+                res.branch = branch
+        elif entry.startswith("# branch.upstream "):
+            res.upstream = entry[18:]
+        elif entry.startswith("# branch.ab "):
+            (ahead, behind) = entry[12:].split()
+            res.ahead = int(ahead)
+            res.behind = -int(behind)
+        elif entry.startswith("1 "):
+            fields = entry.split(" ", 8)
+            res.lines.append(_porcelain_v1(fields[1], fields[8]))
+        elif entry.startswith("2 "):
+            fields = entry.split(" ", 9)
+            orig_path = next(entries)
+            res.lines.append(_porcelain_v1(fields[1],
+                                           "%s -> %s" % (orig_path, fields[9])))
+        elif entry.startswith("u "):
+            fields = entry.split(" ", 10)
+            res.lines.append(_porcelain_v1(fields[1], fields[10]))
+        elif entry.startswith("? "):
+            res.lines.append("?? " + entry[2:])
+    return res
+
+def _porcelain_v1(xy, path):
+    """ Format a status entry the way ``git status --porcelain`` does """
+    return "%s %s" % (xy.replace(".", " "), path)
 
 class ProjectState():
     """A class which represent a project and is cleanlyness."""
@@ -54,13 +107,16 @@ def check_state(project, untracked):
 
     git = qisrc.git.Git(project.path)
 
-    if not git.is_valid():
+    git_status = None
+    if os.path.isdir(project.path):
+        git_status = read_status(git, untracked=untracked)
+    if git_status is None:
         state_project.valid = False
         return state_project
 
-    state_project.clean = git.is_clean(untracked = untracked)
-    state_project.current_branch = git.get_current_branch()
-    state_project.tracking = git.get_tracking_branch()
+    state_project.clean = not git_status.lines
+    state_project.current_branch = git_status.branch
+    state_project.tracking = git_status.upstream
     if project.default_remote and project.default_branch:
         state_project.manifest_branch = "%s/%s" % (project.default_remote.name, project.default_branch.name)
     #clean worktree, but is the current branch sync with the remote one?
@@ -73,18 +129,15 @@ def check_state(project, untracked):
             if state_project.current_branch != project.default_branch.name:
                 state_project.incorrect_proj = True
 
-        (state_project.ahead, state_project.behind) = stat_tracking_remote(git,
-                state_project.current_branch, state_project.tracking)
+        state_project.ahead = git_status.ahead
+        state_project.behind = git_status.behind
         if state_project.incorrect_proj:
             (state_project.ahead_manifest, state_project.behind_manifest) = stat_tracking_remote(
                 git, state_project.current_branch, "%s/%s" % (
                 project.default_remote.name, project.default_branch.name))
 
     if not state_project.sync_and_clean:
-        out = git.get_status(untracked)
-        if out is not None:
-            state_project.status = [ x for x in out.splitlines() if
-                    len(x.strip()) > 0 ]
+        state_project.status = git_status.lines
 
     return state_project
 
@@ -7,14 +7,41 @@
 """
 
 import os
+import cPickle
+import hashlib
 
 from qisys import ui
 import qisys.qixml
+import qisys.sh
 import qisrc.git
 import qisrc.manifest
 import qibuild.profile
 
 
+# Parsed manifests, see WorkTreeSyncer.read_cached_manifest
+_MANIFEST_CACHE = dict()
+# Number of entries to keep in .qi/manifest-cache
+MANIFEST_CACHE_SIZE = 10
+# Change this when the pickled objects change, so that entries written
+# by other versions of qisrc are not used
+MANIFEST_CACHE_VERSION = 1
+
+
+def _load_manifest_cache(data):
+    """ Return the ``(default_group, repos)`` tuple stored in a manifest
+    cache entry, or None if it could not be read
+
+    """
+    # pylint: disable-msg=W0703
+    try:
+        (default_group, repos) = cPickle.loads(data)
+        return (default_group, list(repos))
+    except Exception:
+        # Unpickling a corrupted or outdated entry may raise just
+        # about anything
+        return None
+
+
 class WorkTreeSyncer(object):
     """ Handle the manifests of a worktree
 
@@ -33,19 +60,20 @@ class WorkTreeSyncer(object):
         self.old_repos = list()
         self.new_repos = list()
 
-    def sync(self):
+    def sync(self, fast=False):
         """" Synchronize with a remote manifest:
         * clone missing repos
         * move repos that needs to be moved
         * reconfigure remotes and default branches
         * synchronizes build profiles
+        :param fast: do not fetch the manifest if it did not change
         :returns: True in case of success, False otherwise
 
         """
         # backup old repos configuration now, so that
         # we know what to sync
         self.old_repos = self.get_old_repos()
-        return self.sync_repos()
+        return self.sync_repos(fast=fast)
 
     @property
     def manifest_xml(self):
@@ -71,7 +99,7 @@ class WorkTreeSyncer(object):
             git.commit("-m", "initial commit")
         return res
 
-    def sync_repos(self):
+    def sync_repos(self, fast=False):
         """ Update every manifest, inspect changes, and updates the
         git worktree accordingly
 
@@ -85,7 +113,7 @@ class WorkTreeSyncer(object):
             ui.info("groups", ", ".join(self.manifest.groups))
         else:
             ui.info()
-        self._sync_manifest()
+        self._sync_manifest(fast=fast)
         self._sync_groups()
         self.new_repos = self.get_new_repos()
         res = self._sync_repos(self.old_repos, self.new_repos)
@@ -146,25 +174,137 @@ class WorkTreeSyncer(object):
         self.configure_projects()
         return res
 
+    @property
+    def manifest_cache(self):
+        return os.path.join(self.git_worktree.root, ".qi", "manifest-cache")
+
     def read_remote_manifest(self, manifest_xml=None):
         """ Read the manifest file in .qi/manifests/<name>/manifest.xml
         using the settings in .qi/manifest.xml (to know the name and the groups
         to use)
+
+        When reading the manifest of the worktree, the result is cached
+        using the sha1 of the manifest repository and the groups, see
+        :py:meth:`read_cached_manifest`
+
         """
         if not manifest_xml:
-            manifest_xml = os.path.join(self.manifest_repo, "manifest.xml")
+            return self.read_cached_manifest()
         remote_manifest = qisrc.manifest.Manifest(manifest_xml)
-        groups = self.manifest.groups
+        (default_group, repos) = self._resolve_groups(remote_manifest)
+        self._set_default_group(default_group)
+        return repos
+
+    def read_cached_manifest(self):
+        """ Same as :py:meth:`read_remote_manifest`, but only parse the
+        manifest and resolve the groups if this was not already done
+        for the current commit of the manifest repository.
+
+        Results are kept in memory and in .qi/manifest-cache, and a
+        new list of repos is returned each time, so callers are free
+        to modify it
+
+        """
+        manifest_xml = os.path.join(self.manifest_repo, "manifest.xml")
+        key = self._manifest_cache_key(manifest_xml)
+        data = _MANIFEST_CACHE.get(key)
+        if data is None:
+            data = self._read_manifest_cache_file(key)
+        res = None
+        if data is not None:
+            res = _load_manifest_cache(data)
+        if res is None:
+            remote_manifest = qisrc.manifest.Manifest(manifest_xml)
+            res = self._resolve_groups(remote_manifest)
+            data = cPickle.dumps(res, cPickle.HIGHEST_PROTOCOL)
+            self._write_manifest_cache_file(key, data)
+        _MANIFEST_CACHE[key] = data
+        (default_group, repos) = res
+        self._set_default_group(default_group)
+        return repos
+
+    def _resolve_groups(self, remote_manifest):
+        """ Return the name of the default group of the manifest, and
+        the repos matching the groups of the local manifest
+
+        """
+        default_group = remote_manifest.groups.default_group
+        if default_group:
+            default_group = default_group.name
+        repos = remote_manifest.get_repos(groups=self.manifest.groups)
+        return (default_group, list(repos))
+
+    def _set_default_group(self, default_group):
         # if self.manifest.groups is empty but there is a default
         # group in the manifest, we need to set self.manifest.groups
         # so that subsequent calls to qisrc add-group, remove-group
         # work
-        if not self.manifest.groups:
-            default_group = remote_manifest.groups.default_group
-            if default_group:
-                self.manifest.groups = [default_group.name]
-        repos = remote_manifest.get_repos(groups=groups)
-        return repos
+        if not self.manifest.groups and default_group:
+            self.manifest.groups = [default_group]
+
+    def _manifest_cache_key(self, manifest_xml):
+        """ The manifest is the same as long as the commit of the manifest
+        repository is the same. Also use the mtime and the size of
+        the file, in case it was edited by hand
+
+        """
+        git = qisrc.git.Git(self.manifest_repo)
+        sha1 = git.get_current_sha1()
+        stat = os.stat(manifest_xml)
+        groups = self.manifest.groups or list()
+        to_hash = "\n".join([str(MANIFEST_CACHE_VERSION), manifest_xml,
+                             str(sha1), str(stat.st_mtime),
+                             str(stat.st_size)] + groups)
+        return hashlib.sha1(to_hash).hexdigest()
+
+    def _read_manifest_cache_file(self, key):
+        cache_file = os.path.join(self.manifest_cache, key + ".pickle")
+        if not os.path.exists(cache_file):
+            return None
+        try:
+            with open(cache_file, "rb") as fp:
+                data = fp.read()
+        except (IOError, OSError), e:
+            ui.debug("Ignoring manifest cache", cache_file, e)
+            return None
+        # Make sure the file is not corrupted
+        if _load_manifest_cache(data) is None:
+            ui.debug("Ignoring manifest cache", cache_file)
+            return None
+        # So that this entry is not removed too early
+        os.utime(cache_file, None)
+        return data
+
+    def _write_manifest_cache_file(self, key, data):
+        qisys.sh.mkdir(self.manifest_cache, recursive=True)
+        cache_file = os.path.join(self.manifest_cache, key + ".pickle")
+        # Write to a temporary file first, in case another qisrc
+        # process is reading the cache at the same time
+        tmp_file = "%s.%i.tmp" % (cache_file, os.getpid())
+        try:
+            with open(tmp_file, "wb") as fp:
+                fp.write(data)
+            if os.name == "nt":
+                # os.rename does not overwrite files on Windows
+                qisys.sh.rm(cache_file)
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError), e:
+            ui.debug("Could not write manifest cache", cache_file, e)
+            return
+        self._clean_manifest_cache()
+
+    def _clean_manifest_cache(self):
+        """ Only keep the most recently used entries """
+        entries = list()
+        for name in os.listdir(self.manifest_cache):
+            # Temporary files are removed by the processes writing them
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(self.manifest_cache, name)
+            entries.append((os.path.getmtime(path), path))
+        entries.sort(reverse=True)
+        for (_, path) in entries[MANIFEST_CACHE_SIZE:]:
+            qisys.sh.rm(path)
 
     def get_old_repos(self):
         """ Backup all repos configuration before any synchronisation
@@ -191,14 +331,35 @@ class WorkTreeSyncer(object):
         new_repos = self.read_remote_manifest()
         return new_repos
 
-    def _sync_manifest(self):
-        """ Update the local manifest clone with the remote """
+    def fetch_manifest(self):
+        """ Fetch the remote branches of the manifest repository,
+        without changing the local branch
+
+        """
+        git = qisrc.git.Git(self.manifest_repo)
+        git.set_remote("origin", self.manifest.url)
+        git.fetch("origin")
+
+    def _sync_manifest(self, fast=False):
+        """ Update the local manifest clone with the remote
+
+        :param fast: skip fetching if origin/<branch> already
+                     matches the remote tip
+
+        """
         git = qisrc.git.Git(self.manifest_repo)
         git.set_remote("origin", self.manifest.url)
         if git.get_current_branch() != self.manifest.branch:
             git.checkout("-B", self.manifest.branch)
+        need_fetch = True
+        if fast and not self.manifest.ref:
+            tracking_sha1 = git.get_ref_sha1("refs/remotes/origin/%s" %
+                                             self.manifest.branch)
+            remote_sha1 = git.get_remote_sha1("origin", self.manifest.branch)
+            need_fetch = not tracking_sha1 or tracking_sha1 != remote_sha1
         with git.transaction() as transaction:
-            git.fetch("origin")
+            if need_fetch:
+                git.fetch("origin")
             if self.manifest.ref:
                 to_reset = self.manifest.ref
                 git.reset("--hard", to_reset)
@@ -348,15 +509,26 @@ def compute_repo_diff(old_repos, new_repos):
     to_rm = list()
     to_update = list()
 
+    # Index the old repos by url and the new repos by src,
+    # so that we don't have to compare every old repo with
+    # every new repo. When several repos match, the first one wins.
+    old_index_by_url = dict()
+    for (i, old_repo) in enumerate(old_repos):
+        for url in old_repo.urls:
+            old_index_by_url.setdefault(url, i)
+    new_by_src = dict()
+    for new_repo in new_repos:
+        new_by_src.setdefault(new_repo.src, new_repo)
+
+    moved = set()
     for new_repo in new_repos:
-        for old_repo in old_repos:
-            common_url = find_common_url(old_repo, new_repo)
-            if common_url:
-                if new_repo.src == old_repo.src:
-                    pass # nothing to do
-                else:
-                    to_move.append((old_repo, new_repo.src))
-                break
+        indexes = [old_index_by_url[x] for x in new_repo.urls
+                   if x in old_index_by_url]
+        if indexes:
+            old_repo = old_repos[min(indexes)]
+            if new_repo.src != old_repo.src:
+                to_move.append((old_repo, new_repo.src))
+                moved.add(id(old_repo))
         else:
             # actually we are adding repos that
             # only changed remotes, because we did not
@@ -364,25 +536,16 @@ def compute_repo_diff(old_repos, new_repos):
             to_add.append(new_repo)
 
     for old_repo in old_repos:
-        for new_repo in new_repos:
-            if old_repo.src == new_repo.src:
-                if new_repo.remotes == old_repo.remotes:
-                    if new_repo.default_branch == old_repo.default_branch:
-                        pass
-                    else:
-                        to_update.append((old_repo, new_repo))
-                else:
-                    to_update.append((old_repo, new_repo))
-                break
-        else:
-            if not old_repo in [x[0] for x in to_move]:
+        new_repo = new_by_src.get(old_repo.src)
+        if new_repo is None:
+            if not id(old_repo) in moved:
                 to_rm.append(old_repo)
+        elif new_repo.remotes != old_repo.remotes or \
+             new_repo.default_branch != old_repo.default_branch:
+            to_update.append((old_repo, new_repo))
 
-    really_to_add = list()
-    for repo in to_add:
-        if repo.src not in [x[0].src for x in to_update]:
-            really_to_add.append(repo)
-    to_add = really_to_add
+    updated_srcs = set(x[0].src for x in to_update)
+    to_add = [x for x in to_add if x.src not in updated_srcs]
 
     # sort everything by 'src':
     for repo_list in [to_add, to_rm]:
@@ -393,10 +556,10 @@ def compute_repo_diff(old_repos, new_repos):
     return (to_add, to_move, to_rm, to_update)
 
 def find_common_url(repo_a, repo_b):
+    urls_b = set(repo_b.urls)
     for url_a in repo_a.urls:
-        for url_b in repo_b.urls:
-            if url_a == url_b:
-                return url_b
+        if url_a in urls_b:
+            return url_a
 
 def compute_profile_updates(local_profiles, remote_profiles):
     """ Compare a local set of profiles with a remote set.
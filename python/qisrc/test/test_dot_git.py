@@ -0,0 +1,64 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import pytest
+
+import qisrc.dot_git
+from qisrc.test.conftest import TestGit
+
+def test_read_head(tmpdir):
+    git = TestGit(tmpdir.strpath)
+    git.initialize()
+    assert qisrc.dot_git.read_head(tmpdir.strpath) == ("refs/heads/master", None)
+    git.checkout("-b", "devel")
+    assert git.get_current_branch() == "devel"
+    sha1 = git.get_ref_sha1("refs/heads/devel")
+    git.checkout(sha1)
+    assert qisrc.dot_git.read_head(tmpdir.strpath) == (None, sha1)
+    assert git.get_current_branch() is None
+    assert git.get_current_sha1() == sha1
+
+def test_resolve_loose_and_packed_refs(tmpdir):
+    git = TestGit(tmpdir.strpath)
+    git.initialize()
+    git.commit_file("a.txt", "a")
+    _, expected = git.call("rev-parse", "HEAD", raises=False)
+    git.branch("loose")
+    git.call("tag", "-a", "v1.0", "-m", "v1.0")
+    git.call("pack-refs", "--all")
+    git.branch("loose2")
+    repo = tmpdir.strpath
+    assert qisrc.dot_git.resolve_ref(repo, "refs/heads/master") == expected
+    assert qisrc.dot_git.resolve_ref(repo, "refs/heads/loose2") == expected
+    assert qisrc.dot_git.resolve_ref(repo, "refs/heads/nope") is None
+    _, tag_sha1 = git.call("show-ref", "--verify", "--hash", "refs/tags/v1.0",
+                           raises=False)
+    assert git.get_ref_sha1("refs/tags/v1.0") == tag_sha1
+    assert git.get_current_sha1() == expected
+
+def test_read_config(tmpdir):
+    git = TestGit(tmpdir.strpath)
+    git.initialize()
+    git.set_config("branch.Feature/Foo.remote", "origin")
+    git.set_config("remote.origin.url", "git@example.com:foo.git")
+    git.set_config("foo.bar", "spam ; eggs")
+    config = qisrc.dot_git.read_config(tmpdir.strpath)
+    assert config["branch.Feature/Foo.remote"] == "origin"
+    assert config["remote.origin.url"] == "git@example.com:foo.git"
+    assert git.get_config("Branch.Feature/Foo.Remote") == "origin"
+    assert not "foo.bar" in config
+    # Quoted values are left to git:
+    assert git.get_config("foo.bar") == "spam ; eggs"
+    assert git.get_config("no.such.key") is None
+
+def test_unsupported_layout(tmpdir):
+    work = tmpdir.mkdir("work")
+    git = TestGit(work.strpath)
+    git.initialize()
+    git.call("worktree", "add", "-b", "other", tmpdir.join("other").strpath)
+    other = tmpdir.join("other").strpath
+    # pylint: disable-msg=E1101
+    with pytest.raises(qisrc.dot_git.Unsupported):
+        qisrc.dot_git.read_head(other)
+    assert TestGit(other).get_current_branch() == "other"
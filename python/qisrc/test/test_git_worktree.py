@@ -144,3 +144,16 @@ def test_read_groups(git_worktree, git_server):
     expected = [git_worktree.get_git_project(x) for x in expected_srcs]
     actual = git_worktree.get_git_projects(groups=["foobar", "mygroup"])
     assert expected == actual
+
+def test_get_projects_on_branch(git_worktree, git_server):
+    git_server.create_repo("foo.git")
+    git_server.switch_manifest_branch("devel")
+    git_server.change_branch("foo.git", "devel")
+    git_worktree.configure_manifest(git_server.manifest_url, branch="master")
+    foo_proj = git_worktree.get_git_project("foo")
+    git_worktree._syncer.sync()
+    projects = git_worktree.get_projects_on_branch("devel")
+    assert projects["foo"].default_branch.name == "devel"
+    assert projects["foo"].path == foo_proj.path
+    # Projects of the worktree are not modified
+    assert foo_proj.default_branch.name == "master"
@@ -32,7 +32,8 @@ def test_checkout_preserve_changes_when_checkout_fails(qisrc_action, git_server)
     readme = os.path.join(foo_proj.path, "README.txt")
     with open(readme, "w") as fp:
         fp.write("unstaged\n")
-    qisrc_action("checkout", "devel")
+    rc = qisrc_action("checkout", "devel", retcode=True)
+    assert rc != 0
     foo_proj = git_worktree.get_git_project("foo")
     foo_git = qisrc.git.Git(foo_proj.path)
     assert foo_git.get_current_branch() == "master"
@@ -71,3 +72,32 @@ def test_skip_checkout_when_possible(qisrc_action, git_server, record_messages):
     qisrc_action("init", manifest_url, "--branch", "master")
     qisrc_action("checkout", "devel")
     assert not record_messages.find("Checkout bar")
+
+def test_checkout_nothing_when_one_project_is_dirty(qisrc_action, git_server,
+                                                    record_messages):
+    manifest_url = git_server.manifest_url
+    git_server.create_repo("foo.git")
+    git_server.create_repo("bar.git")
+    git_server.push_file("foo.git", "README.txt", "readme\n")
+    qisrc_action("init", manifest_url)
+    git_server.switch_manifest_branch("devel")
+    git_server.change_branch("foo.git", "devel")
+    git_server.change_branch("bar.git", "devel")
+    git_worktree = TestGitWorkTree()
+    foo_proj = git_worktree.get_git_project("foo")
+    with open(os.path.join(foo_proj.path, "README.txt"), "w") as fp:
+        fp.write("unstaged\n")
+    rc = qisrc_action("checkout", "devel", "-j", "2", retcode=True)
+    assert rc != 0
+    assert record_messages.find("no project was changed")
+    # The branch of the manifest did not change either
+    git_worktree = TestGitWorkTree()
+    assert git_worktree.manifest.branch == "master"
+    for src in ["foo", "bar"]:
+        git = qisrc.git.Git(git_worktree.get_git_project(src).path)
+        assert git.get_current_branch() == "master"
+    # With --force, everything is checked out
+    qisrc_action("checkout", "devel", "--force", "-j", "2")
+    for src in ["foo", "bar"]:
+        git = qisrc.git.Git(git_worktree.get_git_project(src).path)
+        assert git.get_current_branch() == "devel"
@@ -1,3 +1,11 @@
+import os
+import time
+
+import pytest
+
+from qisys import ui
+import qisys.command
+
 def test_qisrc_foreach(qisrc_action, record_messages):
     worktree = qisrc_action.worktree
     worktree.create_project("not_in_git")
@@ -10,3 +18,47 @@ def test_qisrc_foreach(qisrc_action, record_messages):
     qisrc_action("foreach", "ls", "--all")
     assert record_messages.find("not_in_git")
     assert record_messages.find("git_project")
+
+def test_qisrc_foreach_parallel(qisrc_action, record_messages):
+    git_worktree = qisrc_action.git_worktree
+    foo = git_worktree.create_git_project("foo")
+    bar = git_worktree.create_git_project("bar")
+    with open(os.path.join(foo.path, "foo.txt"), "w") as fp:
+        fp.write("this is foo\n")
+    with open(os.path.join(bar.path, "bar.txt"), "w") as fp:
+        fp.write("this is bar\n")
+    qisrc_action("foreach", "-j", "2", "--", "git", "status", "--short")
+    messages = [x for x in ui._MESSAGES if "txt" in x]
+    # Output is grouped, and in the order of the projects
+    assert messages == ["?? bar.txt\n", "?? foo.txt\n"]
+
+def test_qisrc_foreach_parallel_errors(qisrc_action, record_messages):
+    git_worktree = qisrc_action.git_worktree
+    git_worktree.create_git_project("foo")
+    git_worktree.create_git_project("bar")
+    # pylint: disable-msg=E1101
+    with pytest.raises(SystemExit):
+        qisrc_action("foreach", "-j", "2", "--ignore-errors",
+                     "--", "git", "show", "no-such-ref")
+    assert record_messages.find("Command failed on the following projects")
+    assert record_messages.find(r"\* .*bar")
+    assert record_messages.find(r"\* .*foo")
+    with pytest.raises(qisys.command.CommandFailedException):
+        qisrc_action("foreach", "-j", "2", "--", "git", "show", "no-such-ref")
+
+@pytest.mark.skipif(os.name == "nt", reason="needs sh")
+def test_qisrc_foreach_parallel_stops_on_error(qisrc_action):
+    git_worktree = qisrc_action.git_worktree
+    bar = git_worktree.create_git_project("bar")
+    foo = git_worktree.create_git_project("foo")
+    with open(os.path.join(bar.path, "fail"), "w") as fp:
+        fp.write("")
+    script = "if [ -f fail ]; then exit 2; fi; sleep 2; touch done"
+    # pylint: disable-msg=E1101
+    with pytest.raises(qisys.command.CommandFailedException) as e:
+        qisrc_action("foreach", "-j", "2", "--", "sh", "-c", script)
+    assert e.value.returncode == 2
+    assert e.value.cwd == bar.path
+    # The command still running on foo was killed
+    time.sleep(3)
+    assert not os.path.exists(os.path.join(foo.path, "done"))
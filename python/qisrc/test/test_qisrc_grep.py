@@ -1,4 +1,7 @@
+import json
+
 import qisrc.git
+import qisrc.actions.grep
 
 import py
 
@@ -35,3 +38,86 @@ def test_using_projects(qisrc_action):
     assert rc == 0
     rc = qisrc_action("grep", "-p", "bar", "spam", retcode=True)
     assert rc == 1
+
+def test_max_matches(qisrc_action, record_messages):
+    setup_projects(qisrc_action)
+    foo_proj = qisrc_action.git_worktree.get_git_project("foo")
+    # pylint: disable-msg=E1101
+    foo_path = py.path.local(foo_proj.path)
+    foo_path.join("a.txt").write("this is spam\nmore spam\neven more spam\n")
+    record_messages.reset()
+    rc = qisrc_action("grep", "--max-matches", "2", "spam", retcode=True)
+    assert rc == 0
+    assert record_messages.find("this is spam")
+    assert record_messages.find("more spam")
+    assert not record_messages.find("even more spam")
+
+def test_max_matches_ignores_context(qisrc_action, record_messages):
+    setup_projects(qisrc_action)
+    foo_proj = qisrc_action.git_worktree.get_git_project("foo")
+    # pylint: disable-msg=E1101
+    foo_path = py.path.local(foo_proj.path)
+    foo_path.join("a.txt").write("one\nspam\ntwo\nthree\nfour\n"
+                                 "more spam\nfive\neven more spam\n")
+    record_messages.reset()
+    rc = qisrc_action("grep", "--max-matches", "2", "--path", "none",
+                      "--", "-C1", "spam", retcode=True)
+    assert rc == 0
+    assert record_messages.find("one\nspam\ntwo\n--\nfour\nmore spam\s*$")
+    assert not record_messages.find("even more spam")
+
+def test_parse_column_output():
+    lines = ["a", "1\0match1", "b", "--", "c", "3\0match2", "d", "--",
+             "\x1b[32m1\x1b[m\0match3"]
+    (fields, flags) = qisrc.actions.grep.parse_column_output(lines)
+    assert flags == [False, True, False, False, False, True, False, False, True]
+    assert [x[-1] for x in fields] == ["a", "match1", "b", "--", "c",
+                                       "match2", "d", "--", "match3"]
+    # Only matches
+    (fields, flags) = qisrc.actions.grep.parse_column_output(
+        ["a.txt\x002\x001\0spam", "b.txt\x003\x005\0more spam"])
+    assert flags == [True, True]
+    assert fields == [["a.txt", "2", "spam"], ["b.txt", "3", "more spam"]]
+
+def test_limit_matches():
+    lines = ["a", "match1", "b", "--", "c", "match2", "d", "--", "match3"]
+    flags = [x.startswith("match") for x in lines]
+    assert qisrc.actions.grep.limit_matches(lines, flags, 2)[0] == lines[:6]
+    assert qisrc.actions.grep.limit_matches(lines, flags, 1)[0] == lines[:2]
+    assert qisrc.actions.grep.limit_matches(lines, flags, 5)[0] == lines
+
+def test_json(qisrc_action, capsys):
+    setup_projects(qisrc_action)
+    capsys.readouterr()
+    rc = qisrc_action("grep", "--json", "-j", "2", "spam", retcode=True)
+    assert rc == 0
+    out, _ = capsys.readouterr()
+    matches = [json.loads(x) for x in out.splitlines()]
+    assert matches == [{"project" : "foo", "path" : "foo/a.txt",
+                        "line" : 1, "text" : "this is spam"}]
+
+def test_json_ignores_context(qisrc_action, capsys):
+    setup_projects(qisrc_action)
+    foo_proj = qisrc_action.git_worktree.get_git_project("foo")
+    # pylint: disable-msg=E1101
+    foo_path = py.path.local(foo_proj.path)
+    foo_path.join("a.txt").write("one\nthis is spam\ntwo\n")
+    capsys.readouterr()
+    rc = qisrc_action("grep", "--json", "--", "-C1", "spam", retcode=True)
+    assert rc == 0
+    out, _ = capsys.readouterr()
+    matches = [json.loads(x) for x in out.splitlines()]
+    assert matches == [{"project" : "foo", "path" : "foo/a.txt",
+                        "line" : 2, "text" : "this is spam"}]
+
+def test_max_matches_keeps_separators(qisrc_action, record_messages):
+    setup_projects(qisrc_action)
+    foo_proj = qisrc_action.git_worktree.get_git_project("foo")
+    # pylint: disable-msg=E1101
+    foo_path = py.path.local(foo_proj.path)
+    foo_path.join("a.txt").write("one\nthis is spam\ntwo\n")
+    record_messages.reset()
+    rc = qisrc_action("grep", "--max-matches", "1",
+                      "--", "-n", "-B1", "spam", retcode=True)
+    assert rc == 0
+    assert record_messages.find("a.txt-1-one\na.txt:2:this is spam")
@@ -0,0 +1,25 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+from qisys import ui
+from qisrc.test.conftest import TestGitWorkTree, TestGit
+
+def test_log_in_parallel(qisrc_action, git_server, record_messages):
+    git_server.create_repo("foo")
+    git_server.create_repo("bar")
+    git_server.switch_manifest_branch("devel")
+    qisrc_action("init", git_server.manifest_url, "--branch", "devel")
+    git_worktree = TestGitWorkTree()
+    for src in ["foo", "bar"]:
+        git = TestGit(git_worktree.get_git_project(src).path)
+        git.commit_file("%s.txt" % src, "%s\n" % src)
+    record_messages.reset()
+    qisrc_action("log", "master", "--all", "-j", "2")
+    bar_log = record_messages.find("Create/update bar.txt")
+    foo_log = record_messages.find("Create/update foo.txt")
+    assert bar_log
+    assert foo_log
+    # Projects are displayed in order
+    messages = ui._MESSAGES
+    assert messages.index(bar_log) < messages.index(foo_log)
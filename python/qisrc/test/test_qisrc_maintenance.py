@@ -0,0 +1,39 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import os
+
+import qisrc.git
+import qisrc.maintenance
+from qisrc.test.conftest import TestGitWorkTree, TestGit
+
+def test_maintenance(qisrc_action, git_server, record_messages):
+    git_server.create_repo("foo.git")
+    git_server.create_repo("bar.git")
+    git_server.push_file("foo.git", "foo.txt", "foo", branch="old")
+    qisrc_action("init", git_server.manifest_url)
+    git_worktree = TestGitWorkTree()
+    foo = git_worktree.get_git_project("foo")
+    foo_git = TestGit(foo.path)
+    foo_git.fetch()
+    assert foo_git.get_ref_sha1("refs/remotes/origin/old")
+    server_git = qisrc.git.Git(git_server.srv.join("foo.git").strpath)
+    server_git.call("branch", "-D", "old")
+    foo_git.commit_file("a.txt", "a\n")
+    head = foo_git.get_current_sha1()
+    objects = os.path.join(foo.path, ".git", "objects")
+    assert os.path.exists(os.path.join(objects, head[:2], head[2:]))
+
+    qisrc_action("maintenance", "-j", "2")
+    assert record_messages.find("reclaimed")
+    assert not foo_git.get_ref_sha1("refs/remotes/origin/old")
+    assert os.path.exists(os.path.join(objects, "info", "commit-graph"))
+    assert os.path.exists(os.path.join(objects, "pack", "multi-pack-index"))
+    # Reachable loose objects have been packed
+    assert not os.path.exists(os.path.join(objects, head[:2], head[2:]))
+
+def test_format_size():
+    assert qisrc.maintenance.format_size(12) == "12 B"
+    assert qisrc.maintenance.format_size(2048) == "2 KiB"
+    assert qisrc.maintenance.format_size(3 * 1024 ** 3) == "3.0 GiB"
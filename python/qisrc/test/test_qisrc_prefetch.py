@@ -0,0 +1,45 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import os
+
+from qisrc.test.conftest import TestGitWorkTree, TestGit
+
+def test_prefetch_does_not_touch_branches(qisrc_action, git_server):
+    git_server.create_repo("foo.git")
+    git_server.create_repo("bar.git")
+    qisrc_action("init", git_server.manifest_url)
+    git_server.push_file("foo.git", "foo.txt", "some change")
+    git_worktree = TestGitWorkTree()
+    foo = git_worktree.get_git_project("foo")
+    foo_git = TestGit(foo.path)
+    previous_sha1 = foo_git.get_ref_sha1("refs/remotes/origin/master")
+    qisrc_action("prefetch", "-j", "2")
+    assert foo_git.get_ref_sha1("refs/remotes/origin/master") == previous_sha1
+    assert foo_git.get_ref_sha1("refs/heads/master") == previous_sha1
+    prefetched = foo_git.get_ref_sha1("refs/prefetch/origin/master")
+    assert prefetched
+    assert prefetched != previous_sha1
+    assert not os.path.exists(os.path.join(foo.path, "foo.txt"))
+
+def test_sync_fast_uses_prefetched_refs(qisrc_action, git_server):
+    git_server.create_repo("foo.git")
+    qisrc_action("init", git_server.manifest_url)
+    git_server.push_file("foo.git", "foo.txt", "some change")
+    qisrc_action("prefetch")
+    git_worktree = TestGitWorkTree()
+    foo = git_worktree.get_git_project("foo")
+    foo_git = TestGit(foo.path)
+    previous_sha1 = foo_git.get_ref_sha1("refs/remotes/origin/master")
+    prefetched = foo_git.get_ref_sha1("refs/prefetch/origin/master")
+    assert not foo.get_fetched_sha1()
+    assert foo_git.get_ref_sha1("refs/remotes/origin/master") == previous_sha1
+    assert foo.update_remote_ref_from_prefetch() == prefetched
+    assert foo_git.get_ref_sha1("refs/remotes/origin/master") == prefetched
+    assert foo.get_fetched_sha1() == prefetched
+    # sync --fast moves the remote-tracking ref itself
+    foo_git.call("update-ref", "refs/remotes/origin/master", previous_sha1)
+    qisrc_action("sync", "--fast")
+    assert foo_git.get_ref_sha1("refs/remotes/origin/master") == prefetched
+    assert os.path.exists(os.path.join(foo.path, "foo.txt"))
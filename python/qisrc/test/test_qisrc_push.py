@@ -24,3 +24,23 @@ def test_publish_changes(qisrc_action, git_server):
     _, sha1 = foo_git.call("log", "-1", "--pretty=%H", raises=False)
     (_, remote) = foo_git.call("ls-remote", "gerrit", "refs/for/master", raises=False)
     assert remote == "%s\trefs/for/master" % sha1
+
+def test_push_several_projects(qisrc_action, git_server):
+    git_server.create_repo("foo.git")
+    git_server.create_repo("bar.git", review=True)
+    qisrc_action("init", git_server.manifest_url)
+    git_worktree = TestGitWorkTree()
+    sha1s = dict()
+    for src in ["foo", "bar"]:
+        git_project = git_worktree.get_git_project(src)
+        git = TestGit(git_project.path)
+        git.commit_file("a.txt", "a")
+        _, sha1s[src] = git.call("log", "-1", "--pretty=%H", raises=False)
+    qisrc_action("push", "--all", "-j", "2")
+    foo_git = TestGit(git_worktree.get_git_project("foo").path)
+    (_, remote) = foo_git.call("ls-remote", "origin", "master", raises=False)
+    assert remote == "%s\trefs/heads/master" % sha1s["foo"]
+    bar_git = TestGit(git_worktree.get_git_project("bar").path)
+    (_, remote) = bar_git.call("ls-remote", "gerrit", "refs/for/master",
+                               raises=False)
+    assert remote == "%s\trefs/for/master" % sha1s["bar"]
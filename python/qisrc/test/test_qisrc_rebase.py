@@ -105,3 +105,23 @@ def test_push_after_rebase(git_server, git_worktree, qisrc_action, interact):
     local_sha1 = git.get_ref_sha1("refs/heads/devel")
     remote_sha1 = git.get_ref_sha1("refs/remotes/origin/devel")
     assert local_sha1 == remote_sha1
+
+def test_rebase_reports_every_conflict(git_server, qisrc_action, record_messages):
+    for name in ["foo", "bar"]:
+        git_server.create_repo(name)
+    git_server.switch_manifest_branch("devel")
+    for name in ["foo", "bar"]:
+        git_server.change_branch(name, "devel")
+    qisrc_action("init", git_server.manifest_url, "--branch", "devel")
+    git_worktree = TestGitWorkTree()
+    for name in ["foo", "bar"]:
+        git_server.push_file(name, "conflict.txt", "master")
+        git_project = git_worktree.get_git_project(name)
+        git = TestGit(git_project.path)
+        git.commit_file("conflict.txt", "devel")
+        git.push()
+    # pylint: disable-msg=E1101
+    with pytest.raises(Exception):
+        qisrc_action("rebase", "--branch", "master", "--all", "-j", "2")
+    assert record_messages.find(r"foo\s+\[failed\]")
+    assert record_messages.find(r"bar\s+\[failed\]")
@@ -1,4 +1,5 @@
 import qisrc.git
+import qisrc.status
 from qisrc.test.conftest import TestGitWorkTree
 
 import py
@@ -52,3 +53,36 @@ def test_not_on_any_branch(qisrc_action, record_messages):
     foo_git.checkout(out)
     qisrc_action("status")
     assert record_messages.find("not on any branch")
+
+def test_read_status(git_worktree):
+    foo = git_worktree.create_git_project("foo")
+    foo_git = qisrc.git.Git(foo.path)
+    # pylint: disable-msg=E1101
+    foo_path = py.path.local(foo.path)
+    foo_path.join("a.txt").write("a\n")
+    foo_path.join("b.txt").write("b\n")
+    foo_git.add("a.txt", "b.txt")
+    foo_git.commit("--message", "add a and b")
+    foo_path.join("a.txt").write("changed\n")
+    foo_git.call("mv", "b.txt", "c.txt")
+    foo_path.ensure("untracked", file=True)
+    git_status = qisrc.status.read_status(foo_git)
+    assert git_status.branch == "master"
+    assert git_status.upstream is None
+    assert sorted(git_status.lines) == [" M a.txt", "?? untracked",
+                                        "R  b.txt -> c.txt"]
+    git_status = qisrc.status.read_status(foo_git, untracked=False)
+    assert "?? untracked" not in git_status.lines
+
+def test_ahead_and_behind(qisrc_action, git_server, record_messages):
+    git_server.create_repo("foo.git")
+    git_server.create_repo("bar.git")
+    qisrc_action("init", git_server.manifest_url)
+    git_worktree = TestGitWorkTree()
+    foo = git_worktree.get_git_project("foo")
+    git_server.push_file("foo.git", "new_file", "")
+    foo_git = qisrc.git.Git(foo.path)
+    foo_git.fetch()
+    foo_git.commit("--allow-empty", "--message", "local change")
+    qisrc_action("status", "-j", "2")
+    assert record_messages.find(r"foo : master tracking -1/\+1")
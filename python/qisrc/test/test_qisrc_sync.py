@@ -224,3 +224,30 @@ def test_new_project_under_gitorious(git_worktree, git_server):
     foo = git_worktree.get_git_project("foo")
     assert len(foo.remotes) == 1
     assert foo.default_remote.name == "gitorious"
+
+def test_sync_fast(qisrc_action, git_server):
+    git_server.create_repo("foo.git")
+    git_server.create_repo("bar.git")
+    qisrc_action("init", git_server.manifest_url)
+    git_server.push_file("foo.git", "foo.txt", "some change")
+    git_worktree = TestGitWorkTree()
+    foo = git_worktree.get_git_project("foo")
+    bar = git_worktree.get_git_project("bar")
+    assert not foo.get_fetched_sha1()
+    assert bar.get_fetched_sha1()
+    qisrc_action("sync", "--fast")
+    assert os.path.exists(os.path.join(foo.path, "foo.txt"))
+    assert foo.get_fetched_sha1()
+    # Changes fetched but not rebased yet should still be applied
+    foo_git = TestGit(foo.path)
+    foo_git.reset("--hard", "HEAD~1")
+    qisrc_action("sync", "--fast")
+    assert os.path.exists(os.path.join(foo.path, "foo.txt"))
+
+def test_sync_fast_manifest(qisrc_action, git_server):
+    git_server.create_repo("foo.git")
+    qisrc_action("init", git_server.manifest_url)
+    git_server.create_repo("bar.git")
+    qisrc_action("sync", "--fast")
+    git_worktree = TestGitWorkTree()
+    assert git_worktree.get_git_project("bar")
@@ -2,7 +2,63 @@
 ## Use of this source code is governed by a BSD-style license that can be
 ## found in the COPYING file.
 
+import os
+
 import qisrc.git
 import qisrc.review
 
+import pytest
+
+
+def test_get_ssh_host():
+    assert qisrc.review.get_ssh_host("ssh://john@gerrit:29418/foo.git") == \
+        "john@gerrit:29418"
+    assert qisrc.review.get_ssh_host("git@example.com:foo/bar.git") == \
+        "git@example.com"
+    assert qisrc.review.get_ssh_host("file:///srv/foo.git") is None
+    assert qisrc.review.get_ssh_host("/srv/foo.git") is None
+    assert qisrc.review.get_ssh_host("http://example.com/foo.git") is None
+
+def test_ssh_env_uses_control_master(monkeypatch):
+    monkeypatch.delenv("GIT_SSH", raising=False)
+    monkeypatch.delenv("GIT_SSH_COMMAND", raising=False)
+    env = qisrc.review.get_ssh_env()
+    assert "ControlMaster=auto" in env["GIT_SSH_COMMAND"]
+    monkeypatch.setenv("GIT_SSH_COMMAND", "my-ssh")
+    env = qisrc.review.get_ssh_env()
+    assert env["GIT_SSH_COMMAND"] == "my-ssh"
+
+# pylint: disable-msg=E1101
+@pytest.mark.skipif(os.name == "nt", reason="no ssh multiplexing on Windows")
+def test_ssh_env_checks_control_dir(monkeypatch, tmpdir):
+    monkeypatch.delenv("GIT_SSH", raising=False)
+    monkeypatch.delenv("GIT_SSH_COMMAND", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", tmpdir.strpath)
+    control_dir = tmpdir.join("qisrc-ssh-%i" % os.getuid())
+    env = qisrc.review.get_ssh_env()
+    assert control_dir.strpath in env["GIT_SSH_COMMAND"]
+    assert control_dir.stat().mode & 0777 == 0700
+
+    # Readable by others
+    control_dir.chmod(0755)
+    env = qisrc.review.get_ssh_env()
+    assert "GIT_SSH_COMMAND" not in env
+
+    # A symlink to a directory someone else may control
+    control_dir.remove()
+    target = tmpdir.mkdir("target")
+    target.chmod(0700)
+    control_dir.mksymlinkto(target)
+    env = qisrc.review.get_ssh_env()
+    assert "GIT_SSH_COMMAND" not in env
 
+def test_one_project_per_host_first():
+    urls = ["ssh://a/foo", "ssh://a/bar", "ssh://b/baz", "file:///spam",
+            "ssh://a/eggs"]
+    processed = list()
+    def func(url):
+        processed.append(url)
+        return url.upper()
+    res = qisrc.review.run_by_ssh_host(func, urls, lambda x: x, num_jobs=1)
+    assert res == [x.upper() for x in urls]
+    assert processed[:3] == ["ssh://a/foo", "ssh://b/baz", "file:///spam"]
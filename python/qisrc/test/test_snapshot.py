@@ -95,3 +95,20 @@ def test_generate_load_json(tmpdir, git_server, git_worktree):
     snapshot2.load(snapshot_json)
     assert snapshot2 == snapshot1
 
+
+def test_load_snapshot_reports_failures(git_worktree, tmpdir, record_messages):
+    foo_proj = git_worktree.create_git_project("foo")
+    bar_proj = git_worktree.create_git_project("bar")
+    bar_git = qisrc.git.Git(bar_proj.path)
+    _, bar_ref = bar_git.call("rev-parse", "HEAD", raises=False)
+    bar_git.commit("--message", "empty", "--allow-empty")
+    snapshot = qisrc.snapshot.Snapshot()
+    snapshot.refs["foo"] = "0" * 40
+    snapshot.refs["bar"] = bar_ref
+    snapshot_txt = tmpdir.join("snapshot.txt").strpath
+    snapshot.dump(snapshot_txt)
+    ok = qisrc.snapshot.load_snapshot(git_worktree, snapshot_txt, num_jobs=2)
+    assert not ok
+    assert record_messages.find("Failed to load snapshot for some projects")
+    _, bar_ref_actual = bar_git.call("rev-parse", "HEAD", raises=False)
+    assert bar_ref_actual == bar_ref
@@ -130,3 +130,31 @@ def test_evil_nested():
     (to_add, to_move, to_rm, to_update) = qisrc.sync.compute_repo_diff(old, new)
     assert to_add[0].src == "foo"
     assert to_add[1].src == "foo/bar"
+
+def test_many_repos():
+    num_repos = 5000
+    old = make_repos(*[("p%i.git" % i, "old/p%i" % i, ["origin"])
+                       for i in range(num_repos)])
+    new = make_repos(*[("p%i.git" % i, "new/p%i" % i, ["origin"])
+                       for i in range(num_repos)])
+    new.extend(make_repos(("added.git", "added", ["origin"])))
+    (to_add, to_move, to_rm, to_update) = qisrc.sync.compute_repo_diff(old, new)
+    assert [x.src for x in to_add] == ["added"]
+    assert len(to_move) == num_repos
+    assert to_move[0] == (old[0], "new/p0")
+    assert to_rm == list()
+    assert to_update == list()
+
+def test_first_matching_url_wins():
+    old = make_repos(
+        ("foo.git", "foo", ["origin"]),
+        ("foo.git", "foo-copy", ["origin"]),
+    )
+    new = make_repos(
+        ("foo.git", "lib/foo", ["origin"]),
+    )
+    (to_add, to_move, to_rm, to_update) = qisrc.sync.compute_repo_diff(old, new)
+    assert to_add == list()
+    assert to_move == [(old[0], "lib/foo")]
+    assert to_rm == [old[1]]
+    assert to_update == list()
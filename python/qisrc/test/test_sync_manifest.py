@@ -3,6 +3,9 @@
 ## found in the COPYING file.
 
 
+import os
+import time
+
 import qisrc.sync
 import qisrc.manifest
 import qisrc.git
@@ -152,3 +155,90 @@ def test_rm_nested_repos_root(git_worktree, git_server, qisrc_action):
     assert git_worktree.get_git_project("foo")
     assert git_worktree.get_git_project("foo/bar")
     assert git_worktree.get_git_project("foo/lol")
+
+def test_manifest_is_cached(git_worktree, git_server, monkeypatch):
+    git_server.create_group("mygroup", ["foo.git"], default=True)
+    manifest_url = git_server.manifest_url
+    worktree_syncer = qisrc.sync.WorkTreeSyncer(git_worktree)
+    worktree_syncer.configure_manifest(manifest_url)
+    cache = git_worktree.tmpdir.join(".qi", "manifest-cache")
+    assert cache.listdir()
+
+    # Cached in memory and on disk, so the manifest is not parsed again
+    parsed = list()
+    def fake_load(manifest):
+        parsed.append(manifest.manifest_xml)
+    monkeypatch.setattr(qisrc.manifest.Manifest, "load", fake_load)
+    monkeypatch.setattr(qisrc.sync, "_MANIFEST_CACHE", dict())
+    worktree_syncer = qisrc.sync.WorkTreeSyncer(git_worktree)
+    repos = worktree_syncer.read_remote_manifest()
+    assert [x.src for x in repos] == ["foo"]
+    assert worktree_syncer.manifest.groups == ["mygroup"]
+    assert not parsed
+
+    # Callers can modify the repos
+    repos[0].src = "bar"
+    assert [x.src for x in worktree_syncer.read_remote_manifest()] == ["foo"]
+
+def test_manifest_cache_follows_commits(git_worktree, git_server):
+    git_server.create_repo("foo.git")
+    manifest_url = git_server.manifest_url
+    worktree_syncer = qisrc.sync.WorkTreeSyncer(git_worktree)
+    worktree_syncer.configure_manifest(manifest_url)
+    git_server.create_repo("bar.git")
+    worktree_syncer.sync()
+    repos = worktree_syncer.read_remote_manifest()
+    assert sorted(x.src for x in repos) == ["bar", "foo"]
+
+def test_manifest_cache_is_bounded(git_worktree, git_server):
+    manifest_url = git_server.manifest_url
+    worktree_syncer = qisrc.sync.WorkTreeSyncer(git_worktree)
+    worktree_syncer.configure_manifest(manifest_url)
+    for i in range(qisrc.sync.MANIFEST_CACHE_SIZE + 2):
+        git_server.create_repo("foo%i.git" % i)
+        worktree_syncer.sync()
+    cache = git_worktree.tmpdir.join(".qi", "manifest-cache")
+    assert len(cache.listdir()) == qisrc.sync.MANIFEST_CACHE_SIZE
+
+def test_manifest_cache_ignores_bad_entries(git_worktree, git_server,
+                                            monkeypatch):
+    git_server.create_repo("foo.git")
+    manifest_url = git_server.manifest_url
+    worktree_syncer = qisrc.sync.WorkTreeSyncer(git_worktree)
+    worktree_syncer.configure_manifest(manifest_url)
+    cache = git_worktree.tmpdir.join(".qi", "manifest-cache")
+    for entry in cache.listdir():
+        # A valid pickle, but not a cache entry
+        entry.write("I42\n.")
+    monkeypatch.setattr(qisrc.sync, "_MANIFEST_CACHE", dict())
+    repos = worktree_syncer.read_remote_manifest()
+    assert [x.src for x in repos] == ["foo"]
+
+def test_manifest_cache_key_depends_on_version(git_worktree, git_server,
+                                               monkeypatch):
+    manifest_url = git_server.manifest_url
+    worktree_syncer = qisrc.sync.WorkTreeSyncer(git_worktree)
+    worktree_syncer.configure_manifest(manifest_url)
+    manifest_xml = os.path.join(worktree_syncer.manifest_repo, "manifest.xml")
+    key = worktree_syncer._manifest_cache_key(manifest_xml)
+    monkeypatch.setattr(qisrc.sync, "MANIFEST_CACHE_VERSION",
+                        qisrc.sync.MANIFEST_CACHE_VERSION + 1)
+    assert worktree_syncer._manifest_cache_key(manifest_xml) != key
+
+def test_manifest_cache_ignores_tmp_files(git_worktree, git_server):
+    manifest_url = git_server.manifest_url
+    worktree_syncer = qisrc.sync.WorkTreeSyncer(git_worktree)
+    worktree_syncer.configure_manifest(manifest_url)
+    cache = git_worktree.tmpdir.join(".qi", "manifest-cache")
+    # Being written by an other process
+    tmp_files = [cache.join("%i.pickle.42.tmp" % i)
+                 for i in range(qisrc.sync.MANIFEST_CACHE_SIZE)]
+    for tmp_file in tmp_files:
+        tmp_file.write("")
+        # More recent than every entry
+        tmp_file.setmtime(time.time() + 3600)
+    git_server.create_repo("foo.git")
+    worktree_syncer.sync()
+    assert all(x.check() for x in tmp_files)
+    entries = [x for x in cache.listdir() if x.ext == ".pickle"]
+    assert len(entries) > 1
@@ -3,6 +3,8 @@ import copy
 import operator
 
 from qisys import ui
+import qisys.lock
+import qisys.parallel
 import qisys.worktree
 import qisrc.git
 import qisrc.snapshot
@@ -48,9 +50,9 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
         """ Run a sync using just the xml file given as parameter """
         return self._syncer.sync_from_manifest_file(xml_path)
 
-    def sync(self):
+    def sync(self, fast=False):
         """ Delegates to WorkTreeSyncer """
-        return self._syncer.sync()
+        return self._syncer.sync(fast=fast)
 
     def load_git_projects(self):
         """ Build a list of git projects using the
@@ -121,31 +123,33 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
     def manifest(self):
         return self._syncer.manifest
 
-    def snapshot(self):
+    def snapshot(self, num_jobs=None):
         """ Return a :py:class`.Snapshot` of the current worktree state
 
+        :param num_jobs: number of projects to inspect in parallel
+
         """
         snapshot = qisrc.snapshot.Snapshot()
         snapshot.manifest = self.manifest
         git = qisrc.git.Git(self._syncer.manifest_repo)
-        rc, out = git.call("rev-parse", "HEAD", raises=False)
-        snapshot.manifest.ref = out
-        for git_project in self.git_projects:
-            src = git_project.src
-            git = qisrc.git.Git(git_project.path)
-            rc, out = git.call("rev-parse", "HEAD", raises=False)
-            if rc != 0:
-                ui.error("git rev-parse HEAD failed for", src)
+        snapshot.manifest.ref = git.get_current_sha1()
+        sha1s = qisys.parallel.run(lambda x: qisrc.git.Git(x.path).get_current_sha1(),
+                                   self.git_projects, num_jobs=num_jobs)
+        for (git_project, sha1) in zip(self.git_projects, sha1s):
+            if not sha1:
+                ui.error("git rev-parse HEAD failed for", git_project.src)
                 continue
-            snapshot.refs[src] = out.strip()
+            snapshot.refs[git_project.src] = sha1
         return snapshot
 
     def add_git_project(self, src):
         """ Add a new git project """
         elem = qisys.qixml.etree.Element("project")
         elem.set("src", src)
-        self._root_xml.append(elem)
-        qisys.qixml.write(self._root_xml, self.git_xml)
+        with qisys.lock.lock_file(self.git_xml):
+            self._reload_git_xml()
+            self._root_xml.append(elem)
+            qisys.qixml.write(self._root_xml, self.git_xml)
         # This will trigger the call to self.load_git_projects()
         self.worktree.add_project(src)
         new_proj = self.get_git_project(src)
@@ -234,44 +238,74 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
         self.save_project_config(project)
         return True
 
-    def checkout(self, branch, force=False):
-        """ Called by ``qisrc checkout``
+    def check_checkout(self, branch, force=False, num_jobs=None):
+        """ Called by ``qisrc checkout`` before the branch of the
+        manifest is changed
+
+        Check every project whose branch would change, so that nothing
+        is done when some of them can not be checked out (local
+        changes, detached HEAD, ...)
+
+        :return: False if some projects can not be checked out
+
+        """
+        self._syncer.fetch_manifest()
+        git = qisrc.git.Git(self._syncer.manifest_repo)
+        if not git.get_ref_sha1("refs/remotes/origin/" + branch):
+            # Changing the branch of the manifest will fail with
+            # a better error message
+            return True
+        projects = self.get_projects_on_branch(branch).values()
+        to_checkout = _get_projects_to_checkout(projects)
+        return _check_projects(to_checkout, force=force, num_jobs=num_jobs)
+
+    def checkout(self, branch, force=False, num_jobs=None):
+        """ Called by ``qisrc checkout``, once the branch of the manifest
+        has been changed (see :py:meth:`check_checkout`)
 
         For each project, checkout the branch if it is different than
         the default branch of the manifest.
 
+        Every project is checked again before anything is done, then
+        projects are checked out in parallel.
+
+        :return: False if some projects could not be checked out
+
         """
         ui.info(ui.green, ":: Checkout projects ...")
-        errors = list()
-        manifest_xml = os.path.join(self._syncer.manifest_repo, "manifest.xml")
-        manifest = qisrc.manifest.Manifest(manifest_xml)
-        max_src = max([len(x.src) for x in self.git_projects])
-        to_checkout = list()
-        for project in self.git_projects:
-            if project.default_branch is None:
-                continue
-            branch_name = project.default_branch.name
-            git = qisrc.git.Git(project.path)
-            if git.get_current_branch() != branch_name:
-                to_checkout.append(project)
+        to_checkout = _get_projects_to_checkout(self.git_projects)
+        if not to_checkout:
+            return True
+        if not _check_projects(to_checkout, force=force, num_jobs=num_jobs):
+            return False
 
-        n = len(to_checkout)
-        for i, project in enumerate(to_checkout):
-            ui.info_count(i, n, ui.bold, "Checkout",
-                         ui.reset, ui.blue, project.src.ljust(max_src), end="\r")
-            if project.default_branch is None:
-                continue
+        def checkout_project(project):
             branch_name = project.default_branch.name
             remote_name = project.default_remote.name
             git = qisrc.git.Git(project.path)
-            ok, err = git.safe_checkout(branch_name, remote_name, force=force)
+            return git.safe_checkout(branch_name, remote_name, force=force)
+
+        max_src = max(len(x.src) for x in to_checkout)
+        n = len(to_checkout)
+        done = list()
+        errors = list()
+        def on_result(_, project, res):
+            ui.info_count(len(done), n, ui.bold, "Checkout",
+                          ui.reset, ui.blue, project.src.ljust(max_src),
+                          end="\r")
+            done.append(project)
+            (ok, error) = res
             if not ok:
-                errors.append((project.src, err))
+                errors.append((project.src, error))
+        qisys.parallel.run(checkout_project, to_checkout, num_jobs=num_jobs,
+                           on_result=on_result)
+        ui.info(" " * (max_src + 19), end="\r")
         if not errors:
-            return
+            return True
         ui.error("Failed to checkout some projects")
-        for (project, error) in errors:
-            ui.info(project, ":", error)
+        for (src, error) in errors:
+            ui.info(src, ":", error)
+        return False
 
     def get_projects_on_branch(self, branch):
         """ Return a dict (src, project) for every project as configured
@@ -285,11 +319,25 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
             raise Exception("Could not read manifest on %s"% ref)
         groups = self._syncer.manifest.groups
         repos = manifest.get_repos(groups=groups)
+        # Same as calling self.find_repo() for each repo, but
+        # without looping over all the projects each time
+        projects_by_url = dict()
+        for project in self.git_projects:
+            for remote in project.remotes:
+                projects_by_url.setdefault(remote.url, project)
         for repo in repos:
-            project = self.find_repo(repo)
+            project = None
+            for url in repo.urls:
+                project = projects_by_url.get(url)
+                if project:
+                    break
             if project:
-                # Make a copy so that we do not modify the projects in place
-                project_copy = copy.deepcopy(project)
+                # Make a copy so that we do not modify the projects in place.
+                # No need for a deep copy: only the branches are modified,
+                # and the remotes are replaced
+                project_copy = copy.copy(project)
+                project_copy.branches = [copy.copy(x) for x in project.branches]
+                project_copy.remotes = list(project.remotes)
                 project_copy.read_remote_config(repo, quiet=True)
                 res[project_copy.src] = project_copy
         return res
@@ -313,22 +361,71 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
                 self._root_xml.remove(xml_elem)
         self._root_xml.append(new_elem)
 
+    def _reload_git_xml(self):
+        """ Re-read .qi/git.xml, which may have been changed
+        by an other process. Must be called with the lock held
+
+        """
+        self._root_xml = qisys.qixml.read(self.git_xml).getroot()
+
     def save_project_config(self, project):
         """ Save the project instance in .qi/git.xml """
         project_xml = project.dump_xml()
-        self._set_elem(project.src, project_xml)
-        qisys.qixml.write(self._root_xml, self.git_xml)
+        with qisys.lock.lock_file(self.git_xml):
+            self._reload_git_xml()
+            self._set_elem(project.src, project_xml)
+            qisys.qixml.write(self._root_xml, self.git_xml)
 
     def save_git_config(self):
         """ Save the worktree config in .qi/git.xml """
-        for project in self.git_projects:
-            project_xml = project.dump_xml()
-            self._set_elem(project.src, project_xml)
-        qisys.qixml.write(self._root_xml, self.git_xml)
+        with qisys.lock.lock_file(self.git_xml):
+            self._reload_git_xml()
+            for project in self.git_projects:
+                project_xml = project.dump_xml()
+                self._set_elem(project.src, project_xml)
+            qisys.qixml.write(self._root_xml, self.git_xml)
 
     def __repr__(self):
         return "<GitWorkTree in %s>" % self.root
 
+def _get_projects_to_checkout(projects):
+    """ The projects not on their default branch """
+    res = list()
+    for project in projects:
+        if project.default_branch is None:
+            continue
+        git = qisrc.git.Git(project.path)
+        if git.get_current_branch() != project.default_branch.name:
+            res.append(project)
+    return res
+
+def _check_projects(projects, force=False, num_jobs=None):
+    """ Check that every project can be checked out, and display the
+    problems otherwise
+
+    :return: False if some projects can not be checked out
+
+    """
+    def check(project):
+        git = qisrc.git.Git(project.path)
+        if not git.get_current_branch():
+            return "not on any branch"
+        if force:
+            return None
+        (clean, error) = git.require_clean_worktree()
+        if not clean:
+            return error
+    errors = qisys.parallel.run(check, projects, num_jobs=num_jobs)
+    errors = [(project.src, error) for (project, error)
+              in zip(projects, errors) if error]
+    if not errors:
+        return True
+    ui.error("Some projects can not be checked out, "
+             "no project was changed")
+    for (src, error) in errors:
+        ui.info(src, ":", error)
+    return False
+
 def on_no_matching_projects(worktree, groups=None):
     """ What to do when we find an empty worktree """
     if groups and len(groups) > 1:
@@ -3,29 +3,41 @@
 """
 
 import sys
+import threading
 from qisys import ui
 import qisys.command
+import qisys.parallel
 import qisys
 
-def foreach(projects, cmd, ignore_errors=True):
+def foreach(projects, cmd, ignore_errors=True, num_jobs=1, stream=False):
     """ Execute the command on every project
     :param ignore_errors: whether to stop at first
     failure
+    :param num_jobs: number of projects to run the command
+    on at the same time. When greater than one, the output of each
+    command is captured and displayed as one block per project, in
+    the order of the projects
+    :param stream: display each block as soon as the command is over
+    instead of in the order of the projects
 
     """
     errors = list()
     ui.info(ui.green, "Running `%s` on every project" % " ".join(cmd))
-    for i, project in enumerate(projects):
-        ui.info_count(i, len(projects), ui.blue, project.src)
-        command = cmd[:]
-        try:
-            qisys.command.call(command, cwd=project.path)
-        except qisys.command.CommandFailedException:
-            if ignore_errors:
-                errors.append(project)
-                continue
-            else:
-                raise
+    if num_jobs and num_jobs > 1:
+        errors = _foreach_parallel(projects, cmd, ignore_errors=ignore_errors,
+                                   num_jobs=num_jobs, stream=stream)
+    else:
+        for i, project in enumerate(projects):
+            ui.info_count(i, len(projects), ui.blue, project.src)
+            command = cmd[:]
+            try:
+                qisys.command.call(command, cwd=project.path)
+            except qisys.command.CommandFailedException:
+                if ignore_errors:
+                    errors.append(project)
+                    continue
+                else:
+                    raise
     if not errors:
         return
     print
@@ -33,3 +45,70 @@ def foreach(projects, cmd, ignore_errors=True):
     for project in errors:
         ui.info(ui.green, " * ", ui.reset, ui.blue, project.src)
     sys.exit(1)
+
+def _foreach_parallel(projects, cmd, ignore_errors=True, num_jobs=1, stream=False):
+    """ Helper for foreach. Return the list of projects for
+    which the command failed.
+
+    Unless ``ignore_errors`` is True, the first failure stops the
+    command on the other projects: the ones not started yet are
+    skipped, and the running commands are killed before raising
+
+    """
+    executable = qisys.command.find_program(cmd[0])
+    if not executable:
+        raise qisys.command.NotInPath(cmd[0])
+    command = [executable] + cmd[1:]
+    errors = list()
+    done = list()
+    running = list()
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def stop():
+        with lock:
+            stopped.set()
+            to_kill = list(running)
+        for process in to_kill:
+            process.kill()
+
+    def run_command(project):
+        process = qisys.command.Process(command, cwd=project.path)
+        with lock:
+            if stopped.is_set():
+                return None
+            running.append(process)
+        try:
+            process.run()
+        finally:
+            with lock:
+                running.remove(process)
+        if process.return_type == qisys.command.Process.NOT_RUN:
+            raise process.exception
+        if process.return_type == qisys.command.Process.INTERRUPTED:
+            return None
+        if process.returncode != 0 and not ignore_errors:
+            stop()
+        return process
+
+    def on_result(_, project, process):
+        if not process:
+            # Skipped or killed after a failure
+            return
+        ui.info_count(len(done), len(projects), ui.blue, project.src)
+        done.append(project)
+        if process.out:
+            ui.info(process.out, sep="", end="")
+        if process.returncode != 0:
+            errors.append((project, process.returncode))
+
+    qisys.parallel.run(run_command, projects, num_jobs=num_jobs,
+                       on_result=on_result, ordered=not stream)
+    # Keep the summary in the order of the projects
+    failed = [x for x in projects if x in dict(errors)]
+    if failed and not ignore_errors:
+        project = failed[0]
+        raise qisys.command.CommandFailedException(command,
+                                                   dict(errors)[project],
+                                                   cwd=project.path)
+    return failed
@@ -47,6 +47,8 @@ class Process:
         self.out = ""
         self.returncode = None
         self._process = None
+        self._killed = False
+        self._lock = threading.Lock()
         self.exception = None
         self.return_type = Process.FAILED
 
@@ -65,19 +67,25 @@ class Process:
                     opts = {
                         'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP,
                     }
-                self._process = subprocess.Popen(self.cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    cwd=self.cwd,
-                    env=self.env,
-                    **opts)
+                with self._lock:
+                    if self._killed:
+                        self.return_type = Process.INTERRUPTED
+                        return
+                    self._process = subprocess.Popen(self.cmd,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT,
+                        cwd=self.cwd,
+                        env=self.env,
+                        **opts)
             except Exception, e:
                 self.exception = e
                 self.return_type = Process.NOT_RUN
                 return
             self.out = self._process.communicate()[0]
             self.returncode = self._process.returncode
-            if self.returncode == 0:
+            if self._killed:
+                self.return_type = Process.INTERRUPTED
+            elif self.returncode == 0:
                 ui.debug("Setting return code to Process.OK")
                 self.return_type = Process.OK
             ui.debug("Thread terminated.")
@@ -97,6 +105,27 @@ class Process:
             ui.debug("Process timed out")
             self._kill_subprocess()
 
+    def kill(self):
+        """ Kill the process and its children. Can be called from any
+        thread, even before the process is started, in which case it
+        will not be started
+
+        """
+        with self._lock:
+            self._killed = True
+            process = self._process
+        if not process:
+            return
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGTERM)
+            elif os.name == 'nt':
+                # pylint: disable-msg=E1101
+                os.kill(process.pid, signal.CTRL_BREAK_EVENT)
+        except OSError:
+            # Already done
+            pass
+
     def _kill_subprocess(self):
         if self._thread and self._process:
             self.return_type = Process.TIME_OUT
@@ -0,0 +1,195 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" A GNU make jobserver, shared by every build spawned by a qi
+process, so that the number of jobs given with ``-j`` is respected
+even when several builds run at the same time.
+
+The jobserver is a FIFO containing one token per job slot. Every
+child build holds one implicit slot, and must read a token from the
+FIFO before starting any other job, then write it back when the job
+is done. This is what ``make`` (and ``ninja`` >= 1.13) do when
+``MAKEFLAGS`` tells them where the jobserver is.
+
+A process running several child builds at once must also hold a
+token (see :py:meth:`JobServer.acquire`) for each child but one, for
+instance by running each child in a :py:meth:`JobServer.slot`.
+
+If qibuild is itself run by a make using a jobserver, the jobserver
+of the parent make is used instead.
+
+Only supported on POSIX.
+
+"""
+
+import os
+import re
+import errno
+import atexit
+import select
+import contextlib
+import tempfile
+import threading
+
+from qisys import ui
+import qisys.command
+import qisys.sh
+
+JOBSERVER_RE = re.compile(r"--jobserver-(auth|fds)=")
+# ninja only supports jobservers using a named FIFO
+FIFO_JOBSERVER_RE = re.compile(r"--jobserver-auth=fifo:")
+
+_JOBSERVER = None
+_JOBSERVER_LOCK = threading.Lock()
+
+# Path to ninja -> version
+_NINJA_VERSIONS = dict()
+
+
+def get_jobserver(num_jobs):
+    """ Return the :py:class:`JobServer` of this process, creating it
+    the first time with ``num_jobs`` slots.
+
+    :return: None if jobservers are not supported on this platform,
+             if ``num_jobs`` is not set, or if a jobserver is already
+             provided by a parent process
+
+    """
+    global _JOBSERVER
+    if os.name != "posix" or not num_jobs:
+        return None
+    if has_parent_jobserver():
+        return None
+    with _JOBSERVER_LOCK:
+        if _JOBSERVER is None:
+            try:
+                _JOBSERVER = JobServer(num_jobs)
+            except (IOError, OSError) as e:
+                ui.warning("Could not create jobserver:", e)
+                return None
+            atexit.register(_JOBSERVER.close)
+        return _JOBSERVER
+
+
+def ninja_has_jobserver_client(env=None):
+    """ Whether ninja is recent enough (1.13) to use a jobserver """
+    ninja = qisys.command.find_program("ninja", env=env)
+    if not ninja:
+        return False
+    if ninja not in _NINJA_VERSIONS:
+        try:
+            out = qisys.command.check_output([ninja, "--version"], env=env)
+            version = tuple(int(x) for x in out.strip().split(".")[:2])
+        except (qisys.command.CommandFailedException, OSError, ValueError):
+            version = (0, 0)
+        _NINJA_VERSIONS[ninja] = version
+    return _NINJA_VERSIONS[ninja] >= (1, 13)
+
+
+def has_parent_jobserver(env=None, ninja=False):
+    """ Whether a jobserver is advertised in MAKEFLAGS
+
+    :param ninja: only look for jobservers ninja can use
+
+    """
+    if env is None:
+        env = os.environ
+    regexp = FIFO_JOBSERVER_RE if ninja else JOBSERVER_RE
+    return bool(regexp.search(env.get("MAKEFLAGS", "")))
+
+
+class JobServer(object):
+    """ A FIFO containing ``num_jobs - 1`` tokens, the last slot being
+    the implicit slot of the first child
+
+    """
+    def __init__(self, num_jobs):
+        self.num_jobs = num_jobs
+        self.tmp_dir = tempfile.mkdtemp(prefix="qi-jobserver-")
+        self.fifo = os.path.join(self.tmp_dir, "fifo")
+        os.mkfifo(self.fifo, 0600)
+        # Opening read-write does not block, and makes sure the FIFO
+        # is never closed while children use it
+        self.read_fd = os.open(self.fifo, os.O_RDWR)
+        self.write_fd = os.open(self.fifo, os.O_WRONLY)
+        os.write(self.write_fd, "+" * (num_jobs - 1))
+        self._tokens = list()
+        self._lock = threading.Lock()
+        self._implicit_slot_used = False
+
+    @property
+    def makeflags(self):
+        """ MAKEFLAGS for GNU make (both the new and the pre-4.2 syntax) """
+        fds = "%i,%i" % (self.read_fd, self.write_fd)
+        return "-j --jobserver-fds=%s --jobserver-auth=%s" % (fds, fds)
+
+    @property
+    def ninja_makeflags(self):
+        """ MAKEFLAGS for ninja >= 1.13, which only supports FIFOs """
+        return "-j --jobserver-auth=fifo:%s" % self.fifo
+
+    def setup_env(self, env, ninja=False):
+        """ Advertise the jobserver in the MAKEFLAGS of the given
+        environment, keeping the other flags
+
+        """
+        flags = env.get("MAKEFLAGS", "")
+        flags = " ".join(x for x in flags.split()
+                         if not x.startswith("-j") and not JOBSERVER_RE.match(x))
+        if ninja:
+            env["MAKEFLAGS"] = (flags + " " + self.ninja_makeflags).strip()
+        else:
+            env["MAKEFLAGS"] = (flags + " " + self.makeflags).strip()
+
+    def acquire(self):
+        """ Wait for a free slot """
+        while True:
+            # make sets O_NONBLOCK on the FIFO, and other children
+            # may take the token first
+            try:
+                token = os.read(self.read_fd, 1)
+                if token:
+                    break
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EINTR):
+                    raise
+            select.select([self.read_fd], list(), list())
+        with self._lock:
+            self._tokens.append(token)
+
+    def release(self):
+        """ Give back a slot taken with :py:meth:`acquire` """
+        with self._lock:
+            token = self._tokens.pop()
+        os.write(self.write_fd, token)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """ To wrap each child started while others may be running:
+        the first one uses the implicit slot of this process, the
+        other ones wait for a token
+
+        """
+        with self._lock:
+            implicit = not self._implicit_slot_used
+            self._implicit_slot_used = True
+        if not implicit:
+            self.acquire()
+        try:
+            yield
+        finally:
+            if implicit:
+                with self._lock:
+                    self._implicit_slot_used = False
+            else:
+                self.release()
+
+    def close(self):
+        """ Close the FIFO. Children using it must be done """
+        for fd in (self.read_fd, self.write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        qisys.sh.rm(self.tmp_dir)
@@ -0,0 +1,104 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Advisory locks, so that several qi processes can safely
+use the same files at the same time
+
+Usage::
+
+    with qisys.lock.lock_file("/path/to/worktree.xml"):
+        # read, modify and write worktree.xml
+
+Locks are taken on a ``.lock`` file next to the file to protect.
+They are re-entrant: a thread holding a lock can take it again.
+
+"""
+
+import os
+import time
+import threading
+import contextlib
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class _Lock(object):
+    """ The state of a lock file in this process """
+    def __init__(self):
+        self.rlock = threading.RLock()
+        self.count = 0
+        self.fp = None
+
+# Lock file path -> _Lock
+_LOCKS = dict()
+_LOCKS_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def lock_file(path):
+    """ Hold an exclusive lock on the given file, waiting for
+    other processes and threads to release it first.
+
+    Nothing is locked if ``path`` is a file object instead of
+    a path, since there is nothing to share with other processes
+
+    """
+    if not isinstance(path, basestring):
+        yield
+        return
+    lock_path = os.path.abspath(path) + ".lock"
+    with _LOCKS_LOCK:
+        lock = _LOCKS.setdefault(lock_path, _Lock())
+    with lock.rlock:
+        if lock.count == 0:
+            lock.fp = _acquire(lock_path)
+        lock.count += 1
+        try:
+            yield
+        finally:
+            lock.count -= 1
+            if lock.count == 0:
+                _release(lock.fp)
+                lock.fp = None
+
+
+def lock_dir(path):
+    """ Hold an exclusive lock on a directory, using a
+    ``qi.lock`` file inside the directory, which must exist
+
+    """
+    return lock_file(os.path.join(path, "qi"))
+
+
+def _acquire(lock_path):
+    fp = open(lock_path, "a+")
+    try:
+        if os.name == "nt":
+            fp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except IOError:
+                    time.sleep(0.1)
+        else:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+    except:
+        fp.close()
+        raise
+    return fp
+
+
+def _release(fp):
+    try:
+        if os.name == "nt":
+            fp.seek(0)
+            msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+    finally:
+        fp.close()
@@ -0,0 +1,240 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+""" Run the same function on several items, using a bounded
+pool of threads
+
+Meant for tasks spending most of their time waiting for a
+sub-process (git, cmake, ...), so using threads is good enough.
+
+"""
+
+import sys
+import heapq
+import threading
+import multiprocessing
+import Queue
+
+
+def get_num_jobs(num_jobs=None):
+    """ Return the number of jobs to use when nothing was specified:
+    the number of cpus of the machine
+
+    """
+    if num_jobs:
+        return num_jobs
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def run(func, items, num_jobs=None, on_result=None, ordered=False):
+    """ Call ``func(item)`` for each item, running at most
+    ``num_jobs`` calls at the same time.
+
+    :param on_result: a callback called with ``(index, item, result)``
+                      each time an item is processed. It is always called
+                      from the calling thread, so it is safe to use it to
+                      display results
+    :param ordered: if True, ``on_result`` is called in the order of
+                    the items, else as soon as the results are available
+
+    :return: the list of results, in the order of the items
+
+    If ``func`` raises, the remaining items are still processed, and
+    the first exception is re-raised at the end.
+
+    """
+    items = list(items)
+    num_jobs = min(get_num_jobs(num_jobs), len(items))
+    results = [None] * len(items)
+    if num_jobs <= 1:
+        for (i, item) in enumerate(items):
+            results[i] = func(item)
+            if on_result:
+                on_result(i, item, results[i])
+        return results
+
+    tasks = Queue.Queue()
+    for (i, item) in enumerate(items):
+        tasks.put((i, item))
+    done = Queue.Queue()
+    stop = threading.Event()
+
+    def work():
+        while not stop.is_set():
+            try:
+                (i, item) = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                done.put((i, func(item), None))
+            except Exception:
+                done.put((i, None, sys.exc_info()))
+
+    threads = list()
+    for i in range(num_jobs):
+        thread = threading.Thread(target=work, name="Worker#%i" % i)
+        thread.daemon = True
+        threads.append(thread)
+        thread.start()
+
+    error = None
+    pending = dict()
+    next_index = 0
+    try:
+        for _ in range(len(items)):
+            # Do not block forever so that this can be interrupted
+            while True:
+                try:
+                    (i, result, exc_info) = done.get(timeout=0.1)
+                    break
+                except Queue.Empty:
+                    pass
+            if exc_info and not error:
+                error = exc_info
+            results[i] = result
+            if not on_result:
+                continue
+            if not ordered:
+                if not exc_info:
+                    on_result(i, items[i], result)
+                continue
+            pending[i] = exc_info
+            while next_index in pending:
+                if not pending.pop(next_index):
+                    on_result(next_index, items[next_index],
+                              results[next_index])
+                next_index += 1
+    except:
+        stop.set()
+        raise
+
+    for thread in threads:
+        thread.join()
+    if error:
+        raise error[0], error[1], error[2]
+    return results
+
+
+def run_graph(func, items, get_deps, num_jobs=None, on_result=None):
+    """ Same as :py:func:`run`, but ``func(item)`` is only called once
+    it has been called successfully on every dependency of the item.
+    Items are started as soon as their dependencies are done, in the
+    order of the items when several of them are ready.
+
+    :param get_deps: a function returning the items an item depends on.
+                     Dependencies that are not in ``items`` are ignored
+
+    If ``func`` raises, the items depending on the failing item are
+    skipped (their result is None), the others are still processed,
+    and the first exception is re-raised at the end.
+
+    """
+    items = list(items)
+    if not items:
+        return list()
+    num_jobs = min(get_num_jobs(num_jobs), len(items))
+    indexes = dict((id(item), i) for (i, item) in enumerate(items))
+    pending = list()
+    dependents = [list() for _ in items]
+    for (i, item) in enumerate(items):
+        deps = set(indexes[id(x)] for x in get_deps(item) if id(x) in indexes)
+        deps.discard(i)
+        pending.append(len(deps))
+        for dep in deps:
+            dependents[dep].append(i)
+    ready = [i for (i, count) in enumerate(pending) if count == 0]
+    heapq.heapify(ready)
+    results = [None] * len(items)
+    # Items that are done, failed or skipped
+    finished = set()
+    errors = list()
+
+    def on_done(i, result, exc_info):
+        finished.add(i)
+        if exc_info:
+            errors.append(exc_info)
+            # Skip everything depending on this item
+            to_skip = list(dependents[i])
+            while to_skip:
+                j = to_skip.pop()
+                if j not in finished:
+                    finished.add(j)
+                    to_skip.extend(dependents[j])
+            return
+        results[i] = result
+        if on_result:
+            on_result(i, items[i], result)
+        for j in dependents[i]:
+            pending[j] -= 1
+            if pending[j] == 0 and j not in finished:
+                heapq.heappush(ready, j)
+
+    def call(i):
+        try:
+            return (i, func(items[i]), None)
+        except Exception:
+            return (i, None, sys.exc_info())
+
+    tasks = Queue.Queue()
+    done = Queue.Queue()
+    stop = threading.Event()
+
+    def work():
+        while not stop.is_set():
+            try:
+                i = tasks.get(timeout=0.1)
+            except Queue.Empty:
+                continue
+            if i is None:
+                return
+            done.put(call(i))
+
+    threads = list()
+    if num_jobs > 1:
+        for i in range(num_jobs):
+            thread = threading.Thread(target=work, name="Worker#%i" % i)
+            thread.daemon = True
+            threads.append(thread)
+            thread.start()
+
+    running = 0
+    try:
+        while True:
+            while ready and running < max(num_jobs, 1):
+                i = heapq.heappop(ready)
+                if threads:
+                    tasks.put(i)
+                    running += 1
+                else:
+                    on_done(*call(i))
+            if not running:
+                break
+            # Do not block forever so that this can be interrupted
+            while True:
+                try:
+                    res = done.get(timeout=0.1)
+                    break
+                except Queue.Empty:
+                    pass
+            running -= 1
+            on_done(*res)
+    except:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            tasks.put(None)
+
+    for thread in threads:
+        thread.join()
+    if errors:
+        error = errors[0]
+        raise error[0], error[1], error[2]
+    if len(finished) != len(items):
+        cycle = [str(items[i]) for i in range(len(items)) if i not in finished]
+        raise Exception("Circular dependencies between: %s" % ", ".join(cycle))
+    return results
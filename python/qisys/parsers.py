@@ -61,6 +61,12 @@ def project_parser(parser, positional=True):
     parser.set_defaults(single=False, projects = list())
     return group
 
+def jobs_parser(parser, default=None,
+                help="Number of projects to process in parallel"):
+    """Parser settings for actions able to work on several projects at once."""
+    parser.add_argument("-j", dest="num_jobs", type=int, default=default,
+                        help=help)
+
 def build_parser(parser, group=None, include_worktree_parser=True):
     """Parser settings for builders."""
     if include_worktree_parser:
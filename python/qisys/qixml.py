@@ -8,7 +8,9 @@
 
 """
 
+import os
 import re
+import threading
 from qisys import ui
 
 from xml.etree import ElementTree as etree
@@ -140,7 +142,20 @@ def write(xml_obj, output, **kwargs):
         tree = etree.ElementTree(element=xml_obj)
         root = xml_obj
     indent(root)
-    tree.write(output, **kwargs)
+    if not isinstance(output, basestring):
+        tree.write(output, **kwargs)
+        return
+    # Write to a temporary file first, so that other processes never
+    # read a half-written file. Resolve symlinks so that the rename
+    # replaces the file they point to, and not the link itself
+    output = os.path.realpath(output)
+    tmp_output = "%s.%i.%i.tmp" % (output, os.getpid(),
+                                   threading.current_thread().ident)
+    tree.write(tmp_output, **kwargs)
+    if os.name == "nt" and os.path.exists(output):
+        # os.rename does not overwrite files on Windows
+        os.remove(output)
+    os.rename(tmp_output, output)
 
 
 class XMLParser(object):
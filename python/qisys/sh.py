@@ -98,18 +98,24 @@ def ln(src, dst, symlink=True):
             raise
 
 def write_file_if_different(data, out_path, mode="w"):
-    """ Write the data to out_path if the content is different
+    """ Write the data to out_path if the content is different,
+    so that the modification time of the file is left untouched
+    otherwise.
+
+    :return: True if the file was written
+
     """
     try:
         with open(out_path, "r") as outr:
             out_prev = outr.read()
         if out_prev == data:
             ui.debug("skipping write to %s: same content" % (out_path))
-            return
+            return False
     except:
         pass
     with open(out_path, mode) as out_file:
         out_file.write(data)
+    return True
 
 
 def configure_file(in_path, out_path, copy_only=False, *args, **kwargs):
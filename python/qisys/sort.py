@@ -6,7 +6,10 @@
 
 """
 
-__all__ = [ "DagError", "assert_dag", "topological_sort" ]
+import heapq
+
+__all__ = [ "DagError", "assert_dag", "topological_sort",
+            "critical_path_sort" ]
 
 class DagError(Exception):
     """ Dag Exception """
@@ -116,6 +119,66 @@ def topological_sort(data, heads):
         head = heads
         return _topological_sort(data, head, head)
 
+def critical_path_sort(data, nodes, costs):
+    """ Re-order nodes already sorted by :py:func:`topological_sort`,
+    so that among the nodes whose dependencies are all done, the one
+    with the longest path to the end of the dag comes first.
+
+    When the nodes are processed in parallel, this starts the
+    long chains of dependencies as early as possible.
+
+    data is the same dictionary as for topological_sort, costs a
+    dictionary node -> cost. Nodes without a cost get the average
+    cost of the others. Nodes with the same priority keep their
+    relative order.
+
+    >>> critical_path_sort({
+    ...   'app'  : ['fast', 'slow'],
+    ...   'fast' : ['base'],
+    ...   'slow' : ['base']},
+    ...   ['base', 'fast', 'slow', 'other', 'app'],
+    ...   {'base': 1, 'fast': 1, 'slow': 10, 'app': 1, 'other': 2})
+    ['base', 'slow', 'fast', 'other', 'app']
+
+    >>> critical_path_sort({'b': ['a']}, ['a', 'b', 'c'], {})
+    ['a', 'b', 'c']
+    """
+    nodes = list(nodes)
+    indexes = dict((node, i) for (i, node) in enumerate(nodes))
+    known = [costs[x] for x in nodes if x in costs]
+    default_cost = 0
+    if known:
+        default_cost = float(sum(known)) / len(known)
+    pending = dict()
+    dependents = dict((node, list()) for node in nodes)
+    for node in nodes:
+        deps = set(x for x in data.get(node, list()) if x in indexes)
+        deps.discard(node)
+        pending[node] = len(deps)
+        for dep in deps:
+            dependents[dep].append(node)
+    # Longest path from the start of the node to the end of the dag.
+    # Computed in reverse order, so dependents are always done first
+    priorities = dict()
+    for node in reversed(nodes):
+        downstream = [priorities.get(x, 0) for x in dependents[node]]
+        priorities[node] = costs.get(node, default_cost) + max(downstream or [0])
+    ready = [(-priorities[x], indexes[x], x) for x in nodes if pending[x] == 0]
+    heapq.heapify(ready)
+    result = list()
+    while ready:
+        (_, _, node) = heapq.heappop(ready)
+        result.append(node)
+        for dependent in dependents[node]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                heapq.heappush(ready, (-priorities[dependent],
+                                       indexes[dependent], dependent))
+    # Circular dependencies: keep the remaining nodes in the same order
+    done = set(result)
+    result.extend(x for x in nodes if x not in done)
+    return result
+
 def _topological_sort(data, head, top_node, raise_exception = False, result = None, visited = None):
     """ Internal function
     """
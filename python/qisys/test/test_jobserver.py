@@ -0,0 +1,90 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import os
+import fcntl
+import select
+import threading
+
+import qisys.jobserver
+
+import pytest
+
+# pylint: disable-msg=E1101
+pytestmark = pytest.mark.skipif(os.name != "posix",
+                                reason="jobserver only supported on POSIX")
+
+
+def has_token(jobserver):
+    (readable, _, _) = select.select([jobserver.read_fd], list(), list(), 0)
+    return bool(readable)
+
+
+def test_tokens():
+    jobserver = qisys.jobserver.JobServer(3)
+    try:
+        jobserver.acquire()
+        jobserver.acquire()
+        assert not has_token(jobserver)
+        jobserver.release()
+        assert has_token(jobserver)
+    finally:
+        jobserver.close()
+    assert not os.path.exists(jobserver.fifo)
+
+
+def test_setup_env():
+    jobserver = qisys.jobserver.JobServer(2)
+    try:
+        env = {"MAKEFLAGS": "-k -j4"}
+        jobserver.setup_env(env)
+        fds = "%i,%i" % (jobserver.read_fd, jobserver.write_fd)
+        assert env["MAKEFLAGS"] == \
+            "-k -j --jobserver-fds=%s --jobserver-auth=%s" % (fds, fds)
+        assert qisys.jobserver.has_parent_jobserver(env)
+        jobserver.setup_env(env, ninja=True)
+        assert env["MAKEFLAGS"] == \
+            "-k -j --jobserver-auth=fifo:%s" % jobserver.fifo
+    finally:
+        jobserver.close()
+
+
+def test_has_parent_jobserver():
+    assert not qisys.jobserver.has_parent_jobserver({"MAKEFLAGS": "-k"})
+    assert qisys.jobserver.has_parent_jobserver(
+            {"MAKEFLAGS": " -j4 --jobserver-auth=3,4"})
+    assert qisys.jobserver.has_parent_jobserver(
+            {"MAKEFLAGS": "--jobserver-fds=3,4 -j"})
+
+
+def test_slots():
+    jobserver = qisys.jobserver.JobServer(2)
+    try:
+        with jobserver.slot():
+            # Implicit slot: the token is still available
+            assert has_token(jobserver)
+            with jobserver.slot():
+                assert not has_token(jobserver)
+            assert has_token(jobserver)
+        with jobserver.slot():
+            assert has_token(jobserver)
+    finally:
+        jobserver.close()
+
+
+def test_acquire_non_blocking_fifo():
+    # make sets O_NONBLOCK on the FIFO it shares with us
+    jobserver = qisys.jobserver.JobServer(2)
+    try:
+        flags = fcntl.fcntl(jobserver.read_fd, fcntl.F_GETFL)
+        fcntl.fcntl(jobserver.read_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        jobserver.acquire()
+        # Released by an other thread while waiting for the token
+        timer = threading.Timer(0.1, jobserver.release)
+        timer.start()
+        jobserver.acquire()
+        timer.join()
+        assert not has_token(jobserver)
+    finally:
+        jobserver.close()
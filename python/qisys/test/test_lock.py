@@ -0,0 +1,75 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import qisys
+import qisys.lock
+import qisys.qixml
+
+def test_lock_is_reentrant(tmpdir):
+    foo_xml = tmpdir.join("foo.xml").strpath
+    with qisys.lock.lock_file(foo_xml):
+        with qisys.lock.lock_file(foo_xml):
+            pass
+    assert tmpdir.join("foo.xml.lock").check(file=True)
+
+def test_threads_wait_for_each_other(tmpdir):
+    foo_xml = tmpdir.join("foo.xml").strpath
+    events = list()
+    def work(name):
+        with qisys.lock.lock_file(foo_xml):
+            events.append(("start", name))
+            time.sleep(0.05)
+            events.append(("end", name))
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i in range(3):
+        assert events[2 * i][0] == "start"
+        assert events[2 * i + 1] == ("end", events[2 * i][1])
+
+def test_processes_wait_for_each_other(tmpdir):
+    foo_xml = tmpdir.join("foo.xml").strpath
+    ready = tmpdir.join("ready")
+    script = """
+import sys, time
+import qisys.lock
+with qisys.lock.lock_file(sys.argv[1]):
+    open(sys.argv[2], "w").close()
+    time.sleep(0.5)
+"""
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(qisys.__file__))
+    process = subprocess.Popen([sys.executable, "-c", script,
+                                foo_xml, ready.strpath], env=env)
+    while not ready.check():
+        time.sleep(0.01)
+    start = time.time()
+    with qisys.lock.lock_file(foo_xml):
+        assert process.poll() is not None or time.time() - start > 0.2
+    process.wait()
+
+def test_qixml_write_is_atomic(tmpdir):
+    foo_xml = tmpdir.join("foo.xml")
+    qisys.qixml.write(qisys.qixml.etree.Element("foo"), foo_xml.strpath)
+    assert foo_xml.read() == "<foo />"
+    assert tmpdir.listdir() == [foo_xml]
+
+def test_qixml_write_follows_symlinks(tmpdir):
+    if os.name == "nt":
+        return
+    real_xml = tmpdir.join("real.xml")
+    real_xml.write("<bar />")
+    foo_xml = tmpdir.join("foo.xml")
+    foo_xml.mksymlinkto(real_xml)
+    qisys.qixml.write(qisys.qixml.etree.Element("foo"), foo_xml.strpath)
+    assert foo_xml.islink()
+    assert real_xml.read() == "<foo />"
@@ -0,0 +1,85 @@
+## Copyright (c) 2012-2014 Aldebaran Robotics. All rights reserved.
+## Use of this source code is governed by a BSD-style license that can be
+## found in the COPYING file.
+
+import time
+
+import pytest
+
+import qisys.parallel
+
+def test_results_are_ordered():
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))
+        return x * x
+    res = qisys.parallel.run(slow_square, range(5), num_jobs=3)
+    assert res == [0, 1, 4, 9, 16]
+
+def test_on_result_ordered():
+    seen = list()
+    def on_result(i, item, res):
+        seen.append((i, item, res))
+    def slow_double(x):
+        time.sleep(0.01 * (5 - x))
+        return 2 * x
+    qisys.parallel.run(slow_double, range(5), num_jobs=5,
+                       on_result=on_result, ordered=True)
+    assert seen == [(i, i, 2 * i) for i in range(5)]
+
+def test_exceptions_are_reraised():
+    processed = list()
+    def func(x):
+        if x == 1:
+            raise Exception("Kaboom")
+        processed.append(x)
+    # pylint: disable-msg=E1101
+    with pytest.raises(Exception) as e:
+        qisys.parallel.run(func, range(4), num_jobs=2)
+    assert "Kaboom" in str(e.value)
+    assert sorted(processed) == [0, 2, 3]
+
+def test_no_items():
+    assert qisys.parallel.run(lambda x: x, list(), num_jobs=4) == list()
+
+def test_graph_dependencies_first():
+    deps = {"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"], "e": []}
+    started = list()
+    finished = list()
+    def func(x):
+        for dep in deps[x]:
+            assert dep in finished
+        started.append(x)
+        time.sleep(0.01)
+        finished.append(x)
+        return x.upper()
+    res = qisys.parallel.run_graph(func, "dcbae", lambda x: deps[x],
+                                   num_jobs=3)
+    assert res == list("DCBAE")
+    assert sorted(finished) == list("abcde")
+
+def test_graph_serial():
+    deps = {"a": ["b"], "b": []}
+    processed = list()
+    qisys.parallel.run_graph(processed.append, "ab", lambda x: deps[x],
+                             num_jobs=1)
+    assert processed == ["b", "a"]
+
+def test_graph_skip_dependents_on_error():
+    deps = {"a": [], "b": ["a"], "c": ["b"], "d": []}
+    processed = list()
+    def func(x):
+        if x == "a":
+            raise Exception("Kaboom")
+        processed.append(x)
+    # pylint: disable-msg=E1101
+    with pytest.raises(Exception) as e:
+        qisys.parallel.run_graph(func, "abcd", lambda x: deps[x], num_jobs=2)
+    assert "Kaboom" in str(e.value)
+    assert processed == ["d"]
+
+def test_graph_cycle():
+    deps = {"a": ["b"], "b": ["a"]}
+    # pylint: disable-msg=E1101
+    with pytest.raises(Exception) as e:
+        qisys.parallel.run_graph(lambda x: x, "ab", lambda x: deps[x])
+    assert "Circular" in str(e.value)
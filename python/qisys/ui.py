@@ -287,6 +287,8 @@ class timer:
         """ Stop the timer and emit a nice log """
         end_time = datetime.datetime.now()
         elapsed_time = end_time - self.start_time
+        self.stop_time = end_time
+        self.elapsed_time = elapsed_time
         elapsed_seconds = elapsed_time.seconds
         hours, remainder = divmod(int(elapsed_seconds), 3600)
         minutes, seconds = divmod(remainder, 60)
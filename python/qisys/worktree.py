@@ -13,6 +13,7 @@ import posixpath
 import operator
 import difflib
 
+import qisys.lock
 import qisys.project
 import qisys.command
 import qisys.sh
@@ -53,11 +54,8 @@ This path does not exist
         ~/.config/qi/qibuild.xml
 
         """
-        qibuild_cfg = qibuild.config.QiBuildConfig()
-        to_read = qibuild.config.get_global_cfg_path()
-        qibuild_cfg.read(to_read, create_if_missing=True)
-        qibuild_cfg.add_worktree(self.root)
-        qibuild_cfg.write()
+        with qibuild.config.edit_config() as qibuild_cfg:
+            qibuild_cfg.add_worktree(self.root)
 
     def register(self, observer):
         """ Called when an observer wants to be notified
@@ -303,16 +301,21 @@ class WorkTreeCache:
         """ Add a new source to the cache """
         project_elem = qisys.qixml.etree.Element("project")
         project_elem.set("src", src)
-        self.xml_root.append(project_elem)
-        qisys.qixml.write(self.xml_root, self.xml_path)
+        with qisys.lock.lock_file(self.xml_path):
+            # Another process may have changed the file in the mean time
+            self.xml_root = qisys.qixml.read(self.xml_path).getroot()
+            self.xml_root.append(project_elem)
+            qisys.qixml.write(self.xml_root, self.xml_path)
 
     def remove_src(self, src):
         """ Remove one source from the cache """
-        projects_elem = self.xml_root.findall("project")
-        for project_elem in projects_elem:
-            if project_elem.get("src") == src:
-                self.xml_root.remove(project_elem)
-        qisys.qixml.write(self.xml_root, self.xml_path)
+        with qisys.lock.lock_file(self.xml_path):
+            self.xml_root = qisys.qixml.read(self.xml_path).getroot()
+            projects_elem = self.xml_root.findall("project")
+            for project_elem in projects_elem:
+                if project_elem.get("src") == src:
+                    self.xml_root.remove(project_elem)
+            qisys.qixml.write(self.xml_root, self.xml_path)
 
     def get_srcs(self):
         """ Get all the sources registered in the cache """
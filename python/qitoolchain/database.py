@@ -2,6 +2,7 @@ import os
 
 from qisys import ui
 from qisys.qixml import etree
+import qisys.lock
 import qisys.qixml
 import qitoolchain.feed
 import qitoolchain.qipackage
@@ -13,6 +14,9 @@ class DataBase(object):
         self.name = name
         self.db_path = db_path
         self.packages = dict()
+        # name -> package, or None when removed, applied to the
+        # packages read again from the xml file when saving
+        self._changes = dict()
         self.load()
         self.cache_path = qisys.sh.get_cache_path("qi", "toolchains",
                                                   self.name)
@@ -30,7 +34,26 @@ class DataBase(object):
             self.packages[to_add.name] = to_add
 
     def save(self):
-        """ Save the packages in the xml file """
+        """ Save the packages in the xml file
+
+        The file is read again with the lock held, so that packages
+        added or removed by other processes since :py:meth:`load`
+        are kept
+
+        """
+        with qisys.lock.lock_file(self.db_path):
+            self.packages = dict()
+            self.load()
+            for (name, package) in self._changes.iteritems():
+                if package:
+                    self.packages[name] = package
+                else:
+                    self.packages.pop(name, None)
+            self._changes = dict()
+            self._write()
+
+    def _write(self):
+        """ Helper for save() """
         root = etree.Element("toolchain")
         tree = etree.ElementTree(root)
         for package in self.packages.itervalues():
@@ -64,6 +87,7 @@ class DataBase(object):
     def add_package(self, package):
         """ Add a package to the database """
         self.packages[package.name] = package
+        self._changes[package.name] = package
 
     def remove_package(self, name):
         """ Remove a package from a database """
@@ -72,6 +96,7 @@ class DataBase(object):
         to_remove = self.packages[name]
         qisys.sh.rm(to_remove.path)
         del self.packages[name]
+        self._changes[name] = None
 
     def get_package_path(self, name):
         """ Get the path to a package given its name """
@@ -126,7 +151,7 @@ class DataBase(object):
         for i, svn_package in enumerate(svn_packages):
             ui.info_count(i, len(svn_packages), ui.blue, svn_package.name)
             self.handle_svn_package(svn_package)
-            self.packages[svn_package.name] = svn_package
+            self.add_package(svn_package)
 
         for remote_package in other_packages:
             if remote_package in local_packages:
@@ -148,7 +173,7 @@ class DataBase(object):
         for i, package in enumerate(to_add):
             ui.info_count(i, len(to_add), ui.blue, package.name)
             self.handle_package(package, feed)
-            self.packages[package.name] = package
+            self.add_package(package)
 
         ui.info(ui.green, "Done")
         self.save()
@@ -86,3 +86,16 @@ def test_solve_deps(toolchain_db, tmpdir):
     toolchain_db.add_package(foo_package)
     res = toolchain_db.solve_deps([bar_package], dep_types=["build"])
     assert res == [foo_package, bar_package]
+
+def test_save_keeps_packages_added_by_others(toolchain_db):
+    db2 = qitoolchain.database.DataBase("bar", toolchain_db.db_path)
+    foo_package = qitoolchain.qipackage.QiPackage("foo", version="1.3")
+    bar_package = qitoolchain.qipackage.QiPackage("bar", version="0.1")
+    toolchain_db.add_package(foo_package)
+    toolchain_db.save()
+    # db2 was loaded before foo was added
+    db2.add_package(bar_package)
+    db2.save()
+    assert db2.packages["foo"] == foo_package
+    db3 = qitoolchain.database.DataBase("bar", toolchain_db.db_path)
+    assert sorted(db3.packages.keys()) == ["bar", "foo"]